@@ -1,31 +1,109 @@
 """Agent module using CrewAI for orchestrating the email generation process."""
-from typing import Dict, Any, List, Tuple
-from crewai import Agent, Task, Crew
+import asyncio
+import queue
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, Any, Iterator, List, Optional, Tuple, Union
 
 from app.data_handler import DataHandler
 from app.llm_interface import LLMInterface
 from app.email_generator import EmailGenerator
+from app.metrics import get_metrics, timed
+from app.routing import TieredRouter
+
+if TYPE_CHECKING:
+    # CrewAI is slow to import and only needed on the fallback path, so it is
+    # loaded on first use rather than at module import time
+    from crewai import Agent, Crew, Task
+
+PooledCrew = Tuple["Crew", List["Task"]]
+
+# Kickoff inputs that fill in the task descriptions of pooled crews for each lead
+LEAD_ANALYSIS_INPUT = "lead_analysis"
+EMAIL_WRITING_INPUT = "email_writing"
+
+class CrewPool:
+    """Thread-safe pool of pre-built CrewAI crews reused across leads.
+
+    Building agents and crews is expensive, so crews are created lazily up to
+    the pool size and then checked out exclusively for one lead at a time.
+    Callers beyond the pool size wait for a crew to be returned, which also
+    bounds how many CrewAI fallbacks run in parallel.
+    """
+
+    def __init__(self, factory: Callable[[], PooledCrew], size: int = 2):
+        """Initialize the pool.
+
+        Args:
+            factory: Callable building a new (crew, tasks) pair
+            size: Maximum number of crews in the pool
+        """
+        if size < 1:
+            raise ValueError("Crew pool size must be at least 1")
+        self.size = size
+        self._factory = factory
+        self._available: "queue.LifoQueue[PooledCrew]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self) -> Iterator[PooledCrew]:
+        """Check out a crew for exclusive use.
+
+        Yields:
+            Tuple of (crew, tasks)
+        """
+        try:
+            pooled = self._available.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                build = self._created < self.size
+                if build:
+                    self._created += 1
+            if build:
+                try:
+                    pooled = self._factory()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                pooled = self._available.get()
+
+        try:
+            yield pooled
+        finally:
+            self._available.put(pooled)
 
 
 class EmailCrewAgent:
     """Agent class using CrewAI for orchestrating email generation."""
 
-    def __init__(self, llm_interface: LLMInterface):
+    def __init__(self, llm_interface: LLMInterface, crew_pool_size: int = 2, router: Optional[TieredRouter] = None):
         """Initialize with an LLM interface.
 
         Args:
             llm_interface: An instance of LLMInterface
+            crew_pool_size: Maximum number of CrewAI fallbacks running in parallel
+            router: Optional tiered router used for direct generation instead of
+                the email generator of llm_interface
         """
         self.llm_interface = llm_interface
         self.email_generator = EmailGenerator(llm_interface)
+        self.router = router
+        # Direct generation goes through the router when tiers are configured
+        self._direct: Union[EmailGenerator, TieredRouter] = router if router is not None else self.email_generator
+        self.crew_pool = CrewPool(self._build_crew, size=crew_pool_size)
 
-    def create_agents(self) -> List[Agent]:
+    def create_agents(self) -> List["Agent"]:
         """Create the agents needed for the email generation process.
 
         Returns:
             List of CrewAI agents
         """
         try:
+            from crewai import Agent
+
             lead_analyst = Agent(
                 role="Lead Analyst",
                 goal="Analyze lead data to identify key interests and pain points",
@@ -47,79 +125,66 @@ class EmailCrewAgent:
             print(f"Error creating agents: {e}")
             raise RuntimeError(f"Failed to create CrewAI agents: {e}")
 
-    def create_tasks(self, agents: List[Agent], lead: Dict[str, Any], product: Dict[str, Any]) -> List[Task]:
+    def _task_descriptions(self, lead: Dict[str, Any], product: Dict[str, Any]) -> Tuple[str, str]:
+        """Render the task descriptions for a lead.
+
+        The email writing task only depends on the product, so it comes from
+        the prompts compiled once per product.
+
+        Args:
+            lead: Dictionary containing lead information
+            product: Dictionary containing product information
+
+        Returns:
+            Tuple of (lead_analysis_description, email_writing_description)
+        """
+        compiled = self.llm_interface.compile_prompts(product)
+        lead = self.llm_interface.apply_prompt_budget(lead)
+        return compiled.lead_analysis_task(lead), compiled.email_writing_task
+
+    def create_tasks(self, agents: List["Agent"], lead: Dict[str, Any], product: Dict[str, Any]) -> List["Task"]:
         """Create tasks for the agents.
 
+        Task outputs are kept in memory on each task rather than written to
+        shared files, so concurrent runs cannot overwrite each other.
+
         Args:
             agents: List of CrewAI agents
             lead: Dictionary containing lead information
             product: Dictionary containing product information
 
+        Returns:
+            List of CrewAI tasks
+        """
+        lead_analysis, email_writing = self._task_descriptions(lead, product)
+        return self._build_tasks(agents, lead_analysis, email_writing)
+
+    def _build_tasks(self, agents: List["Agent"], lead_analysis: str, email_writing: str) -> List["Task"]:
+        """Create the lead analysis and email writing tasks from their descriptions.
+
+        Args:
+            agents: List of CrewAI agents
+            lead_analysis: Description of the lead analysis task
+            email_writing: Description of the email writing task
+
         Returns:
             List of CrewAI tasks
         """
         if len(agents) < 2:
             raise ValueError("Need at least two agents for the CrewAI workflow")
-            
-        # Handle missing data gracefully
-        lead_name = lead.get('name', 'Prospect')
-        lead_title = lead.get('job_title', 'Professional')
-        lead_company = lead.get('company', 'Company')
-        lead_industry = lead.get('industry', 'Industry')
-        lead_interests = ', '.join(lead.get('interests', ['professional growth']))
-        lead_pain_points = ', '.join(lead.get('pain_points', ['efficiency']))
-        lead_activity = lead.get('linkedin_activity', 'None')
-        
-        product_name = product.get('name', 'Our Product')
-        product_desc = product.get('description', 'A solution designed to help businesses')
-        product_features = ', '.join(product.get('key_features', ['customizable features']))
-        product_benefits = ', '.join(product.get('benefits', ['improved efficiency']))
-        
+
         try:
+            from crewai import Task
+
             lead_analysis_task = Task(
-                description=f"""
-                Analyze the following lead information:
-                Name: {lead_name}
-                Job Title: {lead_title}
-                Company: {lead_company}
-                Industry: {lead_industry}
-                Interests: {lead_interests}
-                Pain Points: {lead_pain_points}
-                LinkedIn Activity: {lead_activity}
-                
-                Identify:
-                1. Key pain points to address
-                2. Relevant interests to mention
-                3. Personalization opportunities based on LinkedIn activity
-                4. Appropriate tone and approach for their position
-                """,
-                agent=agents[0],
-                output_file="lead_analysis.txt"
+                description=lead_analysis,
+                agent=agents[0]
             )
             
             email_writing_task = Task(
-                description=f"""
-                Using the lead analysis and product information, create a personalized email:
-                
-                Product Name: {product_name}
-                Description: {product_desc}
-                Key Features: {product_features}
-                Benefits: {product_benefits}
-                
-                Create:
-                1. An attention-grabbing subject line
-                2. A personalized email body that addresses the lead's pain points
-                3. A concise mention of relevant product benefits
-                4. A clear call to action
-                
-                Format your response as:
-                Subject Line: [Your subject line here]
-                
-                [Your email body here]
-                """,
+                description=email_writing,
                 agent=agents[1],
-                context=[lead_analysis_task],
-                output_file="generated_email.txt"
+                context=[lead_analysis_task]
             )
             
             return [lead_analysis_task, email_writing_task]
@@ -127,6 +192,25 @@ class EmailCrewAgent:
             print(f"Error creating tasks: {e}")
             raise RuntimeError(f"Failed to create CrewAI tasks: {e}")
 
+    def _build_crew(self) -> PooledCrew:
+        """Build a crew whose task descriptions are filled in per lead.
+
+        Returns:
+            Tuple of (crew, tasks) for use in the crew pool
+        """
+        from crewai import Crew
+
+        agents = self.create_agents()
+        # Each kickoff interpolates its inputs into these descriptions, so no prompt is built here
+        tasks = self._build_tasks(agents, f"{{{LEAD_ANALYSIS_INPUT}}}", f"{{{EMAIL_WRITING_INPUT}}}")
+        crew = Crew(
+            agents=agents,
+            tasks=tasks,
+            verbose=True
+        )
+        return crew, tasks
+
+    @timed("generate_email")
     def generate_email_for_lead(self, lead: Dict[str, Any], product: Dict[str, Any]) -> Tuple[str, str]:
         """Generate an email for a specific lead using CrewAI.
 
@@ -139,25 +223,107 @@ class EmailCrewAgent:
         """
         try:
             # Direct approach using EmailGenerator for simplicity and efficiency
-            return self.email_generator.generate_email(lead, product)
+            return self._direct.generate_email(lead, product)
         except Exception as e:
+            if self.llm_interface.circuit_breaker.is_open:
+                # CrewAI would hit the same failing endpoint, so fail fast instead
+                return "Error", f"LLM endpoint unavailable: {str(e)}"
             print(f"Error with direct generation, falling back to CrewAI: {e}")
+            get_metrics().increment("crewai_fallbacks")
+            return self._generate_with_crew(lead, product)
+
+    @timed("generate_email")
+    async def agenerate_email_for_lead(self, lead: Dict[str, Any], product: Dict[str, Any]) -> Tuple[str, str]:
+        """Generate an email for a specific lead asynchronously.
+
+        The CrewAI fallback is synchronous, so it runs in a worker thread to
+        keep the event loop free for other leads.
+
+        Args:
+            lead: Dictionary containing lead information
+            product: Dictionary containing product information
+
+        Returns:
+            Tuple of (subject_line, email_body)
+        """
+        try:
+            return await self._direct.agenerate_email(lead, product)
+        except Exception as e:
+            if self.llm_interface.circuit_breaker.is_open:
+                # CrewAI would hit the same failing endpoint, so fail fast instead
+                return "Error", f"LLM endpoint unavailable: {str(e)}"
+            print(f"Error with direct generation, falling back to CrewAI: {e}")
+            get_metrics().increment("crewai_fallbacks")
+            return await asyncio.to_thread(self._generate_with_crew, lead, product)
+
+    async def agenerate_emails_for_leads(self, leads: List[Dict[str, Any]], product: Dict[str, Any]) -> List[Tuple[str, str]]:
+        """Generate emails for several leads with one packed request.
+
+        If packed generation fails outright, every lead is retried on its own
+        through agenerate_email_for_lead, including the CrewAI fallback.
+
+        Args:
+            leads: List of lead dictionaries
+            product: Dictionary containing product information
+
+        Returns:
+            List of (subject_line, email_body) tuples in lead order
+        """
+        try:
+            return await self._direct.agenerate_emails(leads, product)
+        except Exception as e:
+            print(f"Error with packed generation, retrying leads individually: {e}")
+            get_metrics().increment("packed_fallbacks")
+            return list(await asyncio.gather(*(self.agenerate_email_for_lead(lead, product) for lead in leads)))
+
+    def _run_crew(self, lead: Dict[str, Any], product: Dict[str, Any]) -> Dict[str, str]:
+        """Run a pooled crew for one lead and collect its task outputs.
+
+        Args:
+            lead: Dictionary containing lead information
+            product: Dictionary containing product information
+
+        Returns:
+            Dict with the ``lead_analysis`` and ``email`` outputs for this lead
+        """
+        lead_analysis, email_writing = self._task_descriptions(lead, product)
+        with self.crew_pool.acquire() as (crew, tasks):
+            lead_analysis_task, email_writing_task = tasks
+            result = crew.kickoff(inputs={LEAD_ANALYSIS_INPUT: lead_analysis, EMAIL_WRITING_INPUT: email_writing})
+            return {
+                "lead_analysis": self._task_output(lead_analysis_task),
+                "email": self._task_output(email_writing_task) or str(result)
+            }
+
+    @staticmethod
+    def _task_output(task: "Task") -> str:
+        """Read the in-memory output of a completed task."""
+        output = getattr(task, "output", None)
+        if output is None:
+            return ""
+        for attribute in ("raw_output", "raw"):
+            value = getattr(output, attribute, None)
+            if value:
+                return str(value)
+        return str(output)
+
+    @timed("crewai_fallback")
+    def _generate_with_crew(self, lead: Dict[str, Any], product: Dict[str, Any]) -> Tuple[str, str]:
+        """Generate an email for a lead with the CrewAI workflow.
+
+        Args:
+            lead: Dictionary containing lead information
+            product: Dictionary containing product information
+
+        Returns:
+            Tuple of (subject_line, email_body)
+        """
+        try:
+            # Fallback to CrewAI (more complex but provides reasoning)
+            outputs = self._run_crew(lead, product)
             
-            try:
-                # Fallback to CrewAI (more complex but provides reasoning)
-                agents = self.create_agents()
-                tasks = self.create_tasks(agents, lead, product)
-                
-                crew = Crew(
-                    agents=agents,
-                    tasks=tasks,
-                    verbose=True
-                )
-                
-                result = crew.kickoff()
-                
-                # Parse the CrewAI result
-                return self.email_generator._parse_generated_content(result)
-            except Exception as crew_error:
-                print(f"Error with CrewAI generation: {crew_error}")
-                return "Error", f"Failed to generate email: {str(crew_error)}"
\ No newline at end of file
+            # Parse the CrewAI result
+            return self.email_generator._parse_generated_content(outputs["email"])
+        except Exception as crew_error:
+            print(f"Error with CrewAI generation: {crew_error}")
+            return "Error", f"Failed to generate email: {str(crew_error)}"
@@ -0,0 +1,424 @@
+"""End-to-end throughput benchmarks for the email generation pipeline.
+
+Runs generate_emails_for_all_leads against synthetic lead files using the
+local fake LLM backend, so pipeline overhead and scaling can be measured
+offline. Each lead-set size runs in its own subprocess to get an accurate
+peak RSS, and the report is written as JSON so regressions can be tracked.
+
+With ``--startup`` it instead measures cold start: the time from launching
+a fresh interpreter running ``main()`` to its first LLM request, checked
+against a budget so import-time regressions fail loudly.
+
+With ``--memory`` it compares the memory held by loaded leads as plain
+dicts and as compact LeadRecords.
+
+Example:
+    python -m app.benchmark --sizes 100,1000,10000 --latency-ms 20 --concurrency 64
+    python -m app.benchmark --startup --startup-budget-ms 800
+    python -m app.benchmark --memory --memory-leads 1000000
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from app.llm_backends import FakeLLMBackend
+
+DEFAULT_SIZES = "100,1000,10000,100000"
+DEFAULT_STARTUP_BUDGET_MS = 1000.0
+DEFAULT_MEMORY_LEADS = 1000000
+
+# Modules that must not be loaded before the first request on the fast path
+HEAVY_MODULES = ("crewai", "langchain", "langchain_openai", "openai")
+
+_FIRST_NAMES = ("Sarah", "Michael", "Priya", "James", "Elena", "Omar", "Grace", "Daniel", "Mei", "Lucas")
+_LAST_NAMES = ("Johnson", "Chen", "Patel", "Smith", "Garcia", "Haddad", "Kim", "Okafor", "Novak", "Silva")
+_JOB_TITLES = ("Head of Marketing", "Sales Director", "VP of Growth", "Revenue Operations Manager", "CMO")
+_INDUSTRIES = ("SaaS", "Data Analytics", "Fintech", "Healthcare", "E-commerce", "Logistics")
+_INTERESTS = ("marketing automation", "lead generation", "content strategy", "sales optimization",
+              "CRM integration", "pipeline management", "customer retention")
+_PAIN_POINTS = ("manual email outreach", "low response rates", "inefficient prospecting",
+                "time-consuming follow-ups", "poor lead quality", "long sales cycles")
+
+SYNTHETIC_PRODUCT = {
+    "name": "OutreachPro AI",
+    "description": "An AI-powered platform that automates personalized outreach at scale",
+    "key_features": ["Intelligent lead targeting", "Customizable email templates", "A/B testing capabilities"],
+    "benefits": ["50% increase in response rates", "75% reduction in manual outreach time"]
+}
+
+
+def generate_synthetic_leads(path: str, count: int, seed: int = 0) -> None:
+    """Write a synthetic JSONL lead file.
+
+    Args:
+        path: Destination path (should end in .jsonl)
+        count: Number of leads to generate
+        seed: Seed for reproducible lead content
+    """
+    rng = random.Random(seed)
+    with open(path, "w") as file:
+        file.write(json.dumps({"product": SYNTHETIC_PRODUCT}) + "\n")
+        for lead_id in range(1, count + 1):
+            lead = {
+                "id": lead_id,
+                "name": f"{rng.choice(_FIRST_NAMES)} {rng.choice(_LAST_NAMES)}",
+                "job_title": rng.choice(_JOB_TITLES),
+                "company": f"Company {lead_id}",
+                "industry": rng.choice(_INDUSTRIES),
+                "interests": rng.sample(_INTERESTS, 3),
+                "pain_points": rng.sample(_PAIN_POINTS, 2),
+                "linkedin_activity": f"Recently shared post #{rng.randint(1, 1000)} about {rng.choice(_INTERESTS)}"
+            }
+            file.write(json.dumps(lead) + "\n")
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    """Return the nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(percentile / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of the current process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return peak / divisor
+
+
+def run_single(size: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the pipeline once over a synthetic lead set in this process.
+
+    Args:
+        size: Number of leads
+        args: Parsed benchmark arguments
+
+    Returns:
+        Dict of measurements for this size
+    """
+    from app.main import generate_emails_for_all_leads
+
+    logging.getLogger("email_generator").setLevel(logging.WARNING)
+    latencies: List[float] = []
+
+    with tempfile.TemporaryDirectory(prefix="email_bench_") as workdir:
+        data_path = os.path.join(workdir, "leads.jsonl")
+        generate_synthetic_leads(data_path, size, seed=args.seed)
+
+        backend = FakeLLMBackend(
+            latency_ms=args.latency_ms,
+            latency_distribution=args.latency_distribution,
+            error_rate=args.error_rate,
+            response_shape=args.response_shape,
+            seed=args.seed
+        )
+
+        started = time.perf_counter()
+        generate_emails_for_all_leads(
+            data_path,
+            os.path.join(workdir, "output"),
+            concurrency=args.concurrency,
+            pack_size=args.pack_size,
+            streaming=True,
+            return_results=False,
+            llm_backend=backend,
+            on_result=lambda result, elapsed: latencies.append(elapsed)
+        )
+        duration = time.perf_counter() - started
+
+    return {
+        "leads": size,
+        "completed": len(latencies),
+        "duration_s": round(duration, 4),
+        "leads_per_s": round(len(latencies) / duration, 2) if duration > 0 else None,
+        "latency_p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "latency_p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+        "peak_rss_mb": round(_peak_rss_mb(), 2)
+    }
+
+
+def _run_in_subprocess(size: int, argv: List[str]) -> Dict[str, Any]:
+    """Run one benchmark size in a fresh interpreter and return its result."""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as handle:
+        result_path = handle.name
+    try:
+        subprocess.run(
+            [sys.executable, "-m", "app.benchmark", *argv, "--single", str(size), "--result-file", result_path],
+            check=True,
+            stdout=subprocess.DEVNULL
+        )
+        with open(result_path, "r") as file:
+            return json.load(file)
+    finally:
+        os.remove(result_path)
+
+
+def _startup_probe(result_path: str) -> None:
+    """Run main() over a one-lead file and record when the first request is issued.
+
+    Args:
+        result_path: File receiving the probe measurements as JSON
+    """
+    first_request: Dict[str, Any] = {}
+    original_ainvoke = FakeLLMBackend.ainvoke
+
+    async def recording_ainvoke(self, prompt):
+        if not first_request:
+            first_request["at"] = time.time()
+            first_request["heavy_modules"] = [name for name in HEAVY_MODULES if name in sys.modules]
+        return await original_ainvoke(self, prompt)
+
+    FakeLLMBackend.ainvoke = recording_ainvoke
+
+    with tempfile.TemporaryDirectory(prefix="email_startup_") as workdir:
+        data_path = os.path.join(workdir, "leads.jsonl")
+        generate_synthetic_leads(data_path, 1)
+        os.environ.update({
+            "DATA_PATH": data_path,
+            "OUTPUT_PATH": os.path.join(workdir, "output"),
+            "LLM_BACKEND": "fake"
+        })
+
+        import_started = time.perf_counter()
+        from app.main import main as app_main
+        import_ms = (time.perf_counter() - import_started) * 1000
+        app_main([])
+
+    with open(result_path, "w") as file:
+        json.dump({
+            "first_request_at": first_request.get("at"),
+            "import_ms": round(import_ms, 3),
+            "heavy_modules_loaded": first_request.get("heavy_modules", [])
+        }, file)
+
+
+def run_startup(runs: int, budget_ms: float) -> Dict[str, Any]:
+    """Measure cold start of main() to first request in fresh interpreters.
+
+    Args:
+        runs: Number of cold starts to measure
+        budget_ms: Maximum allowed median startup time in milliseconds
+
+    Returns:
+        Dict of measurements including whether the budget was met
+    """
+    startup_ms: List[float] = []
+    import_ms: List[float] = []
+    heavy_modules = set()
+
+    for _ in range(runs):
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as handle:
+            result_path = handle.name
+        try:
+            launched = time.time()
+            subprocess.run(
+                [sys.executable, "-m", "app.benchmark", "--startup-probe", "--result-file", result_path],
+                check=True,
+                stdout=subprocess.DEVNULL
+            )
+            with open(result_path, "r") as file:
+                probe = json.load(file)
+        finally:
+            os.remove(result_path)
+
+        if probe["first_request_at"] is None:
+            raise RuntimeError("Startup probe finished without issuing a request")
+        startup_ms.append((probe["first_request_at"] - launched) * 1000)
+        import_ms.append(probe["import_ms"])
+        heavy_modules.update(probe["heavy_modules_loaded"])
+
+    median_ms = _percentile(startup_ms, 50)
+    return {
+        "runs": runs,
+        "startup_p50_ms": round(median_ms, 3),
+        "startup_max_ms": round(max(startup_ms), 3),
+        "import_p50_ms": round(_percentile(import_ms, 50), 3),
+        "heavy_modules_loaded": sorted(heavy_modules),
+        "budget_ms": budget_ms,
+        "within_budget": median_ms <= budget_ms and not heavy_modules
+    }
+
+
+def _measure_lead_memory(data_path: str, compact: bool) -> Dict[str, Any]:
+    """Load a lead file once and measure the memory its leads retain.
+
+    Args:
+        data_path: Synthetic JSONL lead file
+        compact: Load leads as LeadRecords instead of dicts
+
+    Returns:
+        Dict of measurements for one representation
+    """
+    from app.data_handler import DataHandler
+
+    started = time.perf_counter()
+    leads = DataHandler(data_path, compact=compact).get_all_leads()
+    load_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for lead in leads:
+        for field in ("name", "job_title", "company", "industry", "interests", "pain_points", "linkedin_activity"):
+            lead.get(field)
+    access_s = time.perf_counter() - started
+    del leads
+
+    # A second, traced load counts only the allocations still alive afterwards
+    gc.collect()
+    tracemalloc.start()
+    leads = DataHandler(data_path, compact=compact).get_all_leads()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = len(leads)
+    del leads
+    gc.collect()
+
+    return {
+        "representation": "compact" if compact else "dict",
+        "leads": count,
+        "retained_mb": round(retained / (1024 * 1024), 2),
+        "bytes_per_lead": round(retained / count, 1) if count else None,
+        "load_peak_mb": round(peak / (1024 * 1024), 2),
+        "load_s": round(load_s, 3),
+        "field_access_ns": round(access_s / (count * 7) * 1e9, 1) if count else None
+    }
+
+
+def run_memory(count: int, seed: int = 0) -> Dict[str, Any]:
+    """Compare the memory used by dict and compact lead representations.
+
+    Args:
+        count: Number of synthetic leads to load
+        seed: Seed for reproducible lead content
+
+    Returns:
+        Dict with one measurement per representation and the memory saved
+    """
+    with tempfile.TemporaryDirectory(prefix="email_memory_") as workdir:
+        data_path = os.path.join(workdir, "leads.jsonl")
+        generate_synthetic_leads(data_path, count, seed=seed)
+        results = [_measure_lead_memory(data_path, compact) for compact in (False, True)]
+
+    dict_mb, compact_mb = results[0]["retained_mb"], results[1]["retained_mb"]
+    return {
+        "leads": count,
+        "representations": results,
+        "saved_mb": round(dict_mb - compact_mb, 2),
+        "compact_ratio": round(compact_mb / dict_mb, 3) if dict_mb else None
+    }
+
+
+def _parse_args(argv: List[str]) -> argparse.Namespace:
+    """Parse benchmark command-line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark the email generation pipeline offline.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated lead counts")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--pack-size", type=int, default=1)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mean fake LLM latency")
+    parser.add_argument("--latency-distribution", default="fixed", choices=FakeLLMBackend.LATENCY_DISTRIBUTIONS)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--response-shape", default="email", choices=FakeLLMBackend.RESPONSE_SHAPES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--startup", action="store_true", help="measure cold start to first request instead")
+    parser.add_argument("--startup-runs", type=int, default=5)
+    parser.add_argument("--startup-budget-ms", type=float, default=DEFAULT_STARTUP_BUDGET_MS)
+    parser.add_argument("--memory", action="store_true", help="compare dict and compact lead memory instead")
+    parser.add_argument("--memory-leads", type=int, default=DEFAULT_MEMORY_LEADS)
+    parser.add_argument("--startup-probe", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the benchmark suite and emit a JSON report."""
+    argv = sys.argv[1:] if argv is None else argv
+    args = _parse_args(argv)
+
+    if args.single is not None:
+        with open(args.result_file, "w") as file:
+            json.dump(run_single(args.single, args), file)
+        return
+    if args.startup_probe:
+        _startup_probe(args.result_file)
+        return
+    if args.memory:
+        _emit_report({
+            "benchmark": "lead_memory",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": run_memory(args.memory_leads, seed=args.seed)
+        }, args.output)
+        return
+    if args.startup:
+        report = {
+            "benchmark": "startup",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": run_startup(args.startup_runs, args.startup_budget_ms)
+        }
+        _emit_report(report, args.output)
+        if not report["results"]["within_budget"]:
+            sys.exit(1)
+        return
+
+    # Child runs receive the same options minus the output destination
+    child_argv = []
+    skip_next = False
+    for arg in argv:
+        if skip_next:
+            skip_next = False
+        elif arg == "--output":
+            skip_next = True
+        elif not arg.startswith("--output="):
+            child_argv.append(arg)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    report = {
+        "benchmark": "pipeline_throughput",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "concurrency": args.concurrency,
+            "pack_size": args.pack_size,
+            "latency_ms": args.latency_ms,
+            "latency_distribution": args.latency_distribution,
+            "error_rate": args.error_rate,
+            "response_shape": args.response_shape,
+            "seed": args.seed
+        },
+        "results": [_run_in_subprocess(size, child_argv) for size in sizes]
+    }
+
+    _emit_report(report, args.output)
+
+
+def _emit_report(report: Dict[str, Any], output: Optional[str]) -> None:
+    """Write a JSON report to a file, or to stdout when no file is given."""
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
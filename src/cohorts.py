@@ -0,0 +1,320 @@
+"""Clustering of leads with matching profiles so one generated email serves a whole cohort."""
+import asyncio
+import hashlib
+import json
+import re
+from collections import deque
+from typing import TYPE_CHECKING, Any, Deque, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+
+from app.email_generator import EmailGenerator
+from app.metrics import get_metrics
+from app.prompt_templates import COHORT_COMPANY_PLACEHOLDER, COHORT_NAME_PLACEHOLDER, COHORT_OPENING_PLACEHOLDER
+
+# Lead fields that shape the generated email apart from name, company and LinkedIn activity
+COHORT_FIELDS = ("job_title", "industry", "pain_points", "interests")
+
+if TYPE_CHECKING:
+    from app.routing import TieredRouter
+
+# Placeholders a cohort template must contain; without them the model wrote
+# one prospect's name or company into an email shared by the whole cohort
+REQUIRED_PLACEHOLDERS = (COHORT_NAME_PLACEHOLDER, COHORT_COMPANY_PLACEHOLDER)
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+_OPENING_LINE = re.compile(re.escape(COHORT_OPENING_PLACEHOLDER) + r"[ \t]*\n?")
+
+
+def _normalize_text(value: Any) -> str:
+    """Lowercase a value and collapse punctuation and whitespace."""
+    return _NON_WORD.sub(" ", str(value).lower()).strip()
+
+
+def _normalize_field(value: Any) -> Any:
+    """Normalize a lead field so formatting differences do not split cohorts."""
+    if isinstance(value, (list, tuple)):
+        return sorted({_normalize_text(item) for item in value})
+    return _normalize_text(value) if value is not None else ""
+
+
+def lead_fingerprint(lead: Dict[str, Any]) -> bytes:
+    """Fingerprint the prompt-relevant profile of a lead.
+
+    Leads whose ``COHORT_FIELDS`` match after normalization (case,
+    punctuation, list order) share a fingerprint.
+
+    Args:
+        lead: Dictionary containing lead information
+
+    Returns:
+        16-byte digest of the normalized profile
+    """
+    profile = [_normalize_field(lead.get(field)) for field in COHORT_FIELDS]
+    return hashlib.sha256(json.dumps(profile).encode("utf-8")).digest()[:16]
+
+
+def _profile_tokens(lead: Dict[str, Any]) -> FrozenSet[str]:
+    """Return the words of a lead's pain points and interests."""
+    words = set()
+    for field in ("pain_points", "interests"):
+        for item in lead.get(field) or []:
+            words.update(_normalize_text(item).split())
+    return frozenset(words)
+
+
+def _similarity(first: FrozenSet[str], second: FrozenSet[str]) -> float:
+    """Jaccard similarity of two word sets."""
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
+
+
+class CohortPlan:
+    """Assignment of leads to cohorts, built in a pre-pass over the lead file.
+
+    Leads with the same fingerprint always share a cohort. With a similarity
+    below 1, a lead with a new fingerprint also joins an existing cohort with
+    the same job title and industry when the words of their pain points and
+    interests overlap at least that much. Only fingerprints are kept, so
+    memory grows with the number of distinct profiles rather than leads.
+    """
+
+    def __init__(self, similarity: float = 0.8, max_candidates: int = 64):
+        """Initialize an empty plan.
+
+        Args:
+            similarity: Minimum Jaccard similarity for near-duplicates (1.0 for exact matches only)
+            max_candidates: Recent cohorts compared per job title and industry
+        """
+        if not 0 < similarity <= 1:
+            raise ValueError("similarity must be between 0 and 1")
+        self.similarity = similarity
+        self.max_candidates = max_candidates
+        self._cohort_of: Dict[bytes, int] = {}
+        self._sizes: List[int] = []
+        self._candidates: Dict[Tuple[str, str], Deque[Tuple[int, FrozenSet[str]]]] = {}
+
+    @classmethod
+    def build(cls, leads: Iterable[Dict[str, Any]], similarity: float = 0.8) -> "CohortPlan":
+        """Build a plan from an iterable of leads.
+
+        Args:
+            leads: Iterable of lead dictionaries
+            similarity: Minimum Jaccard similarity for near-duplicates
+
+        Returns:
+            The populated plan
+        """
+        plan = cls(similarity)
+        for lead in leads:
+            plan.add(lead)
+        return plan
+
+    def add(self, lead: Dict[str, Any]) -> int:
+        """Assign a lead to a cohort.
+
+        Args:
+            lead: Dictionary containing lead information
+
+        Returns:
+            Cohort index
+        """
+        fingerprint = lead_fingerprint(lead)
+        cohort = self._cohort_of.get(fingerprint)
+        if cohort is None:
+            cohort = self._match_near_duplicate(lead)
+            self._cohort_of[fingerprint] = cohort
+        self._sizes[cohort] += 1
+        return cohort
+
+    def _match_near_duplicate(self, lead: Dict[str, Any]) -> int:
+        """Find a similar cohort for a new fingerprint, or start a new cohort."""
+        key = (_normalize_text(lead.get("job_title", "")), _normalize_text(lead.get("industry", "")))
+        tokens = _profile_tokens(lead)
+        candidates = self._candidates.setdefault(key, deque(maxlen=self.max_candidates))
+        if self.similarity < 1:
+            for cohort, cohort_tokens in candidates:
+                if _similarity(tokens, cohort_tokens) >= self.similarity:
+                    return cohort
+        self._sizes.append(0)
+        cohort = len(self._sizes) - 1
+        candidates.append((cohort, tokens))
+        return cohort
+
+    def cohort_for(self, lead: Dict[str, Any]) -> Optional[int]:
+        """Look up the shared cohort of a lead.
+
+        Args:
+            lead: Dictionary containing lead information
+
+        Returns:
+            Cohort index, or None if the lead has no cohort with other leads
+        """
+        cohort = self._cohort_of.get(lead_fingerprint(lead))
+        if cohort is None or self._sizes[cohort] < 2:
+            return None
+        return cohort
+
+    def size(self, cohort: int) -> int:
+        """Number of leads assigned to a cohort."""
+        return self._sizes[cohort]
+
+    @property
+    def lead_count(self) -> int:
+        """Number of leads in the plan."""
+        return sum(self._sizes)
+
+    @property
+    def cohort_count(self) -> int:
+        """Number of cohorts, including single-lead cohorts."""
+        return len(self._sizes)
+
+    @property
+    def reusable_leads(self) -> int:
+        """Number of leads that can reuse another lead's generated email."""
+        return sum(size - 1 for size in self._sizes if size > 1)
+
+
+def _first_name(lead: Dict[str, Any]) -> str:
+    """Return the first name of a lead, or a neutral greeting word."""
+    parts = str(lead.get("name") or "").split()
+    return parts[0] if parts else "there"
+
+
+def local_opening(lead: Dict[str, Any]) -> str:
+    """Build an opening sentence from the lead's LinkedIn activity without an LLM call.
+
+    Args:
+        lead: Dictionary containing lead information
+
+    Returns:
+        Opening sentence, or an empty string if there is no activity
+    """
+    activity = str(lead.get("linkedin_activity") or "").strip().rstrip(".")
+    if not activity or activity.lower() == "none":
+        return ""
+    return f"I noticed you {activity[0].lower()}{activity[1:]} on LinkedIn."
+
+
+def missing_placeholders(subject_line: str, email_body: str) -> List[str]:
+    """Find the required placeholders a cohort template lacks.
+
+    Args:
+        subject_line: Subject line template
+        email_body: Body template
+
+    Returns:
+        Placeholders from REQUIRED_PLACEHOLDERS that appear in neither text
+    """
+    text = f"{subject_line}\n{email_body}"
+    return [placeholder for placeholder in REQUIRED_PLACEHOLDERS if placeholder not in text]
+
+
+def personalize(text: str, lead: Dict[str, Any], opening: str) -> str:
+    """Fill the placeholders of a cohort template for one lead.
+
+    Args:
+        text: Subject line or body template
+        lead: Dictionary containing lead information
+        opening: Opening sentence for the lead (may be empty)
+
+    Returns:
+        Personalized text
+    """
+    if opening:
+        text = text.replace(COHORT_OPENING_PLACEHOLDER, opening)
+    else:
+        text = _OPENING_LINE.sub("", text)
+    text = text.replace(COHORT_NAME_PLACEHOLDER, _first_name(lead))
+    return text.replace(COHORT_COMPANY_PLACEHOLDER, str(lead.get("company") or "your company"))
+
+
+class CohortGenerator:
+    """Generates one email per cohort and personalizes it for every member.
+
+    A template missing the name or company placeholder is discarded and the
+    leads of its cohort are generated individually.
+    """
+
+    def __init__(self, plan: CohortPlan, email_generator: Union[EmailGenerator, "TieredRouter"],
+                 product: Dict[str, Any], followup: bool = False):
+        """Initialize the generator.
+
+        Args:
+            plan: Cohort assignment of the leads being processed
+            email_generator: Generator or tiered router used for templates and follow-up openings
+            product: Dictionary containing product information
+            followup: Write each lead's opening with a short LLM prompt instead of locally
+        """
+        self.plan = plan
+        self.email_generator = email_generator
+        self.product = product
+        self.followup = followup
+        self._templates: Dict[int, "asyncio.Future[Tuple[str, str]]"] = {}
+        self._remaining: Dict[int, int] = {}
+        self._rejected: Set[int] = set()
+
+    async def _opening(self, lead: Dict[str, Any]) -> str:
+        """Produce the opening sentence for one lead."""
+        if self.followup and local_opening(lead):
+            get_metrics().increment("cohort_followup_calls")
+            opening = await self.email_generator.agenerate_opening(lead)
+            if opening:
+                return opening
+        return local_opening(lead)
+
+    async def agenerate(self, lead: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        """Generate an email for a lead from its cohort template.
+
+        The first lead of a cohort to arrive generates the template; the
+        others wait for it instead of sending their own request.
+
+        Args:
+            lead: Dictionary containing lead information
+
+        Returns:
+            Tuple of (subject_line, email_body), or None if the lead should be
+            generated individually
+        """
+        cohort = self.plan.cohort_for(lead)
+        if cohort is None or cohort in self._rejected:
+            return None
+
+        created = cohort not in self._templates
+        if created:
+            self._templates[cohort] = asyncio.ensure_future(
+                self.email_generator.agenerate_cohort_template(lead, self.product)
+            )
+            self._remaining.setdefault(cohort, self.plan.size(cohort))
+        task = self._templates[cohort]
+
+        try:
+            subject_line, email_body = await task
+        except Exception as e:
+            print(f"Error generating cohort template: {e}")
+            subject_line, email_body = "Error", str(e)
+        finally:
+            # Drop the template once every lead of the cohort has used it
+            self._remaining[cohort] -= 1
+            if self._remaining[cohort] <= 0:
+                self._templates.pop(cohort, None)
+                del self._remaining[cohort]
+
+        if subject_line == "Error":
+            # Let the next lead of the cohort try again
+            if self._templates.get(cohort) is task:
+                del self._templates[cohort]
+            return None
+
+        missing = missing_placeholders(subject_line, email_body)
+        if missing:
+            if created:
+                print(f"Cohort template lacks {', '.join(missing)}, generating its leads individually")
+                get_metrics().increment("cohort_templates_rejected")
+            self._rejected.add(cohort)
+            self._templates.pop(cohort, None)
+            return None
+
+        if not created:
+            get_metrics().increment("cohort_calls_saved")
+        opening = await self._opening(lead)
+        return personalize(subject_line, lead, opening), personalize(email_body, lead, opening)
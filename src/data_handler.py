@@ -1,23 +1,48 @@
 """Data handler for processing lead and product information."""
 import json
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Iterator
+
+from app.json_stream import iter_json_array, iter_jsonl, read_json_member
+from app.lead_record import LeadInterner
+from app.lead_store import LeadStore
+from app.metrics import timed
+
+JSONL_EXTENSIONS = (".jsonl", ".ndjson")
 
 
 class DataHandler:
-    """Class to handle loading and processing of lead and product data."""
+    """Class to handle loading and processing of lead and product data.
 
-    def __init__(self, data_path: str):
+    Two input formats are supported: a JSON document with ``leads`` and
+    ``product`` members, and JSON Lines where each line is a lead and the
+    product is given by a line of the form ``{"product": {...}}``.
+    """
+
+    def __init__(self, data_path: str, streaming: bool = False, persist_index: bool = False, compact: bool = False):
         """Initialize with path to data file.
 
         Args:
-            data_path: Path to the JSON data file
+            data_path: Path to the JSON or JSONL data file
+            streaming: Read leads lazily from disk instead of loading them all
+            persist_index: Save the lead id index next to the data file for reuse
+            compact: Keep loaded leads as LeadRecords sharing repeated values
+                instead of plain dicts (ignored in streaming mode)
         """
         self.data_path = data_path
+        self.streaming = streaming
+        self.compact = compact and not streaming
+        self.lead_store = LeadStore(data_path, persist_index=persist_index)
+        self.is_jsonl = data_path.lower().endswith(JSONL_EXTENSIONS)
         if not os.path.exists(data_path):
             print(f"Warning: Data file {data_path} not found")
-        self.data = self._load_data()
+        if streaming:
+            # Only the product section is kept in memory; leads come from iter_leads
+            self.data = {"leads": [], "product": self._load_product()}
+        else:
+            self.data = self._load_data()
 
+    @timed("data_load")
     def _load_data(self) -> Dict[str, Any]:
         """Load data from JSON file.
 
@@ -28,7 +53,17 @@ class DataHandler:
             if not os.path.exists(self.data_path):
                 print(f"Error: Data file {self.data_path} not found")
                 return {"leads": [], "product": {}}
+
+            if self.compact:
+                # Leads are converted as they are parsed, so the dict form of
+                # the whole lead list never exists in memory
+                interner = LeadInterner()
+                return {"leads": [interner.compact(lead) for lead in self._stream_leads()],
+                        "product": self._load_product()}
                 
+            if self.is_jsonl:
+                return {"leads": list(self._stream_leads()), "product": self._load_product()}
+
             with open(self.data_path, 'r') as file:
                 data = json.load(file)
                 # Validate expected structure
@@ -42,6 +77,76 @@ class DataHandler:
             print(f"Error loading data: {e}")
             return {"leads": [], "product": {}}
 
+    @timed("product_load")
+    def _load_product(self) -> Dict[str, Any]:
+        """Read only the product section from the data file.
+
+        Returns:
+            Dict containing product information or empty dict if unavailable
+        """
+        try:
+            if not os.path.exists(self.data_path):
+                return {}
+            if self.is_jsonl:
+                for _, record, _ in iter_jsonl(self.data_path):
+                    if self._is_product_record(record):
+                        return record["product"]
+                print("Warning: Data file missing 'product' record")
+                return {}
+            product = read_json_member(self.data_path, "product")
+            if product is None:
+                print("Warning: Data file missing 'product' section")
+                return {}
+            return product
+        except (ValueError, json.JSONDecodeError):
+            print(f"Error: Invalid JSON format in {self.data_path}")
+            return {}
+        except Exception as e:
+            print(f"Error loading product data: {e}")
+            return {}
+
+    @staticmethod
+    def _is_product_record(record: Any) -> bool:
+        """Check whether a JSONL record holds the product section."""
+        return isinstance(record, dict) and "product" in record and "id" not in record
+
+    def _stream_leads(self) -> Iterator[Dict[str, Any]]:
+        """Yield leads directly from the data file.
+
+        Yields:
+            Lead dictionaries in file order
+        """
+        if self.is_jsonl:
+            for _, record, _ in iter_jsonl(self.data_path):
+                if not self._is_product_record(record):
+                    yield record
+        else:
+            for _, lead, _ in iter_json_array(self.data_path, "leads"):
+                yield lead
+
+    def iter_leads(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over all leads without materializing them as a list.
+
+        In streaming mode leads are parsed from disk one at a time, keeping
+        memory flat regardless of file size.
+
+        Yields:
+            Lead dictionaries in file order
+        """
+        if not self.streaming:
+            yield from self.data.get("leads", [])
+            return
+
+        try:
+            if not os.path.exists(self.data_path):
+                print(f"Error: Data file {self.data_path} not found")
+                return
+            yield from self._stream_leads()
+        except (ValueError, json.JSONDecodeError):
+            print(f"Error: Invalid JSON format in {self.data_path}")
+        except Exception as e:
+            print(f"Error streaming leads: {e}")
+
     def get_lead_by_id(self, lead_id: int) -> Dict[str, Any]:
         """Get a specific lead by its ID.
 
@@ -51,10 +156,14 @@ class DataHandler:
         Returns:
             Dict containing lead information or empty dict if not found
         """
-        for lead in self.data.get("leads", []):
-            if lead.get("id") == lead_id:
-                return lead
-        return {}
+        try:
+            return self.lead_store.get(lead_id)
+        except (ValueError, json.JSONDecodeError):
+            print(f"Error: Invalid JSON format in {self.data_path}")
+            return {}
+        except Exception as e:
+            print(f"Error looking up lead {lead_id}: {e}")
+            return {}
 
     def get_all_leads(self) -> List[Dict[str, Any]]:
         """Get all leads from the data.
@@ -62,6 +171,8 @@ class DataHandler:
         Returns:
             List of lead dictionaries
         """
+        if self.streaming:
+            return list(self.iter_leads())
         return self.data.get("leads", [])
 
     def get_product_info(self) -> Dict[str, Any]:
@@ -0,0 +1,108 @@
+"""Offline estimation of the tokens, cost and duration of a generation run."""
+import itertools
+import math
+from typing import Any, Dict, Optional, Tuple
+
+from app.data_handler import DataHandler
+from app.llm_interface import LLMInterface
+from app.metrics import get_metrics
+
+# USD per million (input, output) tokens
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4": (30.00, 60.00)
+}
+
+# The prompts ask for a subject line and a 150-200 word body
+ESTIMATED_COMPLETION_TOKENS = 300
+
+# Rough latency model: fixed overhead per request plus generation speed
+REQUEST_OVERHEAD_SECONDS = 0.5
+OUTPUT_TOKENS_PER_SECOND = 60.0
+
+
+def estimate_run(
+    data_path: str,
+    llm_interface: LLMInterface,
+    model_name: str = "gpt-3.5-turbo",
+    pack_size: int = 1,
+    concurrency: int = 1,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+    input_price: Optional[float] = None,
+    output_price: Optional[float] = None
+) -> Dict[str, Any]:
+    """Build every prompt of a run locally and project its size, cost and duration.
+
+    No request is sent to the model. Prompts are built exactly as in a real
+    run, including prompt budgets and lead packing.
+
+    Args:
+        data_path: Path to the JSON or JSONL data file
+        llm_interface: Interface whose prompt builders and budgets are used
+        model_name: Model whose prices are used for the cost estimate
+        pack_size: Number of leads combined into one packed request
+        concurrency: Maximum number of in-flight requests
+        requests_per_minute: Optional limit on LLM requests per minute
+        tokens_per_minute: Optional limit on prompt tokens per minute
+        input_price: USD per million input tokens, overriding the model's price
+        output_price: USD per million output tokens, overriding the model's price
+
+    Returns:
+        Report with lead, request and token totals and the projected cost and duration
+    """
+    data_handler = DataHandler(data_path, streaming=True)
+    product = data_handler.get_product_info()
+    trimmed_before = get_metrics().counter("prompt_fields_trimmed")
+
+    leads = 0
+    requests = 0
+    input_tokens = 0
+    max_prompt_tokens = 0
+    lead_iter = data_handler.iter_leads()
+    while True:
+        batch = list(itertools.islice(lead_iter, pack_size))
+        if not batch:
+            break
+        if len(batch) == 1:
+            prompt = llm_interface.create_email_prompt(batch[0], product)
+        else:
+            prompt = llm_interface.create_packed_email_prompt(batch, product)
+        tokens = llm_interface.estimate_tokens(prompt)
+        leads += len(batch)
+        requests += 1
+        input_tokens += tokens
+        max_prompt_tokens = max(max_prompt_tokens, tokens)
+
+    output_tokens = leads * ESTIMATED_COMPLETION_TOKENS
+
+    default_prices = MODEL_PRICES.get(model_name, (None, None))
+    input_price = input_price if input_price is not None else default_prices[0]
+    output_price = output_price if output_price is not None else default_prices[1]
+    cost = None
+    if input_price is not None and output_price is not None:
+        cost = round((input_tokens * input_price + output_tokens * output_price) / 1_000_000, 4)
+
+    # The run takes as long as the slowest of concurrency, request rate and token rate allows
+    tokens_per_request = output_tokens / requests if requests else 0
+    request_seconds = REQUEST_OVERHEAD_SECONDS + tokens_per_request / OUTPUT_TOKENS_PER_SECOND
+    duration = math.ceil(requests / concurrency) * request_seconds if requests else 0.0
+    if requests_per_minute:
+        duration = max(duration, requests * 60.0 / requests_per_minute)
+    if tokens_per_minute:
+        duration = max(duration, input_tokens * 60.0 / tokens_per_minute)
+
+    return {
+        "model": model_name,
+        "leads": leads,
+        "requests": requests,
+        "input_tokens": input_tokens,
+        "estimated_output_tokens": output_tokens,
+        "max_prompt_tokens": max_prompt_tokens,
+        "fields_trimmed": int(get_metrics().counter("prompt_fields_trimmed") - trimmed_before),
+        "estimated_cost_usd": cost,
+        "estimated_duration_s": round(duration, 1)
+    }
@@ -1,7 +1,118 @@
 """Module for generating personalized sales emails."""
-from typing import Dict, Any, Tuple
+import asyncio
+import re
+import time
+from typing import Dict, Any, AsyncIterator, Iterator, List, NamedTuple, Optional, Tuple
 
-from app.llm_interface import LLMInterface
+from app.llm_interface import LLMFailure, LLMInterface
+from app.metrics import get_metrics, timed
+
+# Matches the "=== EMAIL n ===" delimiter lines of a packed response, including ones with a malformed number
+PACKED_MARKER_PATTERN = re.compile(r"^\s*=+\s*EMAIL\b[ \t]*([^=\n]*?)\s*=+\s*$", re.IGNORECASE | re.MULTILINE)
+
+
+class EmailChunk(NamedTuple):
+    """One piece of a streamed email."""
+
+    kind: str  # "subject" or "body"
+    text: str
+
+
+class EmailStreamParser:
+    """Incremental counterpart of ``EmailGenerator._parse_generated_content``.
+
+    Generated text is fed in as it arrives. The subject line is emitted as
+    soon as its line is complete and everything after it is emitted as body
+    chunks; joining the body chunks gives the same body as the
+    non-streaming parser. Text before the subject line is held back until
+    the subject is found or the stream ends.
+    """
+
+    SUBJECT_PREFIXES = ("subject line:", "subject:")
+
+    def __init__(self):
+        self.subject_line: Optional[str] = None
+        self._buffer = ""
+        self._scan_pos = 0
+        self._fallback = False
+        self._body_started = False
+        self._pending_space = ""
+
+    def _subject_from_line(self, line: str) -> Optional[str]:
+        """Return the subject if the line is a subject line, otherwise None."""
+        line = line.strip()
+        lowered = line.lower()
+        for prefix in self.SUBJECT_PREFIXES:
+            if lowered.startswith(prefix):
+                return line[len(prefix):].strip()
+        return None
+
+    def _body(self, text: str) -> List[EmailChunk]:
+        """Emit body text, dropping leading and holding back trailing whitespace."""
+        if not self._body_started:
+            text = text.lstrip()
+            if not text:
+                return []
+            self._body_started = True
+        text = self._pending_space + text
+        stripped = text.rstrip()
+        self._pending_space = text[len(stripped):]
+        return [EmailChunk("body", stripped)] if stripped else []
+
+    def feed(self, text: str) -> List[EmailChunk]:
+        """Consume the next piece of generated text.
+
+        Args:
+            text: Newly generated text
+
+        Returns:
+            Chunks that became available
+        """
+        if self.subject_line is not None:
+            return self._body(text)
+        self._buffer += text
+        if self._fallback:
+            return []
+
+        while True:
+            newline = self._buffer.find("\n", self._scan_pos)
+            if newline == -1:
+                return []
+            subject_line = self._subject_from_line(self._buffer[self._scan_pos:newline])
+            self._scan_pos = newline + 1
+            if subject_line is None:
+                continue
+            if not subject_line:
+                # An empty subject makes the whole content the body, as in the batch parser
+                self._fallback = True
+                return []
+            self.subject_line = subject_line
+            rest = self._buffer[newline + 1:]
+            self._buffer = ""
+            return [EmailChunk("subject", subject_line)] + self._body(rest)
+
+    def close(self) -> List[EmailChunk]:
+        """Finish the stream.
+
+        Returns:
+            Remaining chunks, including a default subject if none was found
+        """
+        if self.subject_line is not None:
+            return []
+        if not self._fallback:
+            subject_line = self._subject_from_line(self._buffer[self._scan_pos:])
+            if subject_line:
+                self.subject_line = subject_line
+                return [EmailChunk("subject", subject_line)]
+
+        content = self._buffer.strip()
+        if content.startswith("Error"):
+            self.subject_line = "Error"
+        elif content:
+            self.subject_line = "Generated Email"
+        else:
+            return [EmailChunk("subject", "")]
+        return [EmailChunk("subject", self.subject_line), EmailChunk("body", content)]
 
 
 class EmailGenerator:
@@ -15,6 +126,7 @@ class EmailGenerator:
         """
         self.llm_interface = llm_interface
 
+    @timed("parse")
     def _parse_generated_content(self, content: str) -> Tuple[str, str]:
         """Parse generated content to extract subject line and email body.
         
@@ -48,6 +160,89 @@ class EmailGenerator:
             
         return subject_line, email_body
 
+    def _split_packed_content(self, content: str, count: int) -> List[Optional[str]]:
+        """Split a packed multi-email response into per-lead sections.
+
+        Args:
+            content: Generated content containing delimited emails
+            count: Number of leads in the packed request
+
+        Returns:
+            List with one section per lead, or None where a section is missing
+        """
+        sections: List[Optional[str]] = [None] * count
+        markers = list(PACKED_MARKER_PATTERN.finditer(content))
+        for i, marker in enumerate(markers):
+            # A malformed marker still ends the previous section, but starts none
+            number = int(marker.group(1)) if marker.group(1).isdecimal() else 0
+            if not 1 <= number <= count or sections[number - 1] is not None:
+                continue
+            end = markers[i + 1].start() if i + 1 < len(markers) else len(content)
+            sections[number - 1] = content[marker.end():end].strip()
+        return sections
+
+    def _parse_packed_content(self, content: str, count: int) -> List[Optional[Tuple[str, str]]]:
+        """Parse a packed multi-email response into per-lead emails.
+
+        Sections without a subject line or body are treated as malformed.
+
+        Args:
+            content: Generated content containing delimited emails
+            count: Number of leads in the packed request
+
+        Returns:
+            List of (subject_line, email_body) tuples, or None for malformed entries
+        """
+        emails: List[Optional[Tuple[str, str]]] = []
+        for section in self._split_packed_content(content, count):
+            email = None
+            if section:
+                subject_line, email_body = self._parse_generated_content(section)
+                lowered = section.lower()
+                has_subject = lowered.startswith("subject line:") or lowered.startswith("subject:")
+                if has_subject and subject_line and email_body:
+                    email = (subject_line, email_body)
+            emails.append(email)
+        return emails
+
+    def _build_prompt(self, lead: Dict[str, Any], product: Dict[str, Any]) -> str:
+        """Build the generation prompt for a lead.
+
+        Args:
+            lead: Dictionary containing lead information
+            product: Dictionary containing product information
+
+        Returns:
+            Prompt string
+        """
+        return self.llm_interface.create_email_prompt(lead, product)
+
+    def _handle_generated_content(self, generated_content: str) -> Tuple[str, str]:
+        """Turn raw LLM output into a (subject_line, email_body) pair.
+
+        Args:
+            generated_content: Raw content returned by the LLM interface
+
+        Returns:
+            Tuple of (subject_line, email_body)
+
+        Raises:
+            Exception: The request's error if generated_content is an LLMFailure,
+                so callers can fall back or fail fast on an unavailable endpoint
+        """
+        if isinstance(generated_content, LLMFailure):
+            raise generated_content.error
+
+        # Handle error responses
+        if generated_content.startswith("Error"):
+            return "Error", generated_content
+
+        try:
+            return self._parse_generated_content(generated_content)
+        except Exception as e:
+            print(f"Error parsing generated content: {e}")
+            return "Generated Subject", f"Error parsing content: {str(e)}\n\n{generated_content}"
+
     def generate_email(self, lead: Dict[str, Any], product: Dict[str, Any]) -> Tuple[str, str]:
         """Generate a personalized email for a lead.
 
@@ -57,19 +252,248 @@ class EmailGenerator:
 
         Returns:
             Tuple of (subject_line, email_body)
+
+        Raises:
+            Exception: If the LLM request failed after its retries
         """
         if not lead or not product:
             return "Error", "Insufficient data provided to generate email."
             
-        prompt = self.llm_interface.create_email_prompt(lead, product)
+        prompt = self._build_prompt(lead, product)
         generated_content = self.llm_interface.generate_content(prompt)
-        
-        # Handle error responses
+        return self._handle_generated_content(generated_content)
+
+    async def agenerate_email(self, lead: Dict[str, Any], product: Dict[str, Any]) -> Tuple[str, str]:
+        """Generate a personalized email for a lead asynchronously.
+
+        Args:
+            lead: Dictionary containing lead information
+            product: Dictionary containing product information
+
+        Returns:
+            Tuple of (subject_line, email_body)
+
+        Raises:
+            Exception: If the LLM request failed after its retries
+        """
+        if not lead or not product:
+            return "Error", "Insufficient data provided to generate email."
+
+        prompt = self._build_prompt(lead, product)
+        generated_content = await self.llm_interface.agenerate_content(prompt)
+        return self._handle_generated_content(generated_content)
+
+    def _build_packed_prompt(self, leads: List[Dict[str, Any]], product: Dict[str, Any]) -> Optional[str]:
+        """Build a packed prompt, or return None if the leads cannot be packed.
+
+        Args:
+            leads: List of lead dictionaries
+            product: Dictionary containing product information
+
+        Returns:
+            Prompt string or None
+        """
+        if len(leads) < 2 or not product or not all(leads):
+            return None
+        return self.llm_interface.create_packed_email_prompt(leads, product)
+
+    def _unpack_emails(self, generated_content: str, count: int) -> List[Optional[Tuple[str, str]]]:
+        """Turn a packed LLM response into per-lead emails.
+
+        Args:
+            generated_content: Raw content returned by the LLM interface
+            count: Number of leads in the packed request
+
+        Returns:
+            List of (subject_line, email_body) tuples, or None where a lead needs a retry
+        """
         if generated_content.startswith("Error"):
-            return "Error", generated_content
-            
+            return [None] * count
         try:
-            return self._parse_generated_content(generated_content)
+            return self._parse_packed_content(generated_content, count)
         except Exception as e:
-            print(f"Error parsing generated content: {e}")
-            return "Generated Subject", f"Error parsing content: {str(e)}\n\n{generated_content}"
\ No newline at end of file
+            print(f"Error parsing packed content: {e}")
+            return [None] * count
+
+    def generate_emails(self, leads: List[Dict[str, Any]], product: Dict[str, Any]) -> List[Tuple[str, str]]:
+        """Generate emails for several leads with a single packed request.
+
+        Leads whose entry is missing or malformed in the packed response fall
+        back to individual requests.
+
+        Args:
+            leads: List of lead dictionaries
+            product: Dictionary containing product information
+
+        Returns:
+            List of (subject_line, email_body) tuples in lead order
+        """
+        prompt = self._build_packed_prompt(leads, product)
+        if prompt is None:
+            return [self.generate_email(lead, product) for lead in leads]
+
+        emails = self._unpack_emails(self.llm_interface.generate_content(prompt), len(leads))
+        get_metrics().increment("packed_retries", sum(1 for email in emails if email is None))
+        return [
+            email if email is not None else self.generate_email(lead, product)
+            for lead, email in zip(leads, emails)
+        ]
+
+    async def agenerate_emails(self, leads: List[Dict[str, Any]], product: Dict[str, Any]) -> List[Tuple[str, str]]:
+        """Generate emails for several leads with a single packed request asynchronously.
+
+        Args:
+            leads: List of lead dictionaries
+            product: Dictionary containing product information
+
+        Returns:
+            List of (subject_line, email_body) tuples in lead order
+        """
+        prompt = self._build_packed_prompt(leads, product)
+        if prompt is None:
+            return list(await asyncio.gather(*(self.agenerate_email(lead, product) for lead in leads)))
+
+        emails = self._unpack_emails(await self.llm_interface.agenerate_content(prompt), len(leads))
+        missing = [i for i, email in enumerate(emails) if email is None]
+        if missing:
+            print(f"Packed response incomplete for {len(missing)} of {len(leads)} leads, retrying individually")
+            get_metrics().increment("packed_retries", len(missing))
+            retried = await asyncio.gather(*(self.agenerate_email(leads[i], product) for i in missing))
+            for i, email in zip(missing, retried):
+                emails[i] = email
+        return emails
+
+    def generate_cohort_template(self, lead: Dict[str, Any], product: Dict[str, Any]) -> Tuple[str, str]:
+        """Generate an email template with name, company and opening placeholders.
+
+        Args:
+            lead: Dictionary containing the profile shared by a cohort of leads
+            product: Dictionary containing product information
+
+        Returns:
+            Tuple of (subject_line, email_body) templates
+        """
+        if not lead or not product:
+            return "Error", "Insufficient data provided to generate email."
+
+        prompt = self.llm_interface.create_cohort_email_prompt(lead, product)
+        generated_content = self.llm_interface.generate_content(prompt)
+        return self._handle_generated_content(generated_content)
+
+    async def agenerate_cohort_template(self, lead: Dict[str, Any], product: Dict[str, Any]) -> Tuple[str, str]:
+        """Generate an email template for a cohort of leads asynchronously.
+
+        Args:
+            lead: Dictionary containing the profile shared by a cohort of leads
+            product: Dictionary containing product information
+
+        Returns:
+            Tuple of (subject_line, email_body) templates
+        """
+        if not lead or not product:
+            return "Error", "Insufficient data provided to generate email."
+
+        prompt = self.llm_interface.create_cohort_email_prompt(lead, product)
+        generated_content = await self.llm_interface.agenerate_content(prompt)
+        return self._handle_generated_content(generated_content)
+
+    @staticmethod
+    def _parse_opening(generated_content: str) -> Optional[str]:
+        """Extract the opening sentence from a follow-up response.
+
+        Args:
+            generated_content: Raw content returned by the LLM interface
+
+        Returns:
+            Opening sentence, or None if the response is unusable
+        """
+        if generated_content.startswith("Error"):
+            return None
+        for line in generated_content.strip().split('\n'):
+            line = line.strip().strip('"')
+            if line and not line.lower().startswith("subject"):
+                return line
+        return None
+
+    def generate_opening(self, lead: Dict[str, Any]) -> Optional[str]:
+        """Generate a one-sentence opening referencing the lead's LinkedIn activity.
+
+        Args:
+            lead: Dictionary containing lead information
+
+        Returns:
+            Opening sentence, or None if generation failed
+        """
+        prompt = self.llm_interface.create_opening_prompt(lead)
+        return self._parse_opening(self.llm_interface.generate_content(prompt))
+
+    async def agenerate_opening(self, lead: Dict[str, Any]) -> Optional[str]:
+        """Generate a one-sentence opening for a lead asynchronously.
+
+        Args:
+            lead: Dictionary containing lead information
+
+        Returns:
+            Opening sentence, or None if generation failed
+        """
+        prompt = self.llm_interface.create_opening_prompt(lead)
+        return self._parse_opening(await self.llm_interface.agenerate_content(prompt))
+
+    def stream_email(self, lead: Dict[str, Any], product: Dict[str, Any]) -> Iterator[EmailChunk]:
+        """Generate a personalized email for a lead, yielding it as it is produced.
+
+        The subject line is yielded as soon as the model finishes it, followed
+        by the body in chunks.
+
+        Args:
+            lead: Dictionary containing lead information
+            product: Dictionary containing product information
+
+        Yields:
+            EmailChunk items: one "subject" chunk, then "body" chunks
+        """
+        if not lead or not product:
+            yield EmailChunk("subject", "Error")
+            yield EmailChunk("body", "Insufficient data provided to generate email.")
+            return
+
+        started = time.perf_counter()
+        prompt = self._build_prompt(lead, product)
+        parser = EmailStreamParser()
+        for piece in self.llm_interface.stream_content(prompt):
+            for chunk in parser.feed(piece):
+                if chunk.kind == "subject":
+                    get_metrics().observe("stream_subject", time.perf_counter() - started)
+                yield chunk
+        for chunk in parser.close():
+            if chunk.kind == "subject":
+                get_metrics().observe("stream_subject", time.perf_counter() - started)
+            yield chunk
+
+    async def astream_email(self, lead: Dict[str, Any], product: Dict[str, Any]) -> AsyncIterator[EmailChunk]:
+        """Generate a personalized email for a lead asynchronously, yielding it as it is produced.
+
+        Args:
+            lead: Dictionary containing lead information
+            product: Dictionary containing product information
+
+        Yields:
+            EmailChunk items: one "subject" chunk, then "body" chunks
+        """
+        if not lead or not product:
+            yield EmailChunk("subject", "Error")
+            yield EmailChunk("body", "Insufficient data provided to generate email.")
+            return
+
+        started = time.perf_counter()
+        prompt = self._build_prompt(lead, product)
+        parser = EmailStreamParser()
+        async for piece in self.llm_interface.astream_content(prompt):
+            for chunk in parser.feed(piece):
+                if chunk.kind == "subject":
+                    get_metrics().observe("stream_subject", time.perf_counter() - started)
+                yield chunk
+        for chunk in parser.close():
+            if chunk.kind == "subject":
+                get_metrics().observe("stream_subject", time.perf_counter() - started)
+            yield chunk
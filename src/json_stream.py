@@ -0,0 +1,242 @@
+"""Incremental readers for large JSON and JSONL lead files."""
+import json
+from typing import Any, Iterator, Optional, TextIO, Tuple
+
+_WHITESPACE = " \t\n\r"
+
+
+class JSONStreamReader:
+    """Pull parser that reads a JSON document in chunks.
+
+    Values are decoded one at a time with ``json.JSONDecoder.raw_decode`` and
+    the consumed part of the buffer is discarded, so memory is bounded by the
+    largest single value read rather than by the size of the document.
+    ``position`` counts characters of the underlying stream, while
+    ``byte_position`` counts bytes in the stream's encoding, so array items
+    can be located in the raw file. Open the file with ``newline=""`` so the
+    two stay in step.
+    """
+
+    def __init__(self, file: TextIO, chunk_size: int = 1 << 16):
+        """Initialize the reader.
+
+        Args:
+            file: Text stream positioned at the start of a JSON document
+            chunk_size: Number of characters read from the stream at a time
+        """
+        self._file = file
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._offset = 0
+        self._eof = False
+        self._encoding = getattr(file, "encoding", None) or "utf-8"
+        # Bytes of the stream before buffer index _mark; advanced lazily, so each character is encoded once
+        self._byte_offset = 0
+        self._mark = 0
+
+    @property
+    def position(self) -> int:
+        """Position of the next unread character in the stream."""
+        return self._offset + self._pos
+
+    def _advance_bytes(self) -> None:
+        """Count the bytes of the buffer between the mark and the read position."""
+        if self._pos > self._mark:
+            text = self._buffer[self._mark:self._pos]
+            # ASCII text takes one byte per character in UTF-8 and the other ASCII-compatible encodings
+            self._byte_offset += len(text) if text.isascii() else len(text.encode(self._encoding))
+            self._mark = self._pos
+
+    @property
+    def byte_position(self) -> int:
+        """Byte offset of the next unread character in the stream."""
+        self._advance_bytes()
+        return self._byte_offset
+
+    def _fill(self) -> bool:
+        """Read the next chunk into the buffer.
+
+        Returns:
+            False if the end of the stream has been reached
+        """
+        if self._eof:
+            return False
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        # Drop the consumed prefix so the buffer never holds more than needed
+        self._advance_bytes()
+        self._mark = 0
+        self._offset += self._pos
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character ('' at end of input)."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        """Consume the given structural character.
+
+        Args:
+            char: Expected character
+
+        Raises:
+            ValueError: If the next character is different
+        """
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' at position {self.position}, found '{found or 'end of input'}'")
+        self._pos += 1
+
+    def decode_value(self) -> Any:
+        """Decode the next complete JSON value.
+
+        Returns:
+            The decoded value
+
+        Raises:
+            json.JSONDecodeError: If the value is malformed or truncated
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number ending at the buffer boundary may continue in the next chunk
+            if (end == len(self._buffer) and isinstance(value, (int, float))
+                    and not isinstance(value, bool) and self._fill()):
+                continue
+            self._pos = end
+            return value
+
+    def iter_object_keys(self) -> Iterator[str]:
+        """Iterate over the keys of the next JSON object.
+
+        After each key is yielded the caller must consume its value with
+        decode_value, iter_array or skip_value before resuming iteration.
+
+        Yields:
+            Object keys in document order
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.decode_value()
+            if not isinstance(key, str):
+                raise ValueError(f"Expected object key at position {self.position}")
+            self.expect(":")
+            yield key
+            separator = self.peek()
+            self._pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise ValueError(f"Expected ',' or '}}' at position {self.position - 1}")
+
+    def iter_array(self) -> Iterator[Tuple[int, Any, int]]:
+        """Iterate over the items of the next JSON array.
+
+        Yields:
+            Tuples of (start_offset, item, end_offset) with byte offsets
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            self.peek()
+            start = self.byte_position
+            item = self.decode_value()
+            yield start, item, self.byte_position
+            separator = self.peek()
+            self._pos += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"Expected ',' or ']' at position {self.position - 1}")
+
+    def skip_value(self) -> None:
+        """Consume the next value without holding large containers in memory."""
+        char = self.peek()
+        if char == "[":
+            for _ in self.iter_array():
+                pass
+        elif char == "{":
+            for _ in self.iter_object_keys():
+                self.skip_value()
+        else:
+            self.decode_value()
+
+
+def iter_json_array(path: str, key: str, encoding: str = "utf-8") -> Iterator[Tuple[int, Any, int]]:
+    """Stream the items of a top-level array member such as ``{"leads": [...]}``.
+
+    Args:
+        path: Path to the JSON document
+        key: Name of the top-level member holding the array
+        encoding: Text encoding used to open the file
+
+    Yields:
+        Tuples of (start_offset, item, end_offset) with byte offsets
+    """
+    with open(path, "r", encoding=encoding, newline="") as file:
+        reader = JSONStreamReader(file)
+        for member in reader.iter_object_keys():
+            if member == key and reader.peek() == "[":
+                yield from reader.iter_array()
+                return
+            reader.skip_value()
+
+
+def read_json_member(path: str, key: str, default: Optional[Any] = None) -> Any:
+    """Read a single top-level member of a JSON document without loading the rest.
+
+    Args:
+        path: Path to the JSON document
+        key: Name of the top-level member
+        default: Value returned when the member is absent
+
+    Returns:
+        The decoded member value or the default
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        reader = JSONStreamReader(file)
+        for member in reader.iter_object_keys():
+            if member == key:
+                return reader.decode_value()
+            reader.skip_value()
+    return default
+
+
+def iter_jsonl(path: str) -> Iterator[Tuple[int, Any, int]]:
+    """Stream the records of a JSON Lines file.
+
+    Args:
+        path: Path to the JSONL file
+
+    Yields:
+        Tuples of (start_offset, record, end_offset) with byte offsets
+    """
+    with open(path, "rb") as file:
+        offset = 0
+        for line in file:
+            start = offset
+            offset += len(line)
+            if line.strip():
+                yield start, json.loads(line), offset
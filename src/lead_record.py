@@ -0,0 +1,141 @@
+"""Compact in-memory representation of leads."""
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Tuple
+
+
+class LeadRecord(Mapping):
+    """Lead with one slot per known field.
+
+    Behaves like the lead dictionary it was built from (``get``, ``[]``,
+    ``in``, iteration, ``dict(record)``), so it can be passed anywhere a lead
+    dict is read. List fields are stored as tuples and fields missing from
+    the source stay unset, so ``get`` falls back to the caller's default
+    exactly as it does for a dict. Unknown fields are kept in a small
+    overflow dict.
+    """
+
+    FIELDS = ("id", "name", "job_title", "company", "industry", "interests", "pain_points", "linkedin_activity")
+    __slots__ = FIELDS + ("_extra",)
+
+    def __init__(self, fields: Dict[str, Any]):
+        """Initialize the record.
+
+        Args:
+            fields: Lead fields; values should already be interned where useful
+        """
+        extra = None
+        for key, value in fields.items():
+            if key in _FIELD_SET:
+                setattr(self, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        self._extra = extra
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in _FIELD_SET:
+            return getattr(self, key, default)
+        if self._extra is None:
+            return default
+        return self._extra.get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __contains__(self, key: object) -> bool:
+        if key in _FIELD_SET:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self.FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for key in self.FIELDS if hasattr(self, key)) + len(self._extra or ())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the lead as a plain dict with lists, as parsed from JSON."""
+        return {key: list(value) if isinstance(value, tuple) else value for key, value in self.items()}
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, LeadRecord):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"LeadRecord({self.to_dict()!r})"
+
+
+_FIELD_SET = frozenset(LeadRecord.FIELDS)
+
+
+class LeadInterner:
+    """Builds LeadRecords that share repeated values.
+
+    Titles, industries and the items of interest and pain point lists
+    repeat heavily across leads, so each distinct value (and each distinct
+    list, as a tuple) is stored once and referenced by every lead using it.
+    """
+
+    STRING_FIELDS = ("job_title", "industry")
+    LIST_FIELDS = ("interests", "pain_points")
+
+    def __init__(self):
+        """Initialize empty value pools."""
+        self._strings: Dict[str, str] = {}
+        self._tuples: Dict[Tuple[Any, ...], Tuple[Any, ...]] = {}
+
+    def _string(self, value: Any) -> Any:
+        """Return the pooled copy of a string value."""
+        if not isinstance(value, str):
+            return value
+        return self._strings.setdefault(value, value)
+
+    def _items(self, value: Any) -> Any:
+        """Return the pooled tuple for a list value."""
+        if not isinstance(value, (list, tuple)):
+            return self._string(value)
+        items = tuple(self._string(item) for item in value)
+        try:
+            return self._tuples.setdefault(items, items)
+        except TypeError:
+            # Lists of nested objects cannot be pooled
+            return items
+
+    def compact(self, lead: Any) -> Any:
+        """Convert a lead dict into a LeadRecord.
+
+        Args:
+            lead: Dictionary containing lead information
+
+        Returns:
+            The compact record, or the value unchanged if it is not a dict
+        """
+        if not isinstance(lead, dict):
+            return lead
+        fields = dict(lead)
+        for field in self.STRING_FIELDS:
+            if field in fields:
+                fields[field] = self._string(fields[field])
+        for field in self.LIST_FIELDS:
+            if field in fields:
+                fields[field] = self._items(fields[field])
+        return LeadRecord(fields)
+
+    def __len__(self) -> int:
+        return len(self._strings) + len(self._tuples)
+
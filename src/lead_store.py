@@ -0,0 +1,154 @@
+"""Indexed random access to leads in a data file."""
+import json
+import mmap
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from app.json_stream import iter_json_array, iter_jsonl
+
+INDEX_VERSION = 2
+
+
+class LeadStore:
+    """O(1) lead lookup by id backed by an id to byte-offset index.
+
+    The index is built once by streaming over the data file and can be
+    persisted next to it. Lookups read only the requested lead through a
+    memory map, so the dataset never has to be loaded as a whole. The index
+    is rebuilt automatically whenever the size or modification time of the
+    data file changes.
+    """
+
+    def __init__(self, data_path: str, persist_index: bool = False, index_path: Optional[str] = None):
+        """Initialize the lead store.
+
+        Args:
+            data_path: Path to the JSON or JSONL data file
+            persist_index: Save the index to disk and reuse it across runs
+            index_path: Location of the persisted index (defaults to <data_path>.idx)
+        """
+        self.data_path = data_path
+        self.persist_index = persist_index
+        self.index_path = index_path or f"{data_path}.idx"
+        self.is_jsonl = data_path.lower().endswith((".jsonl", ".ndjson"))
+
+        self._index: Dict[Any, Tuple[int, int]] = {}
+        self._signature: Optional[Tuple[int, int]] = None
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+
+    def _source_signature(self) -> Optional[Tuple[int, int]]:
+        """Return (size, mtime_ns) of the data file, or None if it is missing."""
+        try:
+            stat = os.stat(self.data_path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _ensure_fresh(self) -> None:
+        """Load or rebuild the index if the data file has changed."""
+        signature = self._source_signature()
+        if signature == self._signature:
+            return
+
+        self.close()
+        self._index = {}
+        if signature is None:
+            self._signature = None
+            return
+
+        if not (self.persist_index and self._load_index(signature)):
+            self._build_index()
+            if self.persist_index:
+                self._save_index(signature)
+
+        if signature[0] > 0:
+            self._file = open(self.data_path, "rb")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._signature = signature
+
+    def _build_index(self) -> None:
+        """Scan the data file and record the byte range of every lead."""
+        if self.is_jsonl:
+            records = iter_jsonl(self.data_path)
+        else:
+            records = iter_json_array(self.data_path, "leads")
+
+        for start, record, end in records:
+            if not isinstance(record, dict) or "id" not in record:
+                continue
+            # Keep the first occurrence, matching a front-to-back scan
+            self._index.setdefault(record["id"], (start, end - start))
+
+    def _load_index(self, signature: Tuple[int, int]) -> bool:
+        """Load a persisted index if it matches the current data file.
+
+        Args:
+            signature: Current (size, mtime_ns) of the data file
+
+        Returns:
+            True if a valid index was loaded
+        """
+        try:
+            with open(self.index_path, "r") as file:
+                stored = json.load(file)
+        except (OSError, ValueError):
+            return False
+
+        if stored.get("version") != INDEX_VERSION or stored.get("source") != list(signature):
+            return False
+        self._index = {lead_id: (offset, length) for lead_id, offset, length in stored.get("entries", [])}
+        return True
+
+    def _save_index(self, signature: Tuple[int, int]) -> None:
+        """Persist the index atomically next to the data file.
+
+        Args:
+            signature: (size, mtime_ns) of the data file the index describes
+        """
+        stored = {
+            "version": INDEX_VERSION,
+            "source": list(signature),
+            # Stored as a list so integer and string ids keep their types
+            "entries": [[lead_id, offset, length] for lead_id, (offset, length) in self._index.items()]
+        }
+        temp_path = f"{self.index_path}.tmp"
+        try:
+            with open(temp_path, "w") as file:
+                json.dump(stored, file)
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            print(f"Warning: Could not save lead index to {self.index_path}: {e}")
+
+    def get(self, lead_id: Any) -> Dict[str, Any]:
+        """Get a lead by its ID.
+
+        Args:
+            lead_id: The ID of the lead to retrieve
+
+        Returns:
+            Dict containing lead information or empty dict if not found
+        """
+        self._ensure_fresh()
+        entry = self._index.get(lead_id)
+        if entry is None or self._mmap is None:
+            return {}
+        offset, length = entry
+        return json.loads(self._mmap[offset:offset + length].decode("utf-8"))
+
+    def __contains__(self, lead_id: Any) -> bool:
+        self._ensure_fresh()
+        return lead_id in self._index
+
+    def __len__(self) -> int:
+        self._ensure_fresh()
+        return len(self._index)
+
+    def close(self) -> None:
+        """Release the memory map and file handle."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,402 @@
+"""Pluggable completion backends used by the LLM interface."""
+import asyncio
+import math
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from app.token_budget import count_tokens
+
+
+class LLMResult(NamedTuple):
+    """A completion together with its token usage."""
+
+    content: str
+    prompt_tokens: int
+    completion_tokens: int
+
+
+def approximate_token_count(text: str) -> int:
+    """Estimate the token count of a piece of text locally.
+
+    Used when a backend does not report token usage.
+
+    Args:
+        text: Text to estimate
+
+    Returns:
+        Approximate number of tokens
+    """
+    return count_tokens(text)
+
+
+class LLMBackend:
+    """Base class for completion backends.
+
+    Subclasses implement ``invoke`` and may override ``ainvoke`` with a
+    native asynchronous implementation.
+    """
+
+    model_name = "unknown"
+    # LangChain chat model for CrewAI agents, when the backend provides one
+    llm: Any = None
+
+    def for_model(self, model_name: str) -> "LLMBackend":
+        """Create a backend of the same kind serving another model.
+
+        Args:
+            model_name: Name of the model to use
+
+        Returns:
+            The new backend
+        """
+        raise NotImplementedError(f"{type(self).__name__} cannot serve other models")
+
+    def invoke(self, prompt: str) -> LLMResult:
+        """Generate a completion for a prompt.
+
+        Args:
+            prompt: Prompt text
+
+        Returns:
+            The completion and its token usage
+        """
+        raise NotImplementedError
+
+    async def ainvoke(self, prompt: str) -> LLMResult:
+        """Generate a completion for a prompt asynchronously.
+
+        Args:
+            prompt: Prompt text
+
+        Returns:
+            The completion and its token usage
+        """
+        return await asyncio.to_thread(self.invoke, prompt)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Generate a completion and yield its text as it arrives.
+
+        Backends without native streaming yield the whole completion at once.
+
+        Args:
+            prompt: Prompt text
+
+        Yields:
+            Consecutive pieces of the completion
+        """
+        yield self.invoke(prompt).content
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """Generate a completion asynchronously and yield its text as it arrives.
+
+        Args:
+            prompt: Prompt text
+
+        Yields:
+            Consecutive pieces of the completion
+        """
+        yield (await self.ainvoke(prompt)).content
+
+
+class NullBackend(LLMBackend):
+    """Backend for code paths that only build prompts, such as dry runs.
+
+    Every attempt to call a model raises, so a dry run can never spend tokens.
+    """
+
+    def __init__(self, model_name: str = "none"):
+        """Initialize the null backend.
+
+        Args:
+            model_name: Model name reported to the LLM interface
+        """
+        self.model_name = model_name
+
+    def for_model(self, model_name: str) -> "NullBackend":
+        """Create a null backend reporting another model name.
+
+        Args:
+            model_name: Model name reported to the LLM interface
+
+        Returns:
+            The new backend
+        """
+        return NullBackend(model_name)
+
+    def invoke(self, prompt: str) -> LLMResult:
+        """Refuse to generate a completion.
+
+        Args:
+            prompt: Prompt text
+
+        Raises:
+            RuntimeError: Always, since no model may be called
+        """
+        raise RuntimeError("NullBackend does not call a model")
+
+
+class OpenAIBackend(LLMBackend):
+    """Backend for OpenAI chat models through LangChain.
+
+    LangChain is imported when the backend is created rather than at module
+    import time, so runs using other backends never pay for loading it.
+    """
+
+    def __init__(self, api_key: str, model_name: str = "gpt-3.5-turbo", temperature: float = 0.7):
+        """Initialize the OpenAI backend.
+
+        Args:
+            api_key: OpenAI API key
+            model_name: Name of the model to use
+            temperature: Temperature setting for generation (0.0-1.0)
+        """
+        from langchain_openai import ChatOpenAI
+        from langchain.schema import HumanMessage
+
+        self._message_class = HumanMessage
+        self._api_key = api_key
+        self.model_name = model_name
+        self.temperature = temperature
+        self.llm = ChatOpenAI(
+            openai_api_key=api_key,
+            model=model_name,
+            temperature=temperature
+        )
+
+    def for_model(self, model_name: str) -> "OpenAIBackend":
+        return OpenAIBackend(self._api_key, model_name=model_name, temperature=self.temperature)
+
+    @staticmethod
+    def _to_result(prompt: str, response: Any) -> LLMResult:
+        """Convert a LangChain message into an LLMResult."""
+        metadata = getattr(response, "response_metadata", None) or {}
+        usage = metadata.get("token_usage") or {}
+        return LLMResult(
+            response.content,
+            usage.get("prompt_tokens") or approximate_token_count(prompt),
+            usage.get("completion_tokens") or approximate_token_count(response.content)
+        )
+
+    def invoke(self, prompt: str) -> LLMResult:
+        response = self.llm.invoke([self._message_class(content=prompt)])
+        return self._to_result(prompt, response)
+
+    async def ainvoke(self, prompt: str) -> LLMResult:
+        response = await self.llm.ainvoke([self._message_class(content=prompt)])
+        return self._to_result(prompt, response)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        for chunk in self.llm.stream([self._message_class(content=prompt)]):
+            if chunk.content:
+                yield chunk.content
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        async for chunk in self.llm.astream([self._message_class(content=prompt)]):
+            if chunk.content:
+                yield chunk.content
+
+
+class FakeLLMError(Exception):
+    """Simulated provider failure raised by FakeLLMBackend."""
+
+
+class FakeLLMBackend(LLMBackend):
+    """Deterministic local stand-in for a real model.
+
+    Responses are derived from a seeded random generator keyed by the
+    prompt, and latencies and failures additionally by how many times that
+    prompt has been sent, so a run produces the same output regardless of
+    concurrency or ordering while retries still see fresh outcomes. Only the
+    most recently sent prompts are counted, which keeps memory flat over long
+    runs. Packed multi-lead prompts are answered with one delimited email per
+    lead.
+    """
+
+    LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+    RESPONSE_SHAPES = ("email", "no_subject", "truncated", "empty")
+    # Share of the simulated latency spent before the first streamed chunk
+    FIRST_CHUNK_LATENCY_SHARE = 0.2
+    # Prompts whose send count is remembered; retries and hedges resend a prompt well within this window
+    MAX_TRACKED_PROMPTS = 10000
+
+    _WORDS = (
+        "teams", "pipeline", "outreach", "growth", "results", "workflow", "insight", "customers",
+        "automation", "quarter", "strategy", "revenue", "process", "data", "time", "scale"
+    )
+
+    def __init__(self, latency_ms: float = 0.0, latency_distribution: str = "fixed", error_rate: float = 0.0,
+                 response_shape: str = "email", body_words: int = 170, seed: int = 0, model_name: str = "fake"):
+        """Initialize the fake backend.
+
+        Args:
+            latency_ms: Mean simulated latency per request in milliseconds
+            latency_distribution: One of fixed, uniform, exponential or lognormal
+            error_rate: Probability (0.0-1.0) that a request raises FakeLLMError
+            response_shape: One of email, no_subject, truncated or empty
+            body_words: Number of words in each generated email body
+            seed: Seed that makes responses, latencies and errors reproducible
+            model_name: Model name reported to the LLM interface, which keeps
+                the cached responses of different fake models apart
+        """
+        if latency_distribution not in self.LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {latency_distribution}")
+        if response_shape not in self.RESPONSE_SHAPES:
+            raise ValueError(f"Unknown response shape: {response_shape}")
+        if not 0.0 <= error_rate <= 1.0:
+            raise ValueError("error_rate must be between 0.0 and 1.0")
+
+        self.model_name = model_name
+        self.latency_ms = latency_ms
+        self.latency_distribution = latency_distribution
+        self.error_rate = error_rate
+        self.response_shape = response_shape
+        self.body_words = body_words
+        self.seed = seed
+        self._attempts: "OrderedDict[str, int]" = OrderedDict()
+        self._attempts_lock = threading.Lock()
+
+    def for_model(self, model_name: str) -> "FakeLLMBackend":
+        return FakeLLMBackend(self.latency_ms, self.latency_distribution, self.error_rate, self.response_shape,
+                              self.body_words, self.seed, model_name=model_name)
+
+    def _rng(self, prompt: str, attempt: int = 0) -> random.Random:
+        """Create the random generator for a prompt and attempt number."""
+        return random.Random(f"{self.seed}:{attempt}:{prompt}")
+
+    def _next_attempt(self, prompt: str) -> int:
+        """Return how many times this prompt has been sent before."""
+        with self._attempts_lock:
+            attempt = self._attempts.get(prompt, 0)
+            self._attempts[prompt] = attempt + 1
+            self._attempts.move_to_end(prompt)
+            if len(self._attempts) > self.MAX_TRACKED_PROMPTS:
+                self._attempts.popitem(last=False)
+            return attempt
+
+    def _latency(self, rng: random.Random) -> float:
+        """Draw a latency in seconds from the configured distribution."""
+        mean = self.latency_ms / 1000.0
+        if mean <= 0:
+            return 0.0
+        if self.latency_distribution == "uniform":
+            return rng.uniform(0.0, 2 * mean)
+        if self.latency_distribution == "exponential":
+            return rng.expovariate(1.0 / mean)
+        if self.latency_distribution == "lognormal":
+            # sigma of 1 gives a realistic long tail; mu keeps the requested mean
+            sigma = 1.0
+            return rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+        return mean
+
+    def _email(self, rng: random.Random, name: str, company: str) -> str:
+        """Build one email in the configured response shape."""
+        words = [rng.choice(self._WORDS) for _ in range(max(0, self.body_words - 12))]
+        body = (
+            f"Hi {name},\n\nI noticed how {company} is growing and wanted to share an idea. "
+            + " ".join(words)
+            + ".\n\nWould you be open to a short call next week?"
+        )
+        subject = f"Subject Line: An idea for {company}"
+        if self.response_shape == "no_subject":
+            return body
+        if self.response_shape == "truncated":
+            return f"{subject}\n\n{body[:len(body) // 3]}"
+        return f"{subject}\n\n{body}"
+
+    def _respond(self, prompt: str, rng: random.Random) -> str:
+        """Build the response text for a prompt."""
+        if self.response_shape == "empty":
+            return ""
+        names = re.findall(r"^\s*Name:\s*(.+)$", prompt, re.MULTILINE) or ["there"]
+        companies = re.findall(r"^\s*Company:\s*(.+)$", prompt, re.MULTILINE)
+        companies += ["your company"] * (len(names) - len(companies))
+        emails = [self._email(rng, name.strip(), company.strip()) for name, company in zip(names, companies)]
+        if len(emails) == 1:
+            return emails[0]
+        return "\n".join(f"=== EMAIL {i} ===\n{email}" for i, email in enumerate(emails, start=1))
+
+    def _complete(self, prompt: str) -> Tuple[float, Union[LLMResult, FakeLLMError]]:
+        """Compute the simulated latency and outcome for a prompt.
+
+        Returns:
+            Tuple of (latency_seconds, LLMResult or FakeLLMError)
+        """
+        attempt_rng = self._rng(prompt, self._next_attempt(prompt))
+        latency = self._latency(attempt_rng)
+        if attempt_rng.random() < self.error_rate:
+            return latency, FakeLLMError("Simulated provider error")
+        content = self._respond(prompt, self._rng(prompt))
+        return latency, LLMResult(content, approximate_token_count(prompt), approximate_token_count(content))
+
+    def invoke(self, prompt: str) -> LLMResult:
+        latency, outcome = self._complete(prompt)
+        if latency:
+            time.sleep(latency)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def ainvoke(self, prompt: str) -> LLMResult:
+        latency, outcome = self._complete(prompt)
+        if latency:
+            await asyncio.sleep(latency)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    @staticmethod
+    def _chunks(content: str) -> List[str]:
+        """Split a completion into word-sized stream chunks."""
+        return re.findall(r"\s*\S+|\s+$", content) or [content]
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        # A fifth of the latency passes before the first chunk, the rest is spread over the chunks
+        latency, outcome = self._complete(prompt)
+        if latency:
+            time.sleep(latency * self.FIRST_CHUNK_LATENCY_SHARE)
+        if isinstance(outcome, Exception):
+            raise outcome
+        chunks = self._chunks(outcome.content)
+        for chunk in chunks:
+            yield chunk
+            if latency:
+                time.sleep(latency * (1 - self.FIRST_CHUNK_LATENCY_SHARE) / len(chunks))
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        latency, outcome = self._complete(prompt)
+        if latency:
+            await asyncio.sleep(latency * self.FIRST_CHUNK_LATENCY_SHARE)
+        if isinstance(outcome, Exception):
+            raise outcome
+        chunks = self._chunks(outcome.content)
+        for chunk in chunks:
+            yield chunk
+            if latency:
+                await asyncio.sleep(latency * (1 - self.FIRST_CHUNK_LATENCY_SHARE) / len(chunks))
+
+
+def create_backend(name: str, api_key: Optional[str] = None, model_name: str = "gpt-3.5-turbo",
+                   temperature: float = 0.7, **options: Any) -> LLMBackend:
+    """Create a backend by name.
+
+    Args:
+        name: Backend name ("openai" or "fake")
+        api_key: OpenAI API key for the openai backend
+        model_name: Name of the model to use
+        temperature: Temperature setting for generation (0.0-1.0)
+        **options: Extra keyword arguments for FakeLLMBackend
+
+    Returns:
+        The configured backend
+    """
+    if name == "fake":
+        return FakeLLMBackend(**options)
+    if name == "openai":
+        if not api_key:
+            raise ValueError("OpenAI API key is required for the openai backend")
+        return OpenAIBackend(api_key, model_name=model_name, temperature=temperature)
+    raise ValueError(f"Unknown LLM backend: {name}")
@@ -1,55 +1,561 @@
 """Interface for interacting with Language Learning Models."""
+import asyncio
 import os
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional, Tuple
 
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage
+from app.llm_backends import LLMBackend, LLMResult, OpenAIBackend, approximate_token_count
+from app.metrics import get_metrics, timed
+from app.rate_limiter import RateLimiter
+from app.response_cache import ResponseCache
+from app.resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, RetryPolicy
+from app.prompt_templates import CompiledPrompts, render_opening_prompt
+from app.token_budget import PromptBudget, count_tokens
+
+# Latencies observed before hedged requests are enabled
+HEDGE_MIN_SAMPLES = 20
+
+# Products whose compiled prompts are kept; a run normally uses a single product
+COMPILED_PROMPTS_CACHE_SIZE = 16
+
+
+class LLMFailure(str):
+    """Error text returned by generate_content when the request itself failed.
+
+    It reads like any other "Error generating content" string, and carries the
+    exception so callers can tell a failed request, which should trigger a
+    fallback, from a completion that merely looks wrong.
+    """
+
+    def __new__(cls, error: Exception) -> "LLMFailure":
+        text = super().__new__(cls, f"Error generating content: {str(error)}")
+        text.error = error
+        return text
 
 
 class LLMInterface:
     """Interface for interacting with Language Learning Models."""
 
-    def __init__(self, api_key: Optional[str] = None, model_name: str = "gpt-3.5-turbo", temperature: float = 0.7):
+    def __init__(self, api_key: Optional[str] = None, model_name: str = "gpt-3.5-turbo", temperature: float = 0.7,
+                 rate_limiter: Optional[RateLimiter] = None, cache: Optional[ResponseCache] = None,
+                 backend: Optional[LLMBackend] = None, retry_policy: Optional[RetryPolicy] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None, hedge_percentile: Optional[float] = None,
+                 prompt_budget: Optional[PromptBudget] = None):
         """Initialize the LLM interface.
 
         Args:
             api_key: OpenAI API key (optional, can use env var)
             model_name: Name of the model to use
             temperature: Temperature setting for generation (0.0-1.0)
+            rate_limiter: Optional limiter applied to async requests
+            cache: Optional response cache shared between requests
+            backend: Completion backend to use instead of OpenAI (no API key needed)
+            retry_policy: Backoff policy for failed requests (defaults to 3 attempts)
+            circuit_breaker: Breaker guarding the endpoint (defaults to 5 failures / 30s)
+            hedge_percentile: Latency percentile after which an async request is
+                duplicated and the first response wins (None disables hedging)
+            prompt_budget: Per-field token budgets applied to leads before building prompts
         """
+        self.model_name = backend.model_name if backend is not None else model_name
+        self.temperature = temperature
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        # When set, every request skips cache reads but still refreshes the cache
+        self.bypass_cache = False
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.hedge_percentile = hedge_percentile
+        self.prompt_budget = prompt_budget
+        self.latency_tracker = LatencyTracker()
+        self._compiled_prompts: Dict[int, CompiledPrompts] = {}
+        if backend is not None:
+            self.api_key = api_key
+            self.backend = backend
+            self.llm = backend.llm
+            return
+
         self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OpenAI API key is required. Set OPENAI_API_KEY environment variable or pass api_key parameter.")
             
         try:
-            self.llm = ChatOpenAI(
-                openai_api_key=self.api_key,
-                model=model_name,
-                temperature=temperature
-            )
+            self.backend = OpenAIBackend(self.api_key, model_name=model_name, temperature=temperature)
+            self.llm = self.backend.llm
         except Exception as e:
             print(f"Error initializing LLM: {e}")
             raise RuntimeError(f"Failed to initialize LLM: {e}")
 
-    def generate_content(self, prompt: str) -> str:
+    def _cache_lookup(self, prompt: str, bypass_cache: bool) -> Tuple[Optional[str], Optional[str]]:
+        """Look up a prompt in the response cache.
+
+        Args:
+            prompt: Prompt text to send to the LLM
+            bypass_cache: Skip the lookup (a fresh response is still stored)
+
+        Returns:
+            Tuple of (cache_key, cached_content); both None without a cache
+        """
+        if self.cache is None:
+            return None, None
+        key = ResponseCache.make_key(prompt, self.model_name, self.temperature)
+        if bypass_cache or self.bypass_cache:
+            return key, None
+        return key, self.cache.get(key)
+
+    def _cache_store(self, key: Optional[str], content: str) -> None:
+        """Store a successful response in the cache.
+
+        Args:
+            key: Cache key from _cache_lookup (None without a cache)
+            content: Generated content; error strings are never cached
+        """
+        if key is not None and not content.startswith("Error"):
+            self.cache.set(key, content)
+
+    async def _acache_lookup(self, prompt: str, bypass_cache: bool) -> Tuple[Optional[str], Optional[str]]:
+        """Async counterpart of _cache_lookup that reads the cache off the event loop.
+
+        SQLite reads can block on a contended database, which would stall
+        every in-flight request sharing the loop.
+
+        Args:
+            prompt: Prompt text to send to the LLM
+            bypass_cache: Skip the lookup (a fresh response is still stored)
+
+        Returns:
+            Tuple of (cache_key, cached_content); both None without a cache
+        """
+        if self.cache is None:
+            return None, None
+        key = ResponseCache.make_key(prompt, self.model_name, self.temperature)
+        if bypass_cache or self.bypass_cache:
+            return key, None
+        return key, await asyncio.to_thread(self.cache.get, key)
+
+    async def _acache_store(self, key: Optional[str], content: str) -> None:
+        """Async counterpart of _cache_store that writes the cache off the event loop.
+
+        Args:
+            key: Cache key from _acache_lookup (None without a cache)
+            content: Generated content; error strings are never cached
+        """
+        if key is not None and not content.startswith("Error"):
+            await asyncio.to_thread(self.cache.set, key, content)
+
+    @staticmethod
+    def _record_usage(response: LLMResult) -> None:
+        """Record request and token counters for a completed LLM call."""
+        metrics = get_metrics()
+        metrics.increment("llm_requests")
+        metrics.increment("prompt_tokens", response.prompt_tokens)
+        metrics.increment("completion_tokens", response.completion_tokens)
+
+    def _before_attempt(self, owner: object) -> None:
+        """Reject the attempt if the circuit breaker is open.
+
+        Args:
+            owner: Token of the attempt, released with the breaker's half-open trial afterwards
+        """
+        if not self.circuit_breaker.allow_request(owner):
+            get_metrics().increment("circuit_rejections")
+            raise CircuitOpenError("Circuit breaker open, LLM endpoint is failing")
+
+    def _after_attempt(self, started: float, error: Optional[Exception] = None) -> None:
+        """Record the outcome of one attempt with the breaker and latency tracker."""
+        elapsed = time.perf_counter() - started
+        get_metrics().observe("llm_call", elapsed)
+        if error is None:
+            self.circuit_breaker.record_success()
+            self.latency_tracker.record(elapsed)
+        elif self.circuit_breaker.record_failure():
+            get_metrics().increment("circuit_opened")
+
+    def _retry_delay(self, attempt: int, error: Exception) -> Optional[float]:
+        """Return the backoff before retrying, or None if the error is final."""
+        if attempt >= self.retry_policy.max_attempts or not self.retry_policy.is_retryable(error):
+            return None
+        get_metrics().increment("llm_retries")
+        return self.retry_policy.delay(attempt, error)
+
+    def _invoke(self, prompt: str) -> LLMResult:
+        """Call the backend with retries and circuit breaking.
+
+        Args:
+            prompt: Prompt text to send to the LLM
+
+        Returns:
+            The completion and its token usage
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            owner = object()
+            self._before_attempt(owner)
+            started = time.perf_counter()
+            try:
+                response = self.backend.invoke(prompt)
+            except Exception as e:
+                self._after_attempt(started, e)
+                delay = self._retry_delay(attempt, e)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            else:
+                self._after_attempt(started)
+                return response
+            finally:
+                # An attempt interrupted before its outcome was recorded must not keep the half-open trial
+                self.circuit_breaker.release_trial(owner)
+
+    def _hedge_allowed(self, prompt: str, owner: object) -> bool:
+        """Check the circuit breaker and take rate limit budget for a duplicate request.
+
+        Args:
+            prompt: Prompt text of the request
+            owner: Token of the duplicate, released with the breaker's half-open trial afterwards
+
+        Returns:
+            True if the duplicate may be sent
+        """
+        if not self.circuit_breaker.allow_request(owner):
+            return False
+        if self.rate_limiter and self.rate_limiter.enabled and \
+                not self.rate_limiter.try_acquire(self.estimate_tokens(prompt)):
+            self.circuit_breaker.release_trial(owner)
+            return False
+        return True
+
+    async def _ainvoke_hedged(self, prompt: str) -> LLMResult:
+        """Call the backend, duplicating the request if it runs unusually long.
+
+        Once enough latencies have been observed, a second identical request is
+        started when the first exceeds the configured latency percentile, and
+        whichever finishes first successfully wins. The duplicate is skipped
+        when the circuit breaker rejects it or the rate limiter has no budget
+        for it right away, so hedging never spends quota the limiter does not
+        know about.
+
+        Args:
+            prompt: Prompt text to send to the LLM
+
+        Returns:
+            The completion and its token usage
+        """
+        threshold = None
+        if self.hedge_percentile is not None and len(self.latency_tracker) >= HEDGE_MIN_SAMPLES:
+            threshold = self.latency_tracker.percentile(self.hedge_percentile)
+        if threshold is None:
+            return await self.backend.ainvoke(prompt)
+
+        primary = asyncio.ensure_future(self.backend.ainvoke(prompt))
+        done, _ = await asyncio.wait({primary}, timeout=threshold)
+        if done:
+            return primary.result()
+
+        owner = object()
+        if not self._hedge_allowed(prompt, owner):
+            get_metrics().increment("llm_hedges_suppressed")
+            return await primary
+
+        get_metrics().increment("llm_hedges")
+        hedge = asyncio.ensure_future(self.backend.ainvoke(prompt))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            get_metrics().increment("llm_hedge_wins")
+                        return task.result()
+            # Both requests failed; surface the original error
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            # The caller records the attempt's outcome, so a duplicate holding the half-open trial hands it back
+            self.circuit_breaker.release_trial(owner)
+
+    async def _ainvoke(self, prompt: str) -> LLMResult:
+        """Call the backend asynchronously with rate limiting, retries and circuit breaking.
+
+        Args:
+            prompt: Prompt text to send to the LLM
+
+        Returns:
+            The completion and its token usage
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            owner = object()
+            self._before_attempt(owner)
+            try:
+                if self.rate_limiter and self.rate_limiter.enabled:
+                    with get_metrics().timer("rate_limit_wait"):
+                        await self.rate_limiter.acquire(self.estimate_tokens(prompt))
+                started = time.perf_counter()
+                try:
+                    response = await self._ainvoke_hedged(prompt)
+                except Exception as e:
+                    self._after_attempt(started, e)
+                    delay = self._retry_delay(attempt, e)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+                    continue
+                self._after_attempt(started)
+                return response
+            finally:
+                # A cancelled attempt, e.g. while waiting for the rate limiter, must not keep the half-open trial
+                self.circuit_breaker.release_trial(owner)
+
+    def generate_content(self, prompt: str, bypass_cache: bool = False) -> str:
         """Generate content using the LLM.
 
         Args:
             prompt: Prompt text to send to the LLM
+            bypass_cache: Ignore any cached response for this prompt
 
         Returns:
-            Generated content as string
+            Generated content as string, or an LLMFailure if the request failed
         """
         if not prompt:
             return "Error: Empty prompt provided"
+
+        key, cached = self._cache_lookup(prompt, bypass_cache)
+        if cached is not None:
+            get_metrics().increment("cache_hits")
+            return cached
+
+        self._count_prompt(prompt)
             
         try:
-            response = self.llm.invoke([HumanMessage(content=prompt)])
+            response = self._invoke(prompt)
+            self._record_usage(response)
+            self._cache_store(key, response.content)
+            return response.content
+        except Exception as e:
+            get_metrics().increment("llm_errors")
+            print(f"Error generating content: {e}")
+            return LLMFailure(e)
+
+    async def agenerate_content(self, prompt: str, bypass_cache: bool = False) -> str:
+        """Generate content asynchronously using the LLM.
+
+        Args:
+            prompt: Prompt text to send to the LLM
+            bypass_cache: Ignore any cached response for this prompt
+
+        Returns:
+            Generated content as string, or an LLMFailure if the request failed
+        """
+        if not prompt:
+            return "Error: Empty prompt provided"
+
+        key, cached = await self._acache_lookup(prompt, bypass_cache)
+        if cached is not None:
+            get_metrics().increment("cache_hits")
+            return cached
+
+        self._count_prompt(prompt)
+
+        try:
+            response = await self._ainvoke(prompt)
+            self._record_usage(response)
+            await self._acache_store(key, response.content)
             return response.content
         except Exception as e:
+            get_metrics().increment("llm_errors")
+            print(f"Error generating content: {e}")
+            return LLMFailure(e)
+
+    def _finish_stream(self, prompt: str, pieces: List[str]) -> str:
+        """Record usage of a completed stream.
+
+        Returns:
+            The complete content, to be cached by the caller
+        """
+        content = "".join(pieces)
+        self._record_usage(LLMResult(content, approximate_token_count(prompt), approximate_token_count(content)))
+        return content
+
+    def stream_content(self, prompt: str, bypass_cache: bool = False) -> Iterator[str]:
+        """Generate content using the LLM and yield it as it arrives.
+
+        Failed attempts are retried as long as nothing has been yielded yet;
+        a failure after the first piece ends the stream early and the partial
+        content is not cached. Errors before the first piece are yielded as a
+        single "Error generating content" piece, like generate_content.
+
+        Args:
+            prompt: Prompt text to send to the LLM
+            bypass_cache: Ignore any cached response for this prompt
+
+        Yields:
+            Consecutive pieces of the generated content
+        """
+        if not prompt:
+            yield "Error: Empty prompt provided"
+            return
+
+        key, cached = self._cache_lookup(prompt, bypass_cache)
+        if cached is not None:
+            get_metrics().increment("cache_hits")
+            yield cached
+            return
+
+        self._count_prompt(prompt)
+
+        pieces: List[str] = []
+        try:
+            attempt = 0
+            while True:
+                attempt += 1
+                owner = object()
+                self._before_attempt(owner)
+                try:
+                    started = time.perf_counter()
+                    try:
+                        for piece in self.backend.stream(prompt):
+                            if not pieces:
+                                get_metrics().observe("llm_first_chunk", time.perf_counter() - started)
+                            pieces.append(piece)
+                            yield piece
+                    except Exception as e:
+                        self._after_attempt(started, e)
+                        delay = None if pieces else self._retry_delay(attempt, e)
+                        if delay is None:
+                            raise
+                        time.sleep(delay)
+                        continue
+                    self._after_attempt(started)
+                    break
+                finally:
+                    # A stream the caller abandons must not keep the half-open trial
+                    self.circuit_breaker.release_trial(owner)
+        except Exception as e:
+            get_metrics().increment("llm_errors")
             print(f"Error generating content: {e}")
-            return f"Error generating content: {str(e)}"
+            if not pieces:
+                yield f"Error generating content: {str(e)}"
+            return
+
+        self._cache_store(key, self._finish_stream(prompt, pieces))
+
+    async def astream_content(self, prompt: str, bypass_cache: bool = False) -> AsyncIterator[str]:
+        """Generate content asynchronously using the LLM and yield it as it arrives.
+
+        Args:
+            prompt: Prompt text to send to the LLM
+            bypass_cache: Ignore any cached response for this prompt
+
+        Yields:
+            Consecutive pieces of the generated content
+        """
+        if not prompt:
+            yield "Error: Empty prompt provided"
+            return
+
+        key, cached = await self._acache_lookup(prompt, bypass_cache)
+        if cached is not None:
+            get_metrics().increment("cache_hits")
+            yield cached
+            return
+
+        self._count_prompt(prompt)
+
+        pieces: List[str] = []
+        try:
+            attempt = 0
+            while True:
+                attempt += 1
+                owner = object()
+                self._before_attempt(owner)
+                try:
+                    if self.rate_limiter and self.rate_limiter.enabled:
+                        with get_metrics().timer("rate_limit_wait"):
+                            await self.rate_limiter.acquire(self.estimate_tokens(prompt))
+                    started = time.perf_counter()
+                    try:
+                        async for piece in self.backend.astream(prompt):
+                            if not pieces:
+                                get_metrics().observe("llm_first_chunk", time.perf_counter() - started)
+                            pieces.append(piece)
+                            yield piece
+                    except Exception as e:
+                        self._after_attempt(started, e)
+                        delay = None if pieces else self._retry_delay(attempt, e)
+                        if delay is None:
+                            raise
+                        await asyncio.sleep(delay)
+                        continue
+                    self._after_attempt(started)
+                    break
+                finally:
+                    # A cancelled or abandoned stream must not keep the half-open trial
+                    self.circuit_breaker.release_trial(owner)
+        except Exception as e:
+            get_metrics().increment("llm_errors")
+            print(f"Error generating content: {e}")
+            if not pieces:
+                yield f"Error generating content: {str(e)}"
+            return
+
+        await self._acache_store(key, self._finish_stream(prompt, pieces))
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Count the tokens of a piece of text locally.
+
+        Args:
+            text: Text to estimate
+
+        Returns:
+            Approximate number of tokens
+        """
+        return count_tokens(text)
 
+    def _count_prompt(self, prompt: str) -> None:
+        """Record the locally counted size of a prompt about to be sent."""
+        get_metrics().increment("prompt_tokens_local", self.estimate_tokens(prompt))
+
+    def apply_prompt_budget(self, lead: Dict[str, Any]) -> Dict[str, Any]:
+        """Trim oversized lead fields to the configured token budgets.
+
+        Args:
+            lead: Dictionary containing lead information
+
+        Returns:
+            The lead, or a trimmed copy if any field exceeded its budget
+        """
+        if self.prompt_budget is None or not lead:
+            return lead
+        return self.prompt_budget.apply(lead)
+
+    def compile_prompts(self, product: Dict[str, Any]) -> CompiledPrompts:
+        """Return the prompts compiled for a product, compiling them on first use.
+
+        Compiled prompts are cached by product object, so the product block
+        is rendered once per run rather than once per lead.
+
+        Args:
+            product: Dictionary containing product information
+
+        Returns:
+            Compiled prompts for the product
+        """
+        compiled = self._compiled_prompts.get(id(product))
+        if compiled is None or compiled.product is not product:
+            compiled = CompiledPrompts(product)
+            get_metrics().increment("prompt_compilations")
+            if len(self._compiled_prompts) >= COMPILED_PROMPTS_CACHE_SIZE:
+                self._compiled_prompts.pop(next(iter(self._compiled_prompts)), None)
+            self._compiled_prompts[id(product)] = compiled
+        return compiled
+
+    @timed("prompt_build")
     def create_email_prompt(self, lead: Dict[str, Any], product: Dict[str, Any]) -> str:
         """Create a prompt for email generation based on lead and product info.
 
@@ -60,52 +566,50 @@ class LLMInterface:
         Returns:
             Formatted prompt string
         """
-        # Handle missing data gracefully
-        lead_name = lead.get('name', 'Prospect')
-        lead_title = lead.get('job_title', 'Professional')
-        lead_company = lead.get('company', 'Company')
-        lead_industry = lead.get('industry', 'Industry')
-        lead_interests = ', '.join(lead.get('interests', ['professional growth']))
-        lead_pain_points = ', '.join(lead.get('pain_points', ['efficiency']))
-        lead_activity = lead.get('linkedin_activity', 'None')
-        
-        product_name = product.get('name', 'Our Product')
-        product_desc = product.get('description', 'A solution designed to help businesses')
-        product_features = ', '.join(product.get('key_features', ['customizable features']))
-        product_benefits = ', '.join(product.get('benefits', ['improved efficiency']))
-        
-        prompt = f"""
-        Create a personalized sales email for the following prospect:
-        
-        LEAD INFORMATION:
-        Name: {lead_name}
-        Job Title: {lead_title}
-        Company: {lead_company}
-        Industry: {lead_industry}
-        Interests: {lead_interests}
-        Pain Points: {lead_pain_points}
-        Recent LinkedIn Activity: {lead_activity}
-        
-        PRODUCT INFORMATION:
-        Product Name: {product_name}
-        Description: {product_desc}
-        Key Features: {product_features}
-        Benefits: {product_benefits}
-        
-        INSTRUCTIONS:
-        1. Generate a compelling subject line that references the lead's pain points or interests
-        2. Create a personalized email body that:
-           - Starts with a personalized opening that references their LinkedIn activity or industry
-           - Addresses their specific pain points
-           - Briefly introduces our product as a solution
-           - Mentions 1-2 relevant benefits or features
-           - Ends with a clear, low-pressure call to action
-        3. Keep the email concise (150-200 words)
-        4. Use a professional but conversational tone
-        
-        FORMAT YOUR RESPONSE AS:
-        Subject Line: [Your subject line here]
-        
-        [Your email body here]
-        """
-        return prompt
\ No newline at end of file
+        return self.compile_prompts(product).email_prompt(self.apply_prompt_budget(lead))
+
+    @timed("prompt_build")
+    def create_packed_email_prompt(self, leads: List[Dict[str, Any]], product: Dict[str, Any]) -> str:
+        """Create a single prompt that generates emails for several leads.
+
+        The product information and instructions are sent once, followed by
+        one numbered block per lead. The model is asked to answer with one
+        delimited email per lead so the response can be split back apart.
+
+        Args:
+            leads: List of lead dictionaries
+            product: Dictionary containing product information
+
+        Returns:
+            Formatted prompt string
+        """
+        return self.compile_prompts(product).packed_prompt([self.apply_prompt_budget(lead) for lead in leads])
+
+    @timed("prompt_build")
+    def create_cohort_email_prompt(self, lead: Dict[str, Any], product: Dict[str, Any]) -> str:
+        """Create a prompt for an email template shared by a cohort of similar leads.
+
+        The lead's name, company and LinkedIn activity are replaced by
+        placeholders so the generated email can be personalized locally for
+        every lead with the same profile.
+
+        Args:
+            lead: Dictionary containing the profile shared by the cohort
+            product: Dictionary containing product information
+
+        Returns:
+            Formatted prompt string
+        """
+        return self.compile_prompts(product).cohort_prompt(self.apply_prompt_budget(lead))
+
+    @timed("prompt_build")
+    def create_opening_prompt(self, lead: Dict[str, Any]) -> str:
+        """Create a short prompt for a one-sentence opening referencing LinkedIn activity.
+
+        Args:
+            lead: Dictionary containing lead information
+
+        Returns:
+            Formatted prompt string
+        """
+        return render_opening_prompt(self.apply_prompt_budget(lead))
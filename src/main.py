@@ -2,12 +2,34 @@
 import os
 import json
 import sys
+import argparse
+import asyncio
+import itertools
 import logging
-from typing import Dict, Any, List
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Iterable, Iterator, AsyncIterator, Callable, Optional, Tuple, Union
 
 from app.data_handler import DataHandler
 from app.llm_interface import LLMInterface
-from app.agent import EmailCrewAgent
+from app.manifest import RunManifest, lead_input_fingerprint, run_fingerprint
+from app.prompt_templates import PROMPT_TEMPLATE_VERSION
+from app.llm_backends import LLMBackend, NullBackend, create_backend
+from app.dry_run import estimate_run
+from app.agents import EmailCrewAgent
+from app.cohorts import CohortGenerator, CohortPlan
+from app.email_generator import EmailGenerator
+from app.rate_limiter import RateLimiter
+from app.response_cache import ResponseCache
+from app.results_sink import LeadKey, ResultsSink, keyed_leads
+from app.output_writers import OUTPUT_FORMATS, PerLeadFileWriter, aggregate_filename, create_output_writer
+from app.metrics import Metrics, get_metrics
+from app.resilience import RetryPolicy
+from app.routing import ModelTier, TieredRouter
+from app.sharding import merge_shards, parse_shard_spec, shard_filter, shard_output_path
+from app.service import EmailService, serve
+from app.token_budget import PromptBudget
 
 
 # Set up logging
@@ -21,108 +43,756 @@ logging.basicConfig(
 logger = logging.getLogger("email_generator")
 
 
-def generate_emails_for_all_leads(data_path: str, output_path: str = "output") -> List[Dict[str, Any]]:
+async def _generate_in_order(
+    leads: Iterable[Tuple[LeadKey, Dict[str, Any]]],
+    product: Dict[str, Any],
+    email_agent: EmailCrewAgent,
+    concurrency: int,
+    pack_size: int = 1,
+    cohorts: Optional[CohortGenerator] = None
+) -> AsyncIterator[Tuple[LeadKey, Dict[str, Any], Union[Tuple[str, str], Exception], float]]:
+    """Generate emails concurrently while yielding results in input order.
+
+    At most ``concurrency`` requests run at once, and only a small window of
+    requests is scheduled ahead of the oldest unfinished one, so memory stays
+    bounded however many leads the iterable produces. With ``pack_size``
+    above one, consecutive leads are grouped into a single packed request.
+
+    Args:
+        leads: Iterable of (key, lead) tuples from keyed_leads
+        product: Dictionary containing product information
+        email_agent: Agent used to generate each email
+        concurrency: Maximum number of in-flight requests
+        pack_size: Number of leads sent in each request
+        cohorts: Optional generator reusing one email across leads with matching profiles
+
+    Yields:
+        Tuples of (key, lead, outcome, elapsed_seconds) where outcome is either
+        (subject_line, email_body) or the exception raised for the lead
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def worker(batch: List[Dict[str, Any]]) -> Tuple[List[Union[Tuple[str, str], Exception]], float]:
+        async with semaphore:
+            started = time.perf_counter()
+            for lead in batch:
+                logger.info(f"Generating email for {lead.get('name', 'Unknown Lead')}...")
+            try:
+                outcomes = [None] * len(batch)
+                if cohorts is not None:
+                    outcomes = list(await asyncio.gather(*(cohorts.agenerate(lead) for lead in batch)))
+                remaining = [i for i, outcome in enumerate(outcomes) if outcome is None]
+                if len(remaining) == 1:
+                    outcomes[remaining[0]] = await email_agent.agenerate_email_for_lead(batch[remaining[0]], product)
+                elif remaining:
+                    generated = await email_agent.agenerate_emails_for_leads([batch[i] for i in remaining], product)
+                    for i, outcome in zip(remaining, generated):
+                        outcomes[i] = outcome
+            except Exception as e:
+                outcomes = [e] * len(batch)
+            return outcomes, time.perf_counter() - started
+
+    pending = deque()
+    window = concurrency * 2
+    lead_iter = iter(leads)
+    while True:
+        batch = list(itertools.islice(lead_iter, pack_size))
+        if not batch:
+            break
+        pending.append((batch, asyncio.create_task(worker([lead for _, lead in batch]))))
+        if len(pending) >= window:
+            oldest_batch, task = pending.popleft()
+            outcomes, elapsed = await task
+            for (key, lead), outcome in zip(oldest_batch, outcomes):
+                yield key, lead, outcome, elapsed
+
+    while pending:
+        oldest_batch, task = pending.popleft()
+        outcomes, elapsed = await task
+        for (key, lead), outcome in zip(oldest_batch, outcomes):
+            yield key, lead, outcome, elapsed
+
+
+def generate_emails_for_all_leads(data_path: str, output_path: str = "output", **options: Any) -> List[Dict[str, Any]]:
     """Generate emails for all leads in the dataset.
 
     Args:
         data_path: Path to the JSON data file
         output_path: Path to save the generated emails
+        **options: Pipeline options accepted by agenerate_emails_for_all_leads
 
     Returns:
         List of dictionaries containing lead info and generated emails
     """
+    return asyncio.run(agenerate_emails_for_all_leads(data_path, output_path, **options))
+
+
+async def agenerate_emails_for_all_leads(
+    data_path: str,
+    output_path: str = "output",
+    concurrency: int = 1,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+    cache: Optional[ResponseCache] = None,
+    bypass_cache: bool = False,
+    streaming: bool = False,
+    resume: bool = False,
+    return_results: bool = True,
+    pack_size: int = 1,
+    llm_backend: Optional[LLMBackend] = None,
+    on_result: Optional[Callable[[Dict[str, Any], float], None]] = None,
+    metrics_path: Optional[str] = None,
+    crew_pool_size: int = 2,
+    max_attempts: int = 3,
+    hedge_percentile: Optional[float] = None,
+    lead_filter: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    cohort_reuse: Optional[str] = None,
+    cohort_similarity: float = 0.8,
+    prompt_budget: Optional[PromptBudget] = None,
+    output_format: str = "json",
+    per_lead_files: bool = False,
+    output_batch_size: int = 1000,
+    output_fsync_every: int = 0,
+    incremental: bool = False,
+    compact_leads: bool = False,
+    routing_models: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """Generate emails for all leads in the dataset asynchronously.
+
+    Results and per-lead files are produced in the same order as the leads
+    appear in the data file, regardless of the concurrency level.
+
+    Args:
+        data_path: Path to the JSON or JSONL data file
+        output_path: Path to save the generated emails
+        concurrency: Maximum number of leads processed at the same time
+        requests_per_minute: Optional limit on LLM requests per minute
+        tokens_per_minute: Optional limit on prompt tokens per minute
+        cache: Optional response cache for LLM completions
+        bypass_cache: Skip cache reads while still refreshing cached responses
+        streaming: Read leads lazily from the data file instead of loading them all
+        resume: Skip leads completed by a previous run of the same output path
+        return_results: Return all results as a list; disable to keep memory flat
+        pack_size: Number of leads combined into one packed LLM request
+        llm_backend: Completion backend to use instead of OpenAI
+        on_result: Callback receiving each result and its generation time in seconds
+        metrics_path: Export run metrics here (.prom/.txt for Prometheus text, otherwise JSON)
+        crew_pool_size: Maximum number of CrewAI fallbacks running in parallel
+        max_attempts: Attempts per LLM request, including retries with backoff
+        hedge_percentile: Latency percentile after which a slow request is duplicated
+        lead_filter: Only process leads for which this predicate returns True
+        cohort_reuse: Generate one email per cohort of leads with matching profiles and
+            personalize it per lead ("substitute" locally, "followup" with a short prompt)
+        cohort_similarity: Minimum similarity for near-duplicate leads to share a cohort
+        prompt_budget: Per-field token budgets that trim oversized lead fields in prompts
+        output_format: Aggregate output format: "json", "jsonl" or "jsonl.gz"
+        per_lead_files: Also write one email_{id}_{name}.json file per lead (compatibility layout)
+        output_batch_size: Results buffered in memory before each aggregate write
+        output_fsync_every: Force the aggregate to disk every this many batches (0 never forces it)
+        incremental: Keep previous results and regenerate only leads whose inputs changed
+        compact_leads: Hold loaded leads as compact LeadRecords instead of dicts (ignored when streaming)
+        routing_models: Models from fastest to slowest; each lead goes to the first model and
+            is escalated to the next one only when its email fails the local quality gate
+
+    Returns:
+        List of dictionaries containing lead info and generated emails
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    # Report this run only, even when the process performs several
+    run_metrics = get_metrics().start_run()
+    if pack_size < 1:
+        raise ValueError("pack_size must be at least 1")
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    if cohort_reuse not in (None, "substitute", "followup"):
+        raise ValueError(f"Unknown cohort reuse mode: {cohort_reuse}")
+
     # Ensure output directory exists
     os.makedirs(output_path, exist_ok=True)
     
     # Initialize components
     try:
         logger.info(f"Loading data from {data_path}")
-        data_handler = DataHandler(data_path)
+        data_handler = DataHandler(data_path, streaming=streaming, compact=compact_leads)
         
         # Check if API key is set
         api_key = os.environ.get("OPENAI_API_KEY")
-        if not api_key:
+        if not api_key and llm_backend is None:
             logger.error("OPENAI_API_KEY environment variable not set")
             return []
             
         logger.info("Initializing LLM interface")
-        llm_interface = LLMInterface()
+        rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+
+        def create_interface(model_name: Optional[str] = None) -> LLMInterface:
+            options = {"model_name": model_name} if model_name else {}
+            backend = llm_backend.for_model(model_name) if llm_backend is not None and model_name else llm_backend
+            interface = LLMInterface(
+                rate_limiter=rate_limiter,
+                cache=cache,
+                backend=backend,
+                retry_policy=RetryPolicy(max_attempts=max_attempts),
+                hedge_percentile=hedge_percentile,
+                prompt_budget=prompt_budget,
+                **options
+            )
+            interface.bypass_cache = bypass_cache
+            return interface
+
+        # With routing, the slowest tier is the main model, also used by the CrewAI fallback
+        llm_interface = create_interface(routing_models[-1] if routing_models else None)
+        router = None
+        if routing_models:
+            tiers = [ModelTier(model, EmailGenerator(create_interface(model))) for model in routing_models[:-1]]
+            tiers.append(ModelTier(routing_models[-1], EmailGenerator(llm_interface)))
+            router = TieredRouter(tiers)
+            logger.info(f"Routing leads through model tiers: {' -> '.join(routing_models)}")
         
         logger.info("Setting up email agent")
-        email_agent = EmailCrewAgent(llm_interface)
+        email_agent = EmailCrewAgent(llm_interface, crew_pool_size=crew_pool_size, router=router)
     except Exception as e:
         logger.error(f"Failed to initialize components: {e}")
         return []
     
     # Get leads and product info
-    leads = data_handler.get_all_leads()
-    if not leads:
+    leads = data_handler.iter_leads()
+    first_lead = next(leads, None)
+    if first_lead is None:
         logger.warning("No leads found in data file")
         return []
+    # Keys are derived before filtering, so every shard and every resumed run agrees on them
+    leads = keyed_leads(itertools.chain([first_lead], leads))
         
     product = data_handler.get_product_info()
     if not product:
         logger.warning("No product information found in data file")
         return []
     
-    logger.info(f"Found {len(leads)} leads to process")
-    results = []
+    if streaming:
+        logger.info(f"Streaming leads from {data_path} (concurrency={concurrency})")
+    else:
+        logger.info(f"Found {len(data_handler.get_all_leads())} leads to process (concurrency={concurrency})")
+
+    metrics = get_metrics()
+    checkpoint_path = os.path.join(output_path, ".checkpoint")
+    sink = ResultsSink(checkpoint_path, resume=resume or incremental)
+    if resume:
+        logger.info(f"Resuming run, {len(sink.completed)} leads already completed")
+
+    manifest = previous_manifest = None
+    if incremental:
+        manifest_path = os.path.join(checkpoint_path, RunManifest.FILENAME)
+        settings = {"prompt_budget": prompt_budget.limits if prompt_budget is not None else None}
+        manifest = RunManifest(manifest_path, run_fingerprint(product, PROMPT_TEMPLATE_VERSION, settings))
+        previous_manifest = RunManifest.load(manifest_path)
+        if previous_manifest is not None and previous_manifest.run_key != manifest.run_key:
+            logger.info("Product, prompt template or prompt settings changed, regenerating all leads")
+            previous_manifest = None
+
+    def is_unchanged(key: LeadKey, lead: Dict[str, Any]) -> bool:
+        # Unchanged leads keep their stored result and carry their fingerprint forward
+        if previous_manifest is None or not sink.is_completed(key):
+            return False
+        fingerprint = lead_input_fingerprint(lead)
+        if previous_manifest.get(key) != fingerprint:
+            return False
+        if manifest.get(key) is None:
+            metrics.increment("leads_unchanged")
+        manifest.record(key, fingerprint)
+        return True
+
+    def is_selected(key: LeadKey, lead: Dict[str, Any]) -> bool:
+        if lead_filter is not None and not lead_filter(lead):
+            return False
+        if incremental:
+            return not is_unchanged(key, lead)
+        return not (resume and sink.is_completed(key))
+
+    leads = ((key, lead) for key, lead in leads if is_selected(key, lead))
+
+    def current_keys() -> Iterator[LeadKey]:
+        # Keys of the leads this run covers, in data file order
+        for key, lead in keyed_leads(data_handler.iter_leads()):
+            if lead_filter is None or lead_filter(lead):
+                yield key
+
+    cohorts = None
+    if cohort_reuse:
+        with metrics.timer("cohort_plan"):
+            plan = CohortPlan.build(
+                (lead for key, lead in keyed_leads(data_handler.iter_leads()) if is_selected(key, lead)),
+                similarity=cohort_similarity
+            )
+        logger.info(
+            f"Cohort plan: {plan.lead_count} leads in {plan.cohort_count} cohorts, "
+            f"{plan.reusable_leads} can reuse a cohort email"
+        )
+        # With routing, cohort templates go through the tiers and the quality gate like single leads
+        cohorts = CohortGenerator(plan, router or email_agent.email_generator, product,
+                                  followup=cohort_reuse == "followup")
+    per_lead_writer = PerLeadFileWriter(output_path) if per_lead_files else None
+    generated = 0
     
-    # Generate email for each lead
-    for lead in leads:
-        lead_name = lead.get("name", "Unknown Lead")
-        logger.info(f"Generating email for {lead_name}...")
-        
-        try:
-            subject_line, email_body = email_agent.generate_email_for_lead(lead, product)
-            
-            result = {
-                "lead_id": lead.get("id", "unknown"),
-                "lead_name": lead_name,
-                "company": lead.get("company", "Unknown Company"),
-                "subject_line": subject_line,
-                "email_body": email_body
-            }
-            
-            results.append(result)
+    try:
+        # Generate email for each lead
+        async for key, lead, outcome, elapsed in _generate_in_order(
+                leads, product, email_agent, concurrency, pack_size, cohorts):
+            lead_name = lead.get("name", "Unknown Lead")
             
-            # Save individual email to file
-            lead_filename = f"{output_path}/email_{lead.get('id', 'unknown')}_{lead_name.replace(' ', '_')}.json"
-            with open(lead_filename, 'w') as f:
-                json.dump(result, f, indent=2)
+            try:
+                if isinstance(outcome, Exception):
+                    raise outcome
+                subject_line, email_body = outcome
                 
-            logger.info(f"Email saved to {lead_filename}")
-            
-        except Exception as e:
-            logger.error(f"Error generating email for {lead_name}: {e}")
-    
-    if results:
-        # Save all results to a single file
-        all_emails_path = f"{output_path}/all_generated_emails.json"
-        with open(all_emails_path, 'w') as f:
-            json.dump({"generated_emails": results}, f, indent=2)
+                result = {
+                    "lead_id": lead.get("id", "unknown"),
+                    "lead_name": lead_name,
+                    "company": lead.get("company", "Unknown Company"),
+                    "subject_line": subject_line,
+                    "email_body": email_body
+                }
+                
+                with metrics.timer("output_write"):
+                    if per_lead_writer is not None:
+                        per_lead_writer.write(result)
+                    sink.append(key, result)
+                if manifest is not None and subject_line != "Error":
+                    manifest.record(key, lead_input_fingerprint(lead))
+                generated += 1
+                metrics.increment("leads_generated")
+                if on_result is not None:
+                    on_result(result, elapsed)
+                if per_lead_writer is not None:
+                    logger.info(f"Email saved to {per_lead_writer.filename(result)}")
+                else:
+                    logger.info(f"Email generated for {lead_name}")
+                
+            except Exception as e:
+                metrics.increment("leads_failed")
+                logger.error(f"Error generating email for {lead_name}: {e}")
         
-        logger.info(f"All emails saved to {all_emails_path}")
-    else:
-        logger.warning("No emails were successfully generated")
+        # Rebuild the aggregate file from the sink so resumed runs include earlier results
+        total = 0
+        if generated or resume or incremental:
+            writer = create_output_writer(output_path, output_format, output_batch_size, output_fsync_every)
+            with metrics.timer("aggregate_write"):
+                if incremental:
+                    # Follow the data file so removed leads are dropped and the order matches a full run
+                    total = sink.export(writer, sink.iter_latest(current_keys()))
+                else:
+                    total = sink.export(writer)
+        if manifest is not None:
+            manifest.save()
+            logger.info(f"Incremental run: {run_metrics.counter('leads_unchanged'):g} unchanged leads kept")
+        if total:
+            logger.info(f"All emails saved to {writer.path} ({generated} generated in this run)")
+        else:
+            logger.warning("No emails were successfully generated")
+
+        if not return_results:
+            results = []
+        elif incremental:
+            results = list(sink.iter_latest(current_keys()))
+        else:
+            results = list(sink.iter_results())
+    finally:
+        sink.close()
+
+    if cohorts is not None:
+        logger.info(
+            f"Cohort reuse saved {run_metrics.counter('cohort_calls_saved'):g} LLM calls "
+            f"({run_metrics.counter('cohort_followup_calls'):g} short follow-up calls made)"
+        )
+
+    if router is not None:
+        routing = router.stats()
+        shares = ", ".join(f"{tier['name']} {tier['share']:.1%}" for tier in routing["tiers"])
+        logger.info(
+            f"Routing: {shares} of leads; {routing['escalations']} escalations, "
+            f"{routing['unresolved']} leads failed the quality gate on every tier"
+        )
+
+    if cache is not None:
+        stats = cache.stats()
+        logger.info(f"Response cache: {stats['hits']} hits, {stats['misses']} misses")
+
+    _log_metrics_summary(run_metrics)
+    if metrics_path:
+        run_metrics.export(metrics_path)
+        logger.info(f"Metrics exported to {metrics_path}")
     
     return results
 
 
-def main():
+def _log_metrics_summary(metrics: Metrics) -> None:
+    """Log per-stage timings and counters for the run.
+
+    Args:
+        metrics: Metrics registry to summarize
+    """
+    summary = metrics.summary()
+    for stage, stats in summary["stages"].items():
+        logger.info(
+            f"Stage {stage}: {stats['count']} calls, {stats['total_s']:.3f}s total, "
+            f"{stats['mean_ms']:.1f}ms mean, {stats['max_ms']:.1f}ms max"
+        )
+    if summary["counters"]:
+        counters = ", ".join(f"{name}={value:g}" for name, value in summary["counters"].items())
+        logger.info(f"Counters: {counters}")
+
+
+def _env_int(name: str, default: Optional[int] = None) -> Optional[int]:
+    """Read an optional integer setting from the environment.
+
+    Args:
+        name: Environment variable name
+        default: Value to use when the variable is unset or empty
+
+    Returns:
+        Integer value or the default
+    """
+    value = os.environ.get(name)
+    if not value:
+        return default
+    return int(value)
+
+
+def _env_flag(name: str) -> bool:
+    """Read a boolean setting from the environment.
+
+    Args:
+        name: Environment variable name
+
+    Returns:
+        True if the variable is set to 1, true or yes
+    """
+    return os.environ.get(name, "").lower() in ("1", "true", "yes")
+
+
+def _backend_from_env() -> Optional[LLMBackend]:
+    """Create a non-default LLM backend from environment settings.
+
+    Returns:
+        The configured backend, or None to use OpenAI
+    """
+    name = os.environ.get("LLM_BACKEND", "openai")
+    if name == "openai":
+        return None
+    return create_backend(
+        name,
+        latency_ms=float(os.environ.get("FAKE_LLM_LATENCY_MS", "0")),
+        latency_distribution=os.environ.get("FAKE_LLM_LATENCY_DISTRIBUTION", "fixed"),
+        error_rate=float(os.environ.get("FAKE_LLM_ERROR_RATE", "0")),
+        response_shape=os.environ.get("FAKE_LLM_RESPONSE_SHAPE", "email")
+    )
+
+
+def _prompt_budget_from_env() -> Optional[PromptBudget]:
+    """Create the prompt field budgets from environment settings.
+
+    Budgets are opt-in, like in agenerate_emails_for_all_leads and
+    LLMInterface, so every entry point builds the same prompt for a lead.
+
+    Returns:
+        The configured budgets, or None if budgets are turned off
+    """
+    spec = os.environ.get("PROMPT_FIELD_BUDGETS", "").strip()
+    if spec.lower() in ("", "off"):
+        return None
+    if spec.lower() == "on":
+        return PromptBudget()
+    return PromptBudget.from_spec(spec)
+
+
+def _tenant_weights_from_env() -> Dict[str, int]:
+    """Read tenant weights from a specification such as ``"acme=2,beta=1"``.
+
+    Returns:
+        Weight per tenant; tenants not mentioned get weight 1
+    """
+    weights: Dict[str, int] = {}
+    for part in filter(None, (part.strip() for part in os.environ.get("SERVICE_TENANT_WEIGHTS", "").split(","))):
+        tenant, _, value = part.partition("=")
+        weights[tenant.strip()] = int(value)
+    return weights
+
+
+def _positive_int(value: str) -> int:
+    """Parse a command-line count that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command-line arguments.
+
+    Args:
+        argv: Argument list (defaults to sys.argv)
+
+    Returns:
+        Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Generate personalized sales emails for a lead file.")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="skip leads completed by a previous run and rebuild the aggregate output"
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--shard",
+        metavar="I/K",
+        help="process only shard I of K (0-based) into OUTPUT_PATH/shards; merge later with --merge K"
+    )
+    mode.add_argument(
+        "--shards",
+        type=_positive_int,
+        metavar="K",
+        help="split the leads into K shards, run them in local worker processes and merge the output"
+    )
+    mode.add_argument(
+        "--merge",
+        type=_positive_int,
+        metavar="K",
+        help="merge the output of K shards produced by --shard runs"
+    )
+    mode.add_argument(
+        "--serve",
+        action="store_true",
+        help="run a long-lived HTTP service instead of processing the lead file"
+    )
+    mode.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="report prompt tokens and projected cost and duration without calling the model"
+    )
+    return parser.parse_args(argv)
+
+
+def _split_limit(limit: Optional[int], parts: int) -> Optional[int]:
+    """Divide a per-minute limit between processes, keeping at least 1 for each."""
+    return max(1, limit // parts) if limit else limit
+
+
+def _run_from_env(resume: bool = False, shard: Optional[Tuple[int, int]] = None,
+                  rate_limit_parts: int = 1) -> None:
+    """Run the pipeline with settings read from environment variables.
+
+    Args:
+        resume: Skip leads completed by a previous run
+        shard: Optional (shard_index, shard_count) restricting the run to one shard
+        rate_limit_parts: Number of processes sharing REQUESTS_PER_MINUTE and TOKENS_PER_MINUTE
+    """
+    # Get configuration from environment variables with fallbacks
+    data_path = os.environ.get("DATA_PATH", "data/sample_leads.json")
+    output_path = os.environ.get("OUTPUT_PATH", "output")
+    concurrency = _env_int("CONCURRENCY", 1)
+    requests_per_minute = _split_limit(_env_int("REQUESTS_PER_MINUTE"), rate_limit_parts)
+    tokens_per_minute = _split_limit(_env_int("TOKENS_PER_MINUTE"), rate_limit_parts)
+    cache_path = os.environ.get("RESPONSE_CACHE_PATH")
+    cache_ttl = _env_int("RESPONSE_CACHE_TTL")
+    bypass_cache = _env_flag("RESPONSE_CACHE_BYPASS")
+    streaming = _env_flag("STREAM_LEADS")
+    pack_size = _env_int("PACK_SIZE", 1)
+    llm_backend = _backend_from_env()
+    metrics_path = os.environ.get("METRICS_PATH")
+    crew_pool_size = _env_int("CREW_POOL_SIZE", 2)
+    max_attempts = _env_int("LLM_MAX_ATTEMPTS", 3)
+    hedge_percentile = float(os.environ["HEDGE_PERCENTILE"]) if os.environ.get("HEDGE_PERCENTILE") else None
+    cohort_reuse = os.environ.get("COHORT_REUSE", "off")
+    cohort_similarity = float(os.environ.get("COHORT_SIMILARITY", "0.8"))
+    prompt_budget = _prompt_budget_from_env()
+    output_format = os.environ.get("OUTPUT_FORMAT", "json")
+    per_lead_files = _env_flag("OUTPUT_PER_LEAD_FILES")
+    output_batch_size = _env_int("OUTPUT_BATCH_SIZE", 1000)
+    output_fsync_every = _env_int("OUTPUT_FSYNC_EVERY", 0)
+    incremental = _env_flag("INCREMENTAL")
+    compact_leads = _env_flag("COMPACT_LEADS")
+    routing_models = [model.strip() for model in os.environ.get("ROUTING_MODELS", "").split(",") if model.strip()]
+
+    if not os.path.exists(data_path):
+        logger.error(f"Data file not found: {data_path}")
+        sys.exit(1)
+
+    lead_filter = None
+    if shard is not None:
+        shard_index, shard_count = shard
+        output_path = shard_output_path(output_path, shard_index, shard_count)
+        lead_filter = shard_filter(shard_index, shard_count)
+        if metrics_path:
+            base, extension = os.path.splitext(metrics_path)
+            metrics_path = f"{base}.shard-{shard_index:03d}-of-{shard_count:03d}{extension}"
+        logger.info(f"Processing shard {shard_index}/{shard_count} into {output_path}")
+
+    # Processes sharing a cache file serialize on SQLite's write lock, which WAL mode handles
+    cache = ResponseCache(cache_path, ttl_seconds=cache_ttl) if cache_path else None
+    try:
+        generate_emails_for_all_leads(
+            data_path,
+            output_path,
+            concurrency=concurrency,
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            cache=cache,
+            bypass_cache=bypass_cache,
+            streaming=streaming,
+            resume=resume,
+            return_results=False,
+            pack_size=pack_size,
+            llm_backend=llm_backend,
+            metrics_path=metrics_path,
+            crew_pool_size=crew_pool_size,
+            max_attempts=max_attempts,
+            hedge_percentile=hedge_percentile,
+            lead_filter=lead_filter,
+            cohort_reuse=None if cohort_reuse == "off" else cohort_reuse,
+            cohort_similarity=cohort_similarity,
+            prompt_budget=prompt_budget,
+            output_format=output_format,
+            per_lead_files=per_lead_files,
+            output_batch_size=output_batch_size,
+            output_fsync_every=output_fsync_every,
+            incremental=incremental,
+            compact_leads=compact_leads,
+            routing_models=routing_models or None
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def _run_shard_process(shard_index: int, shard_count: int, resume: bool) -> None:
+    """Worker process entry point for one local shard."""
+    # The local shards run side by side against one account, so they split its limits
+    _run_from_env(resume=resume, shard=(shard_index, shard_count), rate_limit_parts=shard_count)
+
+
+def _dry_run_from_env() -> None:
+    """Estimate the run configured by environment settings without calling the model."""
+    data_path = os.environ.get("DATA_PATH", "data/sample_leads.json")
+    if not os.path.exists(data_path):
+        logger.error(f"Data file not found: {data_path}")
+        sys.exit(1)
+
+    # Only the prompt builders are used; the null backend refuses any model call
+    llm_interface = LLMInterface(backend=NullBackend(), prompt_budget=_prompt_budget_from_env())
+    report = estimate_run(
+        data_path,
+        llm_interface,
+        pack_size=_env_int("PACK_SIZE", 1),
+        concurrency=_env_int("CONCURRENCY", 1),
+        requests_per_minute=_env_int("REQUESTS_PER_MINUTE"),
+        tokens_per_minute=_env_int("TOKENS_PER_MINUTE"),
+        input_price=float(os.environ["LLM_INPUT_PRICE"]) if os.environ.get("LLM_INPUT_PRICE") else None,
+        output_price=float(os.environ["LLM_OUTPUT_PRICE"]) if os.environ.get("LLM_OUTPUT_PRICE") else None
+    )
+    cost = f"${report['estimated_cost_usd']:.2f}" if report["estimated_cost_usd"] is not None else "unknown cost"
+    logger.info(
+        f"Dry run: {report['leads']} leads in {report['requests']} requests, "
+        f"{report['input_tokens']} input tokens, ~{report['estimated_output_tokens']} output tokens, "
+        f"{cost}, ~{report['estimated_duration_s']}s"
+    )
+    print(json.dumps(report, indent=2))
+
+
+def _merge_from_env(shard_count: int) -> None:
+    """Merge shard outputs using the DATA_PATH and OUTPUT_PATH settings.
+
+    Args:
+        shard_count: Number of shards to merge
+    """
+    data_path = os.environ.get("DATA_PATH", "data/sample_leads.json")
+    output_path = os.environ.get("OUTPUT_PATH", "output")
+    output_format = os.environ.get("OUTPUT_FORMAT", "json")
+    total = merge_shards(
+        data_path,
+        output_path,
+        shard_count,
+        output_format=output_format,
+        output_batch_size=_env_int("OUTPUT_BATCH_SIZE", 1000),
+        output_fsync_every=_env_int("OUTPUT_FSYNC_EVERY", 0)
+    )
+    logger.info(
+        f"Merged {total} emails from {shard_count} shards into "
+        f"{os.path.join(output_path, aggregate_filename(output_format))}"
+    )
+
+
+async def _aserve_from_env() -> None:
+    """Build one warm set of components from environment settings and serve HTTP requests."""
+    host = os.environ.get("SERVICE_HOST", "127.0.0.1")
+    port = _env_int("SERVICE_PORT", 8080)
+    queue_size = _env_int("SERVICE_QUEUE_SIZE", 100)
+    data_path = os.environ.get("DATA_PATH", "data/sample_leads.json")
+    cache_path = os.environ.get("RESPONSE_CACHE_PATH")
+    llm_backend = _backend_from_env()
+
+    if not os.environ.get("OPENAI_API_KEY") and llm_backend is None:
+        raise ValueError("OPENAI_API_KEY environment variable not set")
+
+    # The product in the data file, if any, is used for requests that do not send one
+    product = DataHandler(data_path, streaming=True).get_product_info() if os.path.exists(data_path) else {}
+
+    cache = ResponseCache(cache_path, ttl_seconds=_env_int("RESPONSE_CACHE_TTL")) if cache_path else None
+    try:
+        # A single LLMInterface keeps its client, and with it the HTTP connection pool, warm across requests
+        llm_interface = LLMInterface(
+            rate_limiter=RateLimiter(_env_int("REQUESTS_PER_MINUTE"), _env_int("TOKENS_PER_MINUTE")),
+            cache=cache,
+            backend=llm_backend,
+            retry_policy=RetryPolicy(max_attempts=_env_int("LLM_MAX_ATTEMPTS", 3)),
+            hedge_percentile=float(os.environ["HEDGE_PERCENTILE"]) if os.environ.get("HEDGE_PERCENTILE") else None,
+            prompt_budget=_prompt_budget_from_env()
+        )
+        llm_interface.bypass_cache = _env_flag("RESPONSE_CACHE_BYPASS")
+        email_agent = EmailCrewAgent(llm_interface, crew_pool_size=_env_int("CREW_POOL_SIZE", 2))
+        service = EmailService(
+            email_agent,
+            product=product,
+            workers=_env_int("CONCURRENCY", 1),
+            queue_size=queue_size,
+            reserved_workers=_env_int("SERVICE_RESERVED_WORKERS"),
+            tenant_weights=_tenant_weights_from_env()
+        )
+        logger.info(f"Serving on http://{host}:{port} (queue size {queue_size})")
+        await serve(service, host, port)
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def main(argv: Optional[List[str]] = None):
     """Main entry point for the application."""
+    args = _parse_args(argv)
     try:
         logger.info("Starting email generation process")
-        
-        # Get configuration from environment variables with fallbacks
-        data_path = os.environ.get("DATA_PATH", "data/sample_leads.json")
-        output_path = os.environ.get("OUTPUT_PATH", "output")
-        
-        if not os.path.exists(data_path):
-            logger.error(f"Data file not found: {data_path}")
-            sys.exit(1)
-        
-        generate_emails_for_all_leads(data_path, output_path)
+
+        if args.shard:
+            _run_from_env(resume=args.resume, shard=parse_shard_spec(args.shard))
+        elif args.merge:
+            _merge_from_env(args.merge)
+        elif args.dry_run:
+            _dry_run_from_env()
+        elif args.serve:
+            try:
+                asyncio.run(_aserve_from_env())
+            except KeyboardInterrupt:
+                logger.info("Service stopped")
+        elif args.shards and args.shards > 1:
+            # Each shard runs in its own process with its own event loop, LLM client and rate limiter
+            with ProcessPoolExecutor(max_workers=args.shards) as executor:
+                futures = [
+                    executor.submit(_run_shard_process, index, args.shards, args.resume)
+                    for index in range(args.shards)
+                ]
+                for future in futures:
+                    future.result()
+            _merge_from_env(args.shards)
+        else:
+            _run_from_env(resume=args.resume)
         logger.info("Email generation process completed")
         
     except Exception as e:
@@ -131,4 +801,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,111 @@
+"""Fingerprint manifest used to regenerate only leads whose inputs changed."""
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional
+
+# Lead fields that end up in the generation prompt
+LEAD_PROMPT_FIELDS = ("name", "job_title", "company", "industry", "interests", "pain_points", "linkedin_activity")
+
+
+def _digest(value: Any) -> str:
+    """Hash a JSON-serializable value independently of key order."""
+    payload = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def lead_input_fingerprint(lead: Dict[str, Any]) -> str:
+    """Fingerprint the prompt-relevant fields of a lead.
+
+    Args:
+        lead: Dictionary containing lead information
+
+    Returns:
+        Hex digest that changes whenever any prompt field changes
+    """
+    return _digest([lead.get(field) for field in LEAD_PROMPT_FIELDS])[:32]
+
+
+def run_fingerprint(product: Dict[str, Any], template_version: int, settings: Optional[Dict[str, Any]] = None) -> str:
+    """Fingerprint the inputs shared by every lead of a run.
+
+    Args:
+        product: Dictionary containing product information
+        template_version: Version of the prompt templates
+        settings: Other settings that change prompts, such as prompt budgets
+
+    Returns:
+        Hex digest that changes whenever the product, templates or settings change
+    """
+    return _digest({"product": product, "template_version": template_version, "settings": settings or {}})
+
+
+class RunManifest:
+    """Fingerprints of the inputs that produced the stored results.
+
+    The manifest records one run-wide fingerprint (product block, prompt
+    template version and prompt settings) and one fingerprint per lead. A
+    later run compares against it to find leads whose inputs are unchanged;
+    if the run-wide fingerprint differs, every lead counts as changed.
+    """
+
+    FILENAME = "manifest.json"
+    # Version 2 records leads by their key from keyed_leads instead of their id
+    VERSION = 2
+
+    def __init__(self, path: str, run_key: str):
+        """Initialize an empty manifest.
+
+        Args:
+            path: File the manifest is saved to
+            run_key: Run-wide fingerprint from run_fingerprint
+        """
+        self.path = path
+        self.run_key = run_key
+        self.leads: Dict[str, str] = {}
+
+    @staticmethod
+    def _key(lead_key: Any) -> str:
+        """Encode a lead key so integer and string ids stay distinct."""
+        return json.dumps(lead_key)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["RunManifest"]:
+        """Load a saved manifest.
+
+        Args:
+            path: Manifest file path
+
+        Returns:
+            The manifest, or None if it is missing or unreadable
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != cls.VERSION:
+            return None
+        manifest = cls(path, data.get("run", ""))
+        manifest.leads = data.get("leads", {})
+        return manifest
+
+    def get(self, lead_key: Any) -> Optional[str]:
+        """Return the recorded fingerprint of a lead, if any."""
+        return self.leads.get(self._key(lead_key))
+
+    def record(self, lead_key: Any, fingerprint: str) -> None:
+        """Record the fingerprint of a lead's inputs.
+
+        Args:
+            lead_key: Key of the lead from keyed_leads
+            fingerprint: Fingerprint from lead_input_fingerprint
+        """
+        self.leads[self._key(lead_key)] = fingerprint
+
+    def save(self) -> None:
+        """Write the manifest atomically."""
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"version": self.VERSION, "run": self.run_key, "leads": self.leads}, file)
+        os.replace(temp_path, self.path)
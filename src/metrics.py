@@ -0,0 +1,251 @@
+"""Lightweight per-stage timing and counter instrumentation."""
+import asyncio
+import functools
+import json
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List
+
+
+class StageStats:
+    """Running duration statistics for one pipeline stage."""
+
+    __slots__ = ("count", "total", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        """Record one observation."""
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def to_dict(self) -> Dict[str, float]:
+        """Return the statistics as a plain dictionary."""
+        return {
+            "count": self.count,
+            "total_s": round(self.total, 6),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "min_ms": round(self.min * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3)
+        }
+
+
+class Metrics:
+    """Thread-safe registry of stage timings and counters.
+
+    Stages record durations (data loading, prompt construction, LLM calls,
+    parsing, CrewAI fallback, output writes), counters track quantities
+    such as prompt/completion tokens and fallback counts, and gauges hold
+    current levels such as queue depths. The registry can be
+    summarized at the end of a run and exported as JSON or in the Prometheus
+    text exposition format.
+    """
+
+    def __init__(self, prefix: str = "email_generator"):
+        """Initialize an empty registry.
+
+        Args:
+            prefix: Metric name prefix used in the Prometheus export
+        """
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._stages: Dict[str, StageStats] = {}
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._runs: "weakref.WeakSet[Metrics]" = weakref.WeakSet()
+
+    def start_run(self) -> "Metrics":
+        """Create a registry that records everything this registry records from now on.
+
+        Used to report one run at a time in a process that performs several,
+        while this registry keeps the cumulative totals (for example for a
+        service's /metrics endpoint). The run registry stops receiving
+        updates once it is no longer referenced. Runs that overlap in time
+        see each other's updates.
+
+        Returns:
+            The empty run registry
+        """
+        run = Metrics(self.prefix)
+        with self._lock:
+            self._runs.add(run)
+        return run
+
+    def _active_runs(self) -> List["Metrics"]:
+        """Return the run registries to forward an update to; call with the lock held."""
+        return list(self._runs) if self._runs else []
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record a duration for a stage.
+
+        Args:
+            stage: Stage name
+            seconds: Duration in seconds
+        """
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = StageStats()
+            stats.add(seconds)
+            runs = self._active_runs()
+        for run in runs:
+            run.observe(stage, seconds)
+
+    def increment(self, name: str, amount: float = 1) -> None:
+        """Increase a counter.
+
+        Args:
+            name: Counter name
+            amount: Amount to add
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+            runs = self._active_runs()
+        for run in runs:
+            run.increment(name, amount)
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge to its current value.
+
+        Args:
+            name: Gauge name
+            value: Current value
+        """
+        with self._lock:
+            self._gauges[name] = value
+            runs = self._active_runs()
+        for run in runs:
+            run.set_gauge(name, value)
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Context manager that records the duration of its block.
+
+        Args:
+            stage: Stage name
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def counter(self, name: str) -> float:
+        """Get the current value of a counter (0 if never incremented)."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def gauge(self, name: str) -> float:
+        """Get the current value of a gauge (0 if never set)."""
+        with self._lock:
+            return self._gauges.get(name, 0)
+
+    def summary(self) -> Dict[str, Any]:
+        """Return a snapshot of all stages, counters and gauges.
+
+        Returns:
+            Dict with ``stages``, ``counters`` and ``gauges`` sections
+        """
+        with self._lock:
+            return {
+                "stages": {name: stats.to_dict() for name, stats in sorted(self._stages.items())},
+                "counters": dict(sorted(self._counters.items())),
+                "gauges": dict(sorted(self._gauges.items()))
+            }
+
+    def to_json(self) -> str:
+        """Export the metrics as a JSON document."""
+        return json.dumps(self.summary(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Export the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            stages = sorted(self._stages.items())
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+
+        if stages:
+            name = f"{self.prefix}_stage_duration_seconds"
+            lines.append(f"# HELP {name} Time spent in each pipeline stage.")
+            lines.append(f"# TYPE {name} summary")
+            for stage, stats in stages:
+                lines.append(f'{name}_sum{{stage="{stage}"}} {stats.total:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {stats.count}')
+            max_name = f"{self.prefix}_stage_duration_max_seconds"
+            lines.append(f"# HELP {max_name} Longest single observation for each pipeline stage.")
+            lines.append(f"# TYPE {max_name} gauge")
+            for stage, stats in stages:
+                lines.append(f'{max_name}{{stage="{stage}"}} {stats.max:.6f}')
+
+        for counter, value in counters:
+            name = f"{self.prefix}_{counter}_total"
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value:g}")
+        for gauge, value in gauges:
+            name = f"{self.prefix}_{gauge}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str, format: str = "") -> None:
+        """Write the metrics to a file.
+
+        Args:
+            path: Destination path
+            format: "json" or "prometheus"; inferred from the extension when empty
+        """
+        if not format:
+            format = "prometheus" if path.endswith((".prom", ".txt")) else "json"
+        if format not in ("json", "prometheus"):
+            raise ValueError(f"Unknown metrics format: {format}")
+        text = self.to_prometheus() if format == "prometheus" else self.to_json() + "\n"
+        with open(path, "w") as file:
+            file.write(text)
+
+    def reset(self) -> None:
+        """Clear all recorded stages, counters and gauges."""
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """Return the process-wide metrics registry."""
+    return _metrics
+
+
+def timed(stage: str) -> Callable:
+    """Decorator recording each call of a function as a stage duration.
+
+    Works for both regular and ``async`` functions.
+
+    Args:
+        stage: Stage name
+    """
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with _metrics.timer(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _metrics.timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,220 @@
+"""Pluggable writers for generated email results."""
+import gzip
+import json
+import os
+from typing import Any, BinaryIO, Dict, List, Optional
+
+OUTPUT_FORMATS = ("json", "jsonl", "jsonl.gz")
+
+
+class OutputWriter:
+    """Base class for output destinations.
+
+    Writers are used as context managers: leaving the block normally
+    finalizes the output, while an exception discards it.
+    """
+
+    path: Optional[str] = None
+
+    def write(self, result: Dict[str, Any]) -> None:
+        """Write one result.
+
+        Args:
+            result: Result dictionary for one lead
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Finalize the output."""
+
+    def abort(self) -> None:
+        """Discard any partially written output."""
+
+    def __enter__(self) -> "OutputWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class _AtomicBatchedWriter(OutputWriter):
+    """Buffers encoded results and writes them in batches to a temporary file.
+
+    The temporary file replaces the destination only when the writer is
+    closed, so readers never observe a partially written output.
+    """
+
+    def __init__(self, path: str, batch_size: int = 1000, fsync_every: int = 0, compress: bool = False):
+        """Initialize the writer.
+
+        Args:
+            path: Destination file path
+            batch_size: Results buffered in memory before each write
+            fsync_every: Force data to stable storage every this many batches
+                and before the final rename (0 never forces it)
+            compress: Write gzip-compressed output
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.path = path
+        self.batch_size = batch_size
+        self.fsync_every = fsync_every
+        self.count = 0
+        self._temp_path = f"{path}.tmp"
+        self._buffer: List[bytes] = []
+        self._batches = 0
+        self._raw: BinaryIO = open(self._temp_path, "wb")
+        self._file: BinaryIO = gzip.GzipFile(fileobj=self._raw, mode="wb") if compress else self._raw
+        self._closed = False
+
+    def _encode(self, result: Dict[str, Any]) -> bytes:
+        """Serialize one result."""
+        raise NotImplementedError
+
+    def _header(self) -> bytes:
+        return b""
+
+    def _footer(self) -> bytes:
+        return b""
+
+    def _sync(self) -> None:
+        """Push written data through the compressor and the OS to the disk."""
+        if self._file is not self._raw:
+            self._file.flush()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+
+    def _flush_buffer(self) -> None:
+        """Write the buffered results in a single call."""
+        if not self._buffer:
+            return
+        self._file.write(b"".join(self._buffer))
+        self._buffer = []
+        self._batches += 1
+        if self.fsync_every and self._batches % self.fsync_every == 0:
+            self._sync()
+
+    def write(self, result: Dict[str, Any]) -> None:
+        if self.count == 0:
+            self._buffer.append(self._header())
+        self._buffer.append(self._encode(result))
+        self.count += 1
+        if self.count % self.batch_size == 0:
+            self._flush_buffer()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        if self.count == 0:
+            self._buffer.append(self._header())
+        self._buffer.append(self._footer())
+        self._flush_buffer()
+        if self._file is not self._raw:
+            self._file.close()
+        if self.fsync_every:
+            self._raw.flush()
+            os.fsync(self._raw.fileno())
+        self._raw.close()
+        os.replace(self._temp_path, self.path)
+        self._closed = True
+
+    def abort(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._file.close()
+            self._raw.close()
+        finally:
+            if os.path.exists(self._temp_path):
+                os.remove(self._temp_path)
+
+
+class JSONLWriter(_AtomicBatchedWriter):
+    """Writes one compact JSON object per line, optionally gzip-compressed."""
+
+    def _encode(self, result: Dict[str, Any]) -> bytes:
+        return (json.dumps(result, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class JSONDocumentWriter(_AtomicBatchedWriter):
+    """Writes the indented ``{"generated_emails": [...]}`` aggregate document.
+
+    The output matches ``json.dump(..., indent=2)`` but is produced one
+    result at a time.
+    """
+
+    def _header(self) -> bytes:
+        return b'{\n  "generated_emails": ['
+
+    def _encode(self, result: Dict[str, Any]) -> bytes:
+        item = json.dumps(result, indent=2).replace("\n", "\n    ")
+        return (("," if self.count else "") + "\n    " + item).encode("utf-8")
+
+    def _footer(self) -> bytes:
+        return b"\n  ]\n}" if self.count else b"]\n}"
+
+
+class PerLeadFileWriter(OutputWriter):
+    """Writes each result to its own indented ``email_{id}_{name}.json`` file.
+
+    This is the original output layout, kept as a compatibility mode; it
+    creates one file per lead.
+    """
+
+    def __init__(self, directory: str):
+        """Initialize the writer.
+
+        Args:
+            directory: Directory receiving the per-lead files
+        """
+        self.directory = directory
+        self.path = directory
+
+    def filename(self, result: Dict[str, Any]) -> str:
+        """Return the file path used for a result."""
+        lead_name = str(result.get("lead_name", "Unknown Lead"))
+        return f"{self.directory}/email_{result.get('lead_id', 'unknown')}_{lead_name.replace(' ', '_')}.json"
+
+    def write(self, result: Dict[str, Any]) -> None:
+        with open(self.filename(result), "w") as file:
+            json.dump(result, file, indent=2)
+
+
+def aggregate_filename(output_format: str) -> str:
+    """Return the aggregate output file name for a format.
+
+    Args:
+        output_format: One of OUTPUT_FORMATS
+
+    Returns:
+        File name inside the output directory
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    if output_format == "json":
+        return "all_generated_emails.json"
+    return f"generated_emails.{output_format}"
+
+
+def create_output_writer(directory: str, output_format: str = "json", batch_size: int = 1000,
+                         fsync_every: int = 0) -> OutputWriter:
+    """Create the aggregate writer for an output directory.
+
+    Args:
+        directory: Output directory
+        output_format: "json" for the indented all_generated_emails.json document,
+            "jsonl" for compact JSON lines or "jsonl.gz" for gzip-compressed JSON lines
+        batch_size: Results buffered in memory before each write
+        fsync_every: Force data to stable storage every this many batches (0 never forces it)
+
+    Returns:
+        The configured writer
+    """
+    path = os.path.join(directory, aggregate_filename(output_format))
+    if output_format == "json":
+        return JSONDocumentWriter(path, batch_size=batch_size, fsync_every=fsync_every)
+    return JSONLWriter(path, batch_size=batch_size, fsync_every=fsync_every, compress=output_format == "jsonl.gz")
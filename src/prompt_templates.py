@@ -0,0 +1,276 @@
+"""Prompt templates compiled once per product and filled in per lead.
+
+Every prompt starts with the static product and instruction block and ends
+with the lead-specific block. The static part is rendered once per product,
+so building a prompt for a lead only formats the short lead block, and all
+prompts of a run share a long identical prefix that providers can cache.
+"""
+from typing import Any, Dict, List
+
+# Bump whenever the prompt templates change so incremental runs regenerate every lead
+PROMPT_TEMPLATE_VERSION = 2
+
+# Delimiter line preceding each email in a packed multi-lead response
+PACKED_EMAIL_MARKER = "=== EMAIL {number} ==="
+
+# Placeholders in cohort templates, filled in locally for each lead of the cohort
+COHORT_NAME_PLACEHOLDER = "{{FIRST_NAME}}"
+COHORT_COMPANY_PLACEHOLDER = "{{COMPANY}}"
+COHORT_OPENING_PLACEHOLDER = "{{OPENING}}"
+
+# Shared by every generation prompt so they all begin with the same text
+PRODUCT_BLOCK = """
+        You write personalized sales emails for the following product.
+
+        PRODUCT INFORMATION:
+        Product Name: {product_name}
+        Description: {product_desc}
+        Key Features: {product_features}
+        Benefits: {product_benefits}
+        """
+
+EMAIL_INSTRUCTIONS = """
+        INSTRUCTIONS:
+        1. Generate a compelling subject line that references the lead's pain points or interests
+        2. Create a personalized email body that:
+           - Starts with a personalized opening that references their LinkedIn activity or industry
+           - Addresses their specific pain points
+           - Briefly introduces our product as a solution
+           - Mentions 1-2 relevant benefits or features
+           - Ends with a clear, low-pressure call to action
+        3. Keep the email concise (150-200 words)
+        4. Use a professional but conversational tone
+
+        FORMAT YOUR RESPONSE AS:
+        Subject Line: [Your subject line here]
+
+        [Your email body here]
+        """
+
+EMAIL_LEAD_TEMPLATE = """
+        Create a personalized sales email for the following prospect:
+
+        LEAD INFORMATION:
+        Name: {lead_name}
+        Job Title: {lead_title}
+        Company: {lead_company}
+        Industry: {lead_industry}
+        Interests: {lead_interests}
+        Pain Points: {lead_pain_points}
+        Recent LinkedIn Activity: {lead_activity}
+        """
+
+PACKED_INSTRUCTIONS = """
+        INSTRUCTIONS (apply to every email):
+        1. Generate a compelling subject line that references the lead's pain points or interests
+        2. Create a personalized email body that:
+           - Starts with a personalized opening that references their LinkedIn activity or industry
+           - Addresses their specific pain points
+           - Briefly introduces our product as a solution
+           - Mentions 1-2 relevant benefits or features
+           - Ends with a clear, low-pressure call to action
+        3. Keep each email concise (150-200 words)
+        4. Use a professional but conversational tone
+        5. Never mix details from one lead into another lead's email
+
+        FORMAT YOUR RESPONSE AS one block per lead, in the same order, each starting with its marker line:
+        {first_marker}
+        Subject Line: [Subject line for lead 1]
+
+        [Email body for lead 1]
+        {second_marker}
+        Subject Line: [Subject line for lead 2]
+
+        [Email body for lead 2]
+        """
+
+PACKED_HEADER_TEMPLATE = """
+        Create a separate personalized sales email for each of the {count} prospects listed below.
+
+        LEADS:
+        """
+
+PACKED_LEAD_TEMPLATE = """
+        LEAD {number}:
+        Name: {lead_name}
+        Job Title: {lead_title}
+        Company: {lead_company}
+        Industry: {lead_industry}
+        Interests: {lead_interests}
+        Pain Points: {lead_pain_points}
+        Recent LinkedIn Activity: {lead_activity}
+        """
+
+COHORT_INSTRUCTIONS = f"""
+        INSTRUCTIONS:
+        1. Generate a compelling subject line that references the lead's pain points or interests
+        2. Create an email body that:
+           - Starts with a greeting, followed by the line {COHORT_OPENING_PLACEHOLDER} on its own
+           - Continues with an opening that references their industry
+           - Addresses their specific pain points
+           - Briefly introduces our product as a solution
+           - Mentions 1-2 relevant benefits or features
+           - Ends with a clear, low-pressure call to action
+        3. Write {COHORT_NAME_PLACEHOLDER} and {COHORT_COMPANY_PLACEHOLDER} exactly as shown wherever the prospect's name or company appears
+        4. Keep the email concise (150-200 words)
+        5. Use a professional but conversational tone
+
+        FORMAT YOUR RESPONSE AS:
+        Subject Line: [Your subject line here]
+
+        [Your email body here]
+        """
+
+COHORT_LEAD_TEMPLATE = """
+        Create a personalized sales email template for prospects with the following profile:
+
+        LEAD INFORMATION:
+        Name: {name_placeholder}
+        Job Title: {lead_title}
+        Company: {company_placeholder}
+        Industry: {lead_industry}
+        Interests: {lead_interests}
+        Pain Points: {lead_pain_points}
+        """
+
+OPENING_TEMPLATE = """
+        Write one sentence that opens a sales email to {lead_name}, {lead_title} at {lead_company}, by referencing their recent LinkedIn activity: {lead_activity}
+        Respond with the sentence only.
+        """
+
+# CrewAI task descriptions; the email writing task only depends on the product
+LEAD_ANALYSIS_TEMPLATE = """
+                Analyze the following lead information:
+                Name: {lead_name}
+                Job Title: {lead_title}
+                Company: {lead_company}
+                Industry: {lead_industry}
+                Interests: {lead_interests}
+                Pain Points: {lead_pain_points}
+                LinkedIn Activity: {lead_activity}
+
+                Identify:
+                1. Key pain points to address
+                2. Relevant interests to mention
+                3. Personalization opportunities based on LinkedIn activity
+                4. Appropriate tone and approach for their position
+                """
+
+EMAIL_WRITING_TEMPLATE = """
+                Using the lead analysis and product information, create a personalized email:
+
+                Product Name: {product_name}
+                Description: {product_desc}
+                Key Features: {product_features}
+                Benefits: {product_benefits}
+
+                Create:
+                1. An attention-grabbing subject line
+                2. A personalized email body that addresses the lead's pain points
+                3. A concise mention of relevant product benefits
+                4. A clear call to action
+
+                Format your response as:
+                Subject Line: [Your subject line here]
+
+                [Your email body here]
+                """
+
+
+def lead_fields(lead: Dict[str, Any]) -> Dict[str, str]:
+    """Extract the lead values filled into the templates.
+
+    Args:
+        lead: Dictionary containing lead information
+
+    Returns:
+        Dict of template placeholder values
+    """
+    # Handle missing data gracefully
+    return {
+        "lead_name": lead.get('name', 'Prospect'),
+        "lead_title": lead.get('job_title', 'Professional'),
+        "lead_company": lead.get('company', 'Company'),
+        "lead_industry": lead.get('industry', 'Industry'),
+        "lead_interests": ', '.join(lead.get('interests', ['professional growth'])),
+        "lead_pain_points": ', '.join(lead.get('pain_points', ['efficiency'])),
+        "lead_activity": lead.get('linkedin_activity', 'None')
+    }
+
+
+def product_fields(product: Dict[str, Any]) -> Dict[str, str]:
+    """Extract the product values filled into the templates.
+
+    Args:
+        product: Dictionary containing product information
+
+    Returns:
+        Dict of template placeholder values
+    """
+    return {
+        "product_name": product.get('name', 'Our Product'),
+        "product_desc": product.get('description', 'A solution designed to help businesses'),
+        "product_features": ', '.join(product.get('key_features', ['customizable features'])),
+        "product_benefits": ', '.join(product.get('benefits', ['improved efficiency']))
+    }
+
+
+def render_opening_prompt(lead: Dict[str, Any]) -> str:
+    """Render the prompt for a one-sentence opening referencing LinkedIn activity.
+
+    Args:
+        lead: Dictionary containing lead information
+
+    Returns:
+        Formatted prompt string
+    """
+    return OPENING_TEMPLATE.format(**lead_fields(lead))
+
+
+class CompiledPrompts:
+    """Prompt prefixes rendered for one product.
+
+    The product block and instructions are formatted once; each render call
+    only formats the lead block and appends it to the matching prefix.
+    Leads passed in should already have their prompt budget applied.
+    """
+
+    def __init__(self, product: Dict[str, Any]):
+        """Render the product-specific parts of every prompt.
+
+        Args:
+            product: Dictionary containing product information
+        """
+        self.product = product
+        fields = product_fields(product)
+        product_block = PRODUCT_BLOCK.format(**fields)
+        self.email_prefix = product_block + EMAIL_INSTRUCTIONS
+        self.packed_prefix = product_block + PACKED_INSTRUCTIONS.format(
+            first_marker=PACKED_EMAIL_MARKER.format(number=1),
+            second_marker=PACKED_EMAIL_MARKER.format(number=2)
+        )
+        self.cohort_prefix = product_block + COHORT_INSTRUCTIONS
+        self.email_writing_task = EMAIL_WRITING_TEMPLATE.format(**fields)
+
+    def email_prompt(self, lead: Dict[str, Any]) -> str:
+        """Render the single-lead generation prompt."""
+        return self.email_prefix + EMAIL_LEAD_TEMPLATE.format(**lead_fields(lead))
+
+    def packed_prompt(self, leads: List[Dict[str, Any]]) -> str:
+        """Render one prompt generating an email for each of several leads."""
+        blocks = [PACKED_HEADER_TEMPLATE.format(count=len(leads))]
+        for number, lead in enumerate(leads, start=1):
+            blocks.append(PACKED_LEAD_TEMPLATE.format(number=number, **lead_fields(lead)))
+        return self.packed_prefix + "".join(blocks)
+
+    def cohort_prompt(self, lead: Dict[str, Any]) -> str:
+        """Render the prompt for a template shared by a cohort of similar leads."""
+        return self.cohort_prefix + COHORT_LEAD_TEMPLATE.format(
+            name_placeholder=COHORT_NAME_PLACEHOLDER,
+            company_placeholder=COHORT_COMPANY_PLACEHOLDER,
+            **lead_fields(lead)
+        )
+
+    def lead_analysis_task(self, lead: Dict[str, Any]) -> str:
+        """Render the CrewAI lead analysis task description."""
+        return LEAD_ANALYSIS_TEMPLATE.format(**lead_fields(lead))
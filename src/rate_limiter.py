@@ -0,0 +1,121 @@
+"""Rate limiting for concurrent LLM requests."""
+import asyncio
+import time
+from typing import Optional
+
+
+class RateLimiter:
+    """Async limiter for requests-per-minute and tokens-per-minute budgets.
+
+    Both budgets are enforced with a token bucket that refills continuously,
+    so short bursts up to the per-minute budget are allowed while the
+    long-run rate stays under the provider limits.
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        """Initialize the rate limiter.
+
+        Args:
+            requests_per_minute: Maximum requests per minute (None for unlimited)
+            tokens_per_minute: Maximum prompt tokens per minute (None for unlimited)
+        """
+        if requests_per_minute is not None and requests_per_minute <= 0:
+            raise ValueError("requests_per_minute must be positive")
+        if tokens_per_minute is not None and tokens_per_minute <= 0:
+            raise ValueError("tokens_per_minute must be positive")
+
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_allowance = float(requests_per_minute or 0)
+        self._token_allowance = float(tokens_per_minute or 0)
+        self._last_refill = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any limit is configured."""
+        return bool(self.requests_per_minute or self.tokens_per_minute)
+
+    def _refill(self) -> None:
+        """Top up both buckets based on the time elapsed since the last refill."""
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+
+        if self.requests_per_minute:
+            self._request_allowance = min(
+                float(self.requests_per_minute),
+                self._request_allowance + elapsed * self.requests_per_minute / 60.0
+            )
+        if self.tokens_per_minute:
+            self._token_allowance = min(
+                float(self.tokens_per_minute),
+                self._token_allowance + elapsed * self.tokens_per_minute / 60.0
+            )
+
+    def _wait_time(self, tokens: int) -> float:
+        """Return seconds to wait before a request of the given size can proceed."""
+        wait = 0.0
+        if self.requests_per_minute and self._request_allowance < 1:
+            wait = max(wait, (1 - self._request_allowance) * 60.0 / self.requests_per_minute)
+        if self.tokens_per_minute and self._token_allowance < tokens:
+            wait = max(wait, (tokens - self._token_allowance) * 60.0 / self.tokens_per_minute)
+        return wait
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """Wait until a request with the given token count fits in both budgets.
+
+        Args:
+            tokens: Estimated number of tokens the request will consume
+        """
+        if not self.enabled:
+            return
+
+        # A single request larger than the whole budget would otherwise wait forever
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        # Requests are admitted one at a time so waiters are served in order
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+
+            if self.requests_per_minute:
+                self._request_allowance -= 1
+            if self.tokens_per_minute:
+                self._token_allowance -= tokens
+
+    def try_acquire(self, tokens: int = 0) -> bool:
+        """Take budget for a request only if it is available right away.
+
+        Requests already waiting in acquire keep their turn, so this never
+        admits a request ahead of them.
+
+        Args:
+            tokens: Estimated number of tokens the request will consume
+
+        Returns:
+            True if the budget was taken, False if the request would have to wait
+        """
+        if not self.enabled:
+            return True
+        if self._lock is not None and self._lock.locked():
+            return False
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+
+        self._refill()
+        if self._wait_time(tokens) > 0:
+            return False
+        if self.requests_per_minute:
+            self._request_allowance -= 1
+        if self.tokens_per_minute:
+            self._token_allowance -= tokens
+        return True
@@ -0,0 +1,268 @@
+"""Retry, circuit breaking and latency tracking for LLM requests."""
+import random
+import re
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Optional
+
+# HTTP status codes worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a request is rejected because the circuit breaker is open."""
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """Parse durations such as ``"20ms"``, ``"1.5s"`` or ``"6m0s"`` into seconds."""
+    parts = _DURATION_PART.findall(value)
+    if not parts or "".join(number + unit for number, unit in parts) != value.strip():
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def _response_headers(error: Exception) -> Any:
+    """Return the HTTP response headers attached to an error, if any."""
+    response = getattr(error, "response", None)
+    return getattr(response, "headers", None) or {}
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Extract the server-requested wait time from a rate-limit error.
+
+    Looks at the ``retry-after-ms``, ``retry-after`` and OpenAI
+    ``x-ratelimit-reset-*`` response headers.
+
+    Args:
+        error: Exception raised by the provider client
+
+    Returns:
+        Seconds to wait, or None if the error carries no hint
+    """
+    headers = _response_headers(error)
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+
+    resets = [
+        _parse_duration(headers.get(name, ""))
+        for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+        if headers.get(name)
+    ]
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+
+class RetryPolicy:
+    """Retry with jittered exponential backoff that honors rate-limit headers."""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 30.0):
+        """Initialize the retry policy.
+
+        Args:
+            max_attempts: Total attempts per request, including the first
+            base_delay: Backoff before the first retry in seconds
+            max_delay: Upper bound for any single backoff in seconds
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        """Decide whether a failed request should be retried.
+
+        Args:
+            error: Exception raised by the provider client
+
+        Returns:
+            False for client errors such as bad requests or authentication failures
+        """
+        if isinstance(error, CircuitOpenError):
+            return False
+        status = getattr(error, "status_code", None)
+        if status is None:
+            status = getattr(getattr(error, "response", None), "status_code", None)
+        if isinstance(status, int):
+            return status in RETRYABLE_STATUS_CODES
+        # Connection problems and timeouts carry no status code
+        return True
+
+    def delay(self, attempt: int, error: Exception) -> float:
+        """Compute how long to wait before the next attempt.
+
+        Args:
+            attempt: Number of attempts made so far (1 after the first failure)
+            error: Exception raised by the last attempt
+
+        Returns:
+            Delay in seconds
+        """
+        hinted = retry_after_seconds(error)
+        if hinted is not None:
+            return min(hinted, self.max_delay)
+        # "Full jitter" spreads retries from many workers over the backoff window
+        return random.uniform(0.0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """Stops sending requests to an endpoint that keeps failing.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    requests are rejected immediately. Once ``recovery_timeout`` seconds have
+    passed a single trial request is let through (half-open); its success
+    closes the circuit and its failure opens it again. A trial that ends
+    without an outcome, such as a cancelled request, must be handed back
+    with release_trial so another request can take its place.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        """Initialize the circuit breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            recovery_timeout: Seconds to wait before allowing a trial request
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.times_opened = 0
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_owner: Any = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the timeout has passed."""
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            return self._state
+
+    @property
+    def is_open(self) -> bool:
+        """Whether requests are currently being rejected."""
+        return self.state == self.OPEN
+
+    def allow_request(self, owner: Any = None) -> bool:
+        """Check whether a request may be sent now.
+
+        Args:
+            owner: Token identifying the request, needed to release a half-open trial later
+
+        Returns:
+            True if the request may proceed
+        """
+        state = self.state
+        with self._lock:
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self._trial_owner = owner
+                return True
+            return False
+
+    def release_trial(self, owner: Any) -> None:
+        """Hand back the half-open trial if the given request still holds it.
+
+        Does nothing once the trial's outcome was recorded, or if the request
+        was never the trial, so it is safe to call after every request.
+
+        Args:
+            owner: Token the request passed to allow_request
+        """
+        with self._lock:
+            if owner is not None and self._trial_in_flight and self._trial_owner is owner:
+                self._trial_in_flight = False
+                self._trial_owner = None
+
+    def record_success(self) -> None:
+        """Record a successful request and close the circuit."""
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Record a failed request.
+
+        Returns:
+            True if this failure opened the circuit
+        """
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or (
+                    self._state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+                self.times_opened += 1
+                return True
+            return False
+
+
+class LatencyTracker:
+    """Sliding window of recent request latencies."""
+
+    def __init__(self, window: int = 500):
+        """Initialize the tracker.
+
+        Args:
+            window: Number of most recent latencies to keep
+        """
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """Record one latency in seconds."""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """Return the nearest-rank percentile of the recorded latencies.
+
+        Args:
+            percentile: Percentile between 0 and 100
+
+        Returns:
+            Latency in seconds, or None if nothing has been recorded
+        """
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        rank = max(1, int(round(percentile / 100.0 * len(ordered))))
+        return ordered[min(rank, len(ordered)) - 1]
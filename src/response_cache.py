@@ -0,0 +1,199 @@
+"""Persistent content-addressed cache for LLM responses."""
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class ResponseCache:
+    """Two-level cache for LLM completions.
+
+    A bounded in-memory LRU sits in front of an optional SQLite store. Entries
+    are keyed by a hash of the prompt, model name and temperature, expire after
+    an optional TTL and are evicted least-recently-used first when either level
+    is full. All operations are guarded by a lock, and the SQLite store uses
+    WAL mode so several processes can share one cache file.
+    """
+
+    # Check the on-disk size limit once every this many writes
+    EVICTION_INTERVAL = 100
+
+    def __init__(self, db_path: Optional[str] = None, max_memory_entries: int = 1024,
+                 max_disk_entries: int = 100000, ttl_seconds: Optional[float] = None):
+        """Initialize the cache.
+
+        Args:
+            db_path: Path to the SQLite cache file (None for memory only)
+            max_memory_entries: Maximum number of entries kept in memory
+            max_disk_entries: Maximum number of entries kept on disk
+            ttl_seconds: Time-to-live for entries in seconds (None for no expiry)
+        """
+        if max_memory_entries < 0 or max_disk_entries < 1:
+            raise ValueError("Cache size limits must be positive")
+
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes_since_eviction = 0
+        self._conn = self._connect() if db_path else None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the SQLite store and create the schema if needed.
+
+        Returns:
+            An open SQLite connection
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        conn.commit()
+        return conn
+
+    @staticmethod
+    def make_key(prompt: str, model_name: str, temperature: float) -> str:
+        """Build the cache key for a request.
+
+        Args:
+            prompt: Prompt text sent to the LLM
+            model_name: Name of the model
+            temperature: Temperature setting used for generation
+
+        Returns:
+            Hex digest identifying the request
+        """
+        digest = hashlib.sha256()
+        for part in (model_name, repr(float(temperature)), prompt):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        """Check whether an entry created at the given time has expired."""
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, value: str, created_at: float) -> None:
+        """Store an entry in the in-memory LRU, evicting the oldest if full."""
+        if self.max_memory_entries == 0:
+            return
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """Look up a cached response.
+
+        Args:
+            key: Cache key from make_key
+
+        Returns:
+            The cached response or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if not self._is_expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None:
+                        value, created_at = row
+                        if not self._is_expired(created_at, now):
+                            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                            self._conn.commit()
+                            self._remember(key, value, created_at)
+                            self.hits += 1
+                            return value
+                        self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                        self._conn.commit()
+                except sqlite3.Error as e:
+                    print(f"Error reading response cache: {e}")
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        """Store a response in the cache.
+
+        Args:
+            key: Cache key from make_key
+            value: Response text to cache
+        """
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now)
+                )
+                self._writes_since_eviction += 1
+                if self._writes_since_eviction >= self.EVICTION_INTERVAL:
+                    self._evict_disk(now)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error writing response cache: {e}")
+
+    def _evict_disk(self, now: float) -> None:
+        """Drop expired entries and trim the disk store to its size limit."""
+        self._writes_since_eviction = 0
+        if self.ttl_seconds is not None:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+
+    def clear(self) -> None:
+        """Remove every entry from both cache levels."""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM responses")
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Get hit/miss counters for the cache.
+
+        Returns:
+            Dict with hits, misses and the number of entries held in memory
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "memory_entries": len(self._memory)}
+
+    def close(self) -> None:
+        """Flush pending evictions and close the SQLite store."""
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._evict_disk(time.time())
+                    self._conn.commit()
+                finally:
+                    self._conn.close()
+                    self._conn = None
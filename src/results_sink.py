@@ -0,0 +1,222 @@
+"""Append-only storage for generated emails with checkpointing."""
+import json
+import os
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, Optional, Set, TextIO, Tuple
+
+from app.output_writers import OutputWriter
+
+# Identifies one lead of a data file: its id (None if it has none) and how
+# many earlier leads share that id
+LeadKey = Tuple[Any, int]
+
+
+def keyed_leads(leads: Iterable[Dict[str, Any]]) -> Iterator[Tuple[LeadKey, Dict[str, Any]]]:
+    """Pair every lead of a data file with its key.
+
+    Leads without an id, and leads sharing an id, get distinct keys by their
+    order in the file, while a lead keeps its key when other leads are added
+    or removed around it.
+
+    Args:
+        leads: Leads in file order; every lead must be passed, including
+            ones a run skips, so each process derives the same keys
+
+    Yields:
+        Tuples of (key, lead)
+    """
+    seen: Counter = Counter()
+    for lead in leads:
+        lead_id = lead.get("id")
+        yield (lead_id, seen[lead_id]), lead
+        seen[lead_id] += 1
+
+
+class ResultsSink:
+    """Durable, append-only store for per-lead results.
+
+    Each result is appended to a JSONL file and, unless generation failed,
+    its lead key to a checkpoint manifest as soon as the lead completes, so
+    an interrupted run loses at most the leads that were in flight. A resumed
+    run skips every lead in the manifest and retries failed ones, and the
+    aggregate output is rebuilt from the JSONL file at the end without
+    holding all results in memory. Results are stored under the key from
+    keyed_leads, so leads without an id or with a shared id each keep their
+    own result.
+    """
+
+    RESULTS_FILENAME = "results.jsonl"
+    CHECKPOINT_FILENAME = "checkpoint.jsonl"
+
+    def __init__(self, directory: str, resume: bool = False, fsync: bool = False):
+        """Initialize the sink.
+
+        Args:
+            directory: Directory holding the results and checkpoint files
+            resume: Keep existing results and skip leads already completed
+            fsync: Force every appended result to stable storage
+        """
+        self.directory = directory
+        self.results_path = os.path.join(directory, self.RESULTS_FILENAME)
+        self.checkpoint_path = os.path.join(directory, self.CHECKPOINT_FILENAME)
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+
+        self.completed: Set[LeadKey] = self._load_checkpoint() if resume else set()
+        mode = "a" if resume else "w"
+        self._results_file: TextIO = open(self.results_path, mode, encoding="utf-8")
+        self._checkpoint_file: TextIO = open(self.checkpoint_path, mode, encoding="utf-8")
+
+    @staticmethod
+    def read_key(line: bytes) -> LeadKey:
+        """Return the lead key of a stored line.
+
+        Args:
+            line: One line of the results or checkpoint file
+
+        Returns:
+            The lead key
+
+        Raises:
+            ValueError: If the line is not a complete record, such as a torn final line
+        """
+        try:
+            lead_id, occurrence = json.loads(line)["key"]
+            return lead_id, occurrence
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Invalid result record: {e}")
+
+    def _load_checkpoint(self) -> Set[LeadKey]:
+        """Read the keys of completed leads from the checkpoint manifest.
+
+        Returns:
+            Set of completed lead keys
+        """
+        completed = set()
+        if not os.path.exists(self.checkpoint_path):
+            return completed
+        with open(self.checkpoint_path, "rb") as file:
+            for line in file:
+                try:
+                    completed.add(self.read_key(line))
+                except ValueError:
+                    # A torn final line from an interrupted run is simply ignored
+                    continue
+        return completed
+
+    def is_completed(self, key: LeadKey) -> bool:
+        """Check whether a lead was completed by a previous run.
+
+        Args:
+            key: Lead key from keyed_leads
+
+        Returns:
+            True if the lead is recorded in the checkpoint manifest with a successful result
+        """
+        return key in self.completed
+
+    def _write_line(self, file: TextIO, record: Dict[str, Any]) -> None:
+        """Append one JSON record to a file and flush it."""
+        file.write(json.dumps(record) + "\n")
+        file.flush()
+        if self.fsync:
+            os.fsync(file.fileno())
+
+    def append(self, key: LeadKey, result: Dict[str, Any]) -> None:
+        """Record a completed lead.
+
+        Failed results (subject line ``Error``) are stored but not
+        checkpointed, so a resumed run generates the lead again and its new
+        result replaces the failed one in the aggregate.
+
+        Args:
+            key: Lead key from keyed_leads
+            result: Result dictionary
+        """
+        # The result is written before the checkpoint so a crash in between
+        # only causes the lead to be regenerated, never lost
+        self._write_line(self._results_file, {"key": key, "result": result})
+        if result.get("subject_line") == "Error":
+            return
+        self._write_line(self._checkpoint_file, {"key": key})
+        self.completed.add(tuple(key))
+
+    def _index(self) -> Tuple[Dict[LeadKey, int], Dict[LeadKey, int]]:
+        """Find the first line number and the latest offset of every stored key."""
+        self._results_file.flush()
+        first_seen: Dict[LeadKey, int] = {}
+        latest_offset: Dict[LeadKey, int] = {}
+        with open(self.results_path, "rb") as file:
+            offset = 0
+            for line_number, line in enumerate(file):
+                try:
+                    key = self.read_key(line)
+                except ValueError:
+                    offset += len(line)
+                    continue
+                first_seen.setdefault(key, line_number)
+                latest_offset[key] = offset
+                offset += len(line)
+        return first_seen, latest_offset
+
+    def iter_results(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over stored results, one per lead.
+
+        If a lead was recorded more than once, its latest result is returned at
+        the position where the lead first appeared.
+
+        Yields:
+            Result dictionaries
+        """
+        first_seen, latest_offset = self._index()
+        with open(self.results_path, "rb") as scan, open(self.results_path, "rb") as lookup:
+            for line_number, line in enumerate(scan):
+                try:
+                    key = self.read_key(line)
+                except ValueError:
+                    continue
+                if first_seen.get(key) != line_number:
+                    continue
+                lookup.seek(latest_offset[key])
+                yield json.loads(lookup.readline())["result"]
+
+    def iter_latest(self, keys: Iterable[LeadKey]) -> Iterator[Dict[str, Any]]:
+        """Iterate over the latest stored result of each given lead.
+
+        Args:
+            keys: Lead keys in the desired output order; keys without a stored result are skipped
+
+        Yields:
+            Result dictionaries
+        """
+        _, latest_offset = self._index()
+        emitted = set()
+        with open(self.results_path, "rb") as lookup:
+            for key in keys:
+                if key not in latest_offset or key in emitted:
+                    continue
+                emitted.add(key)
+                lookup.seek(latest_offset[key])
+                yield json.loads(lookup.readline())["result"]
+
+    def export(self, writer: OutputWriter, results: Optional[Iterable[Dict[str, Any]]] = None) -> int:
+        """Write stored results to an output writer and finalize it.
+
+        Args:
+            writer: Destination for the results
+            results: Results to write (defaults to all stored results)
+
+        Returns:
+            Number of results written
+        """
+        count = 0
+        with writer:
+            for result in results if results is not None else self.iter_results():
+                writer.write(result)
+                count += 1
+        return count
+
+    def close(self) -> None:
+        """Close the underlying files."""
+        self._results_file.close()
+        self._checkpoint_file.close()
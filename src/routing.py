@@ -0,0 +1,286 @@
+"""Tiered model routing with a local quality gate."""
+import asyncio
+import re
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.cohorts import local_opening, missing_placeholders, personalize
+from app.email_generator import EmailGenerator
+from app.metrics import get_metrics
+
+# Subject lines the parser falls back to when the model gave none
+_PLACEHOLDER_SUBJECTS = ("", "Error", "Generated Subject")
+
+
+class QualityGate:
+    """Deterministic local checks a generated email must pass.
+
+    The checks mirror the prompt's requirements: a subject line, a body of
+    150-200 words, a reference to the lead's name or company, and no error
+    text in place of an email. Cohort templates must also keep their name
+    and company placeholders.
+    """
+
+    REASONS = ("error", "missing_subject", "too_short", "too_long", "not_personalized", "missing_placeholders")
+
+    def __init__(self, min_words: int = 150, max_words: int = 200):
+        """Initialize the gate.
+
+        Args:
+            min_words: Minimum number of words in the email body
+            max_words: Maximum number of words in the email body
+        """
+        if min_words > max_words:
+            raise ValueError("min_words must not exceed max_words")
+        self.min_words = min_words
+        self.max_words = max_words
+
+    @staticmethod
+    def _mentions(text: str, value: Any) -> bool:
+        """Check whether a name or company appears in the text as whole words."""
+        if not value or not isinstance(value, str):
+            return False
+        return re.search(r"\b" + re.escape(value.strip()) + r"\b", text, re.IGNORECASE) is not None
+
+    def check(self, subject_line: str, email_body: str, lead: Dict[str, Any]) -> Optional[str]:
+        """Validate a generated email.
+
+        Args:
+            subject_line: Generated subject line
+            email_body: Generated email body
+            lead: Dictionary containing lead information
+
+        Returns:
+            None if the email passes, otherwise the first failed check (one of REASONS)
+        """
+        if subject_line.startswith("Error") or email_body.startswith("Error"):
+            return "error"
+        if subject_line.strip() in _PLACEHOLDER_SUBJECTS:
+            return "missing_subject"
+
+        words = len(email_body.split())
+        if words < self.min_words:
+            return "too_short"
+        if words > self.max_words:
+            return "too_long"
+
+        name = lead.get("name")
+        company = lead.get("company")
+        if name or company:
+            text = f"{subject_line}\n{email_body}"
+            first_name = name.split()[0] if isinstance(name, str) and name.split() else None
+            if not (self._mentions(text, name) or self._mentions(text, first_name) or self._mentions(text, company)):
+                return "not_personalized"
+        return None
+
+    def check_template(self, subject_line: str, email_body: str, lead: Dict[str, Any]) -> Optional[str]:
+        """Validate a cohort template as the email it becomes for one lead.
+
+        Args:
+            subject_line: Generated subject line template
+            email_body: Generated body template
+            lead: Lead the template was generated for
+
+        Returns:
+            None if the template passes, otherwise the first failed check (one of REASONS)
+        """
+        if subject_line.startswith("Error") or email_body.startswith("Error"):
+            return "error"
+        if missing_placeholders(subject_line, email_body):
+            return "missing_placeholders"
+        opening = local_opening(lead)
+        return self.check(personalize(subject_line, lead, opening), personalize(email_body, lead, opening), lead)
+
+
+class ModelTier(NamedTuple):
+    """One model tier of a router."""
+
+    name: str
+    email_generator: EmailGenerator
+
+
+class TieredRouter:
+    """Sends each lead to the cheapest tier whose email passes the quality gate.
+
+    Every lead starts at the first (fastest, cheapest) tier. Emails failing
+    the gate are regenerated by the next tier, and the last tier's email is
+    kept even if it fails, so a lead never costs more than one request per
+    tier. The router has the same generate methods as EmailGenerator and can
+    stand in for it.
+    """
+
+    def __init__(self, tiers: Sequence[ModelTier], gate: Optional[QualityGate] = None):
+        """Initialize the router.
+
+        Args:
+            tiers: Model tiers from fastest to slowest
+            gate: Checks deciding whether an email is escalated (defaults to QualityGate())
+        """
+        if not tiers:
+            raise ValueError("At least one model tier is required")
+        self.tiers = list(tiers)
+        self.gate = gate or QualityGate()
+        self._lock = threading.Lock()
+        self._requests = [0] * len(self.tiers)
+        self._accepted = [0] * len(self.tiers)
+        self._escalations = 0
+        self._unresolved = 0
+
+    def _record(self, tier_index: int, failure: Optional[str]) -> bool:
+        """Record a tier's attempt and decide whether the lead is finished.
+
+        Args:
+            tier_index: Index of the tier that produced the email
+            failure: Failed check, or None if the email passed
+
+        Returns:
+            True if the email is kept, False if the lead escalates
+        """
+        metrics = get_metrics()
+        metrics.increment(f"routing_tier{tier_index}_requests")
+        last = tier_index == len(self.tiers) - 1
+        with self._lock:
+            self._requests[tier_index] += 1
+            if failure is None or last:
+                self._accepted[tier_index] += 1
+                if failure is not None:
+                    self._unresolved += 1
+            else:
+                self._escalations += 1
+
+        if failure is not None:
+            metrics.increment(f"routing_gate_{failure}")
+        if failure is None or last:
+            metrics.increment(f"routing_tier{tier_index}_accepted")
+            if failure is not None:
+                metrics.increment("routing_unresolved")
+            return True
+        metrics.increment("routing_escalations")
+        return False
+
+    def _escalate_on_error(self, tier_index: int) -> bool:
+        """Record a tier that raised; the last tier's error is not swallowed."""
+        if tier_index == len(self.tiers) - 1:
+            return False
+        self._record(tier_index, "error")
+        return True
+
+    def generate_email(self, lead: Dict[str, Any], product: Dict[str, Any], start: int = 0) -> Tuple[str, str]:
+        """Generate an email, escalating through the tiers until one passes the gate.
+
+        Args:
+            lead: Dictionary containing lead information
+            product: Dictionary containing product information
+            start: Index of the first tier to try
+
+        Returns:
+            Tuple of (subject_line, email_body)
+        """
+        for index in range(start, len(self.tiers)):
+            try:
+                email = self.tiers[index].email_generator.generate_email(lead, product)
+            except Exception:
+                if self._escalate_on_error(index):
+                    continue
+                raise
+            if self._record(index, self.gate.check(*email, lead)):
+                return email
+        raise RuntimeError("Router has no tier left")
+
+    async def agenerate_email(self, lead: Dict[str, Any], product: Dict[str, Any], start: int = 0) -> Tuple[str, str]:
+        """Generate an email asynchronously, escalating until one passes the gate.
+
+        Args:
+            lead: Dictionary containing lead information
+            product: Dictionary containing product information
+            start: Index of the first tier to try
+
+        Returns:
+            Tuple of (subject_line, email_body)
+        """
+        for index in range(start, len(self.tiers)):
+            try:
+                email = await self.tiers[index].email_generator.agenerate_email(lead, product)
+            except Exception:
+                if self._escalate_on_error(index):
+                    continue
+                raise
+            if self._record(index, self.gate.check(*email, lead)):
+                return email
+        raise RuntimeError("Router has no tier left")
+
+    async def agenerate_cohort_template(self, lead: Dict[str, Any], product: Dict[str, Any]) -> Tuple[str, str]:
+        """Generate a cohort template, escalating until one passes the gate for the given lead.
+
+        Args:
+            lead: Dictionary containing the profile shared by a cohort of leads
+            product: Dictionary containing product information
+
+        Returns:
+            Tuple of (subject_line, email_body) templates
+        """
+        for index in range(len(self.tiers)):
+            try:
+                template = await self.tiers[index].email_generator.agenerate_cohort_template(lead, product)
+            except Exception:
+                if self._escalate_on_error(index):
+                    continue
+                raise
+            if self._record(index, self.gate.check_template(*template, lead)):
+                return template
+        raise RuntimeError("Router has no tier left")
+
+    async def agenerate_opening(self, lead: Dict[str, Any]) -> Optional[str]:
+        """Generate a one-sentence opening for a lead on the first tier.
+
+        Args:
+            lead: Dictionary containing lead information
+
+        Returns:
+            Opening sentence, or None if generation failed
+        """
+        return await self.tiers[0].email_generator.agenerate_opening(lead)
+
+    async def agenerate_emails(self, leads: List[Dict[str, Any]], product: Dict[str, Any]) -> List[Tuple[str, str]]:
+        """Generate emails for several leads with one packed request on the first tier.
+
+        Leads whose email fails the gate are escalated individually.
+
+        Args:
+            leads: List of lead dictionaries
+            product: Dictionary containing product information
+
+        Returns:
+            List of (subject_line, email_body) tuples in lead order
+        """
+        emails = list(await self.tiers[0].email_generator.agenerate_emails(leads, product))
+        escalated = [i for i, (lead, email) in enumerate(zip(leads, emails))
+                     if not self._record(0, self.gate.check(*email, lead))]
+        regenerated = await asyncio.gather(*(self.agenerate_email(leads[i], product, start=1) for i in escalated))
+        for i, email in zip(escalated, regenerated):
+            emails[i] = email
+        return emails
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how the work was split across tiers.
+
+        Returns:
+            Dict with the number of leads, escalations and unresolved leads,
+            and per tier its requests, accepted emails and share of all leads
+        """
+        with self._lock:
+            leads = sum(self._accepted)
+            return {
+                "leads": leads,
+                "escalations": self._escalations,
+                "unresolved": self._unresolved,
+                "tiers": [
+                    {
+                        "name": tier.name,
+                        "requests": self._requests[index],
+                        "accepted": self._accepted[index],
+                        "share": round(self._accepted[index] / leads, 4) if leads else 0.0
+                    }
+                    for index, tier in enumerate(self.tiers)
+                ]
+            }
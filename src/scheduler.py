@@ -0,0 +1,320 @@
+"""Priority, deadline and tenant aware scheduling of email generations."""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.metrics import get_metrics
+
+# Priority classes, highest first
+PRIORITY_CLASSES = ("interactive", "batch")
+
+DEFAULT_TENANT = "default"
+
+
+class DeadlineExceededError(Exception):
+    """Raised for a job whose deadline passed before a worker could start it."""
+
+
+class ScheduledJob:
+    """One queued generation."""
+
+    __slots__ = ("lead", "product", "priority", "tenant", "deadline", "enqueued", "future", "started", "dropped",
+                 "timer")
+
+    def __init__(self, lead: Dict[str, Any], product: Dict[str, Any], priority: str, tenant: str,
+                 deadline: Optional[float], enqueued: float, future: asyncio.Future):
+        self.lead = lead
+        self.product = product
+        self.priority = priority
+        self.tenant = tenant
+        self.deadline = deadline
+        self.enqueued = enqueued
+        self.future = future
+        self.started = False
+        # Set when the job left the queue without starting (promoted or expired); its heap entry is skipped
+        self.dropped = False
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class LeadScheduler:
+    """Bounded worker pool serving generations by priority class, tenant and deadline.
+
+    Jobs of a higher class always start before jobs of a lower class, and
+    ``reserved_workers`` workers only ever run top-class jobs, so interactive
+    work never waits behind a pool full of batch jobs while batch jobs still
+    use all remaining capacity. Within a class, tenants take turns in
+    proportion to their weights, and each tenant's jobs run earliest deadline
+    first, followed by jobs without a deadline in arrival order. A job still
+    queued when its deadline passes fails with DeadlineExceededError at that
+    moment and never takes a worker.
+    """
+
+    def __init__(self, email_agent: Any, workers: int = 4, queue_size: int = 100,
+                 reserved_workers: Optional[int] = None, tenant_weights: Optional[Dict[str, int]] = None):
+        """Initialize the scheduler.
+
+        Args:
+            email_agent: EmailCrewAgent used for generation
+            workers: Number of generations running at the same time
+            queue_size: Maximum number of queued jobs per priority class
+            reserved_workers: Workers kept for the top class (defaults to 1 when
+                there are several workers, otherwise 0)
+            tenant_weights: Relative share of each tenant within a class (default 1)
+        """
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+        if reserved_workers is None:
+            reserved_workers = 1 if workers > 1 else 0
+        if not 0 <= reserved_workers < workers:
+            raise ValueError("reserved_workers must be between 0 and workers - 1")
+        self.email_agent = email_agent
+        self.workers = workers
+        self.queue_size = queue_size
+        self.reserved_workers = reserved_workers
+        self.tenant_weights = dict(tenant_weights or {})
+        for tenant, weight in self.tenant_weights.items():
+            if weight < 1:
+                raise ValueError(f"Weight of tenant {tenant} must be at least 1")
+
+        # Per class: each tenant's heap of (deadline, sequence, job) and the tenants waiting for a turn
+        self._queues: Dict[str, Dict[str, List[Tuple[float, int, ScheduledJob]]]] = {p: {} for p in PRIORITY_CLASSES}
+        self._turns: Dict[str, Deque[str]] = {p: deque() for p in PRIORITY_CLASSES}
+        self._credits: Dict[Tuple[str, str], int] = {}
+        self._depth = {p: 0 for p in PRIORITY_CLASSES}
+        self._running = {p: 0 for p in PRIORITY_CLASSES}
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Start the workers."""
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Stop the workers."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def queue_depth(self, priority: Optional[str] = None) -> int:
+        """Number of jobs waiting for a worker, in one class or in total."""
+        if priority is not None:
+            return self._depth[priority]
+        return sum(self._depth.values())
+
+    def running(self, priority: Optional[str] = None) -> int:
+        """Number of jobs being generated, in one class or in total."""
+        if priority is not None:
+            return self._running[priority]
+        return sum(self._running.values())
+
+    def capacity(self, priority: str) -> int:
+        """Number of jobs that can still be queued in a class."""
+        return self.queue_size - self._depth[priority]
+
+    def _update_gauges(self, priority: str) -> None:
+        metrics = get_metrics()
+        metrics.set_gauge(f"scheduler_queue_depth_{priority}", self._depth[priority])
+        metrics.set_gauge(f"scheduler_running_{priority}", self._running[priority])
+
+    def _push(self, job: ScheduledJob) -> None:
+        """Queue a job and wake the workers."""
+        queues = self._queues[job.priority]
+        heap = queues.get(job.tenant)
+        if heap is None:
+            heap = queues[job.tenant] = []
+            self._turns[job.priority].append(job.tenant)
+        deadline = job.deadline if job.deadline is not None else math.inf
+        heapq.heappush(heap, (deadline, next(self._sequence), job))
+        self._depth[job.priority] += 1
+        self._update_gauges(job.priority)
+        if job.deadline is not None:
+            delay = max(0.0, job.deadline - time.perf_counter())
+            job.timer = asyncio.get_running_loop().call_later(delay, self._expire, job)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _drop(self, job: ScheduledJob) -> None:
+        """Take a queued job out of the queue; its heap entry is skipped when popped."""
+        job.dropped = True
+        if job.timer is not None:
+            job.timer.cancel()
+        self._depth[job.priority] -= 1
+        self._update_gauges(job.priority)
+
+    def _expire(self, job: ScheduledJob) -> None:
+        """Deadline timer callback: fail the job if it is still queued."""
+        if job.started or job.dropped:
+            return
+        remaining = job.deadline - time.perf_counter()
+        if remaining > 0:
+            # The event loop clock may fire the timer slightly before the deadline
+            job.timer = asyncio.get_running_loop().call_later(remaining, self._expire, job)
+            return
+        self._drop(job)
+        self._fail_expired(job)
+
+    def _fail_expired(self, job: ScheduledJob) -> None:
+        """Fail a job that was not started before its deadline."""
+        if job.timer is not None:
+            job.timer.cancel()
+        get_metrics().increment(f"scheduler_expired_{job.priority}")
+        if not job.future.done():
+            job.future.set_exception(DeadlineExceededError("Deadline passed before generation started"))
+
+    def submit(self, lead: Dict[str, Any], product: Dict[str, Any], priority: str = "batch",
+               tenant: str = DEFAULT_TENANT, deadline: Optional[float] = None) -> ScheduledJob:
+        """Queue a generation.
+
+        Args:
+            lead: Dictionary containing lead information
+            product: Dictionary containing product information
+            priority: One of PRIORITY_CLASSES
+            tenant: Campaign or customer the job is accounted to
+            deadline: Seconds from now after which the job is no longer worth starting
+
+        Returns:
+            The queued job; its future resolves to (subject_line, email_body)
+
+        Raises:
+            asyncio.QueueFull: If the class already holds queue_size jobs
+        """
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class: {priority}")
+        if self._depth[priority] >= self.queue_size:
+            raise asyncio.QueueFull
+        now = time.perf_counter()
+        job = ScheduledJob(lead, product, priority, tenant, now + deadline if deadline is not None else None,
+                           now, asyncio.get_running_loop().create_future())
+        self._push(job)
+        return job
+
+    def promote(self, job: ScheduledJob, priority: str, deadline: Optional[float] = None) -> ScheduledJob:
+        """Raise the priority or tighten the deadline of a queued job.
+
+        Used when a more urgent request asks for a generation that is already
+        queued. Jobs that have started, or that are already at least as urgent,
+        are returned unchanged.
+
+        Args:
+            job: Job returned by submit
+            priority: Priority class of the new request
+            deadline: Deadline of the new request in seconds from now
+
+        Returns:
+            The job now holding the generation
+
+        Raises:
+            asyncio.QueueFull: If the job would move to a class that already holds queue_size jobs
+        """
+        if job.started or job.dropped or job.future.done():
+            return job
+        new_priority = min(job.priority, priority, key=PRIORITY_CLASSES.index)
+        new_deadline = job.deadline
+        if deadline is not None:
+            absolute = time.perf_counter() + deadline
+            new_deadline = absolute if new_deadline is None else min(new_deadline, absolute)
+        if new_priority == job.priority and new_deadline == job.deadline:
+            return job
+        if new_priority != job.priority and self._depth[new_priority] >= self.queue_size:
+            raise asyncio.QueueFull
+
+        # Heaps have no cheap removal, so the old entry is dropped and a replacement shares its future
+        self._drop(job)
+        replacement = ScheduledJob(job.lead, job.product, new_priority, job.tenant, new_deadline, job.enqueued,
+                                   job.future)
+        self._push(replacement)
+        get_metrics().increment("scheduler_promoted")
+        return replacement
+
+    def _pop_class(self, priority: str) -> Optional[ScheduledJob]:
+        """Take the next job of a class, giving tenants turns by weight."""
+        queues = self._queues[priority]
+        turns = self._turns[priority]
+        while turns:
+            tenant = turns[0]
+            heap = queues[tenant]
+            _, _, job = heapq.heappop(heap)
+            if not heap:
+                turns.popleft()
+                del queues[tenant]
+                self._credits.pop((priority, tenant), None)
+            if job.dropped:
+                continue
+
+            if heap:
+                # A tenant keeps its turn for as many jobs as its weight
+                credit = self._credits.get((priority, tenant), self.tenant_weights.get(tenant, 1)) - 1
+                if credit <= 0:
+                    turns.rotate(-1)
+                    self._credits.pop((priority, tenant), None)
+                else:
+                    self._credits[(priority, tenant)] = credit
+            self._depth[priority] -= 1
+            return job
+        return None
+
+    def _pop(self) -> Optional[ScheduledJob]:
+        """Take the next job a free worker may start, expiring overdue jobs on the way."""
+        for rank, priority in enumerate(PRIORITY_CLASSES):
+            if rank > 0 and sum(self._running[p] for p in PRIORITY_CLASSES[1:]) >= self.workers - self.reserved_workers:
+                break
+            while True:
+                job = self._pop_class(priority)
+                if job is None:
+                    break
+                if job.deadline is not None and time.perf_counter() > job.deadline:
+                    # Popped just before its deadline timer fired
+                    self._update_gauges(priority)
+                    self._fail_expired(job)
+                    continue
+                if job.timer is not None:
+                    job.timer.cancel()
+                job.started = True
+                self._running[priority] += 1
+                self._update_gauges(priority)
+                return job
+        return None
+
+    async def _next_job(self) -> ScheduledJob:
+        """Wait until a job may start."""
+        while True:
+            job = self._pop()
+            if job is not None:
+                return job
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    async def _worker(self) -> None:
+        """Run jobs until cancelled."""
+        metrics = get_metrics()
+        while True:
+            job = await self._next_job()
+            metrics.observe(f"scheduler_queue_wait_{job.priority}", time.perf_counter() - job.enqueued)
+            try:
+                if job.future.done():
+                    # Every waiting caller went away
+                    continue
+                with metrics.timer("scheduler_generate"):
+                    email = await self.email_agent.agenerate_email_for_lead(job.lead, job.product)
+                if not job.future.done():
+                    job.future.set_result(email)
+            except asyncio.CancelledError:
+                job.future.cancel()
+                raise
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            finally:
+                self._running[job.priority] -= 1
+                self._update_gauges(job.priority)
+                # A finished job may free capacity for a lower class
+                self._wakeup.set()
@@ -0,0 +1,429 @@
+"""Long-lived HTTP service that generates emails with one warm set of components."""
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.metrics import get_metrics
+from app.scheduler import DEFAULT_TENANT, PRIORITY_CLASSES, DeadlineExceededError, LeadScheduler, ScheduledJob
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    502: "Bad Gateway",
+    503: "Service Unavailable",
+    504: "Gateway Timeout"
+}
+
+
+class ServiceBusyError(Exception):
+    """Raised when the request queue has no room for more work."""
+
+
+class HTTPError(Exception):
+    """An error that maps directly to an HTTP response status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _result_for(lead: Dict[str, Any], subject_line: str, email_body: str) -> Dict[str, Any]:
+    """Build the result record for a lead, in the same shape as the batch output."""
+    return {
+        "lead_id": lead.get("id", "unknown"),
+        "lead_name": lead.get("name", "Unknown Lead"),
+        "company": lead.get("company", "Unknown Company"),
+        "subject_line": subject_line,
+        "email_body": email_body
+    }
+
+
+class EmailService:
+    """Scheduler-backed email generation shared by all HTTP requests.
+
+    Requests are queued on a LeadScheduler with a fixed number of workers
+    and a bounded queue per priority class, so a burst of traffic is
+    rejected with ``ServiceBusyError`` instead of piling up unbounded work.
+    Single-lead requests default to the interactive class and batches to
+    the batch class, so an interactive request never waits behind a large
+    batch. Concurrent requests for the same lead and product share a single
+    in-flight generation, which is promoted when a more urgent request joins it.
+    """
+
+    def __init__(self, email_agent: Any, product: Optional[Dict[str, Any]] = None, workers: int = 4,
+                 queue_size: int = 100, reserved_workers: Optional[int] = None,
+                 tenant_weights: Optional[Dict[str, int]] = None):
+        """Initialize the service.
+
+        Args:
+            email_agent: EmailCrewAgent used for generation
+            product: Default product for requests that do not include one
+            workers: Number of generations running at the same time
+            queue_size: Maximum number of queued generations per priority class
+            reserved_workers: Workers kept for interactive requests (defaults to 1
+                when there are several workers)
+            tenant_weights: Relative share of each tenant within a priority class
+        """
+        self.email_agent = email_agent
+        self.product = product or {}
+        self.scheduler = LeadScheduler(email_agent, workers=workers, queue_size=queue_size,
+                                       reserved_workers=reserved_workers, tenant_weights=tenant_weights)
+        self.workers = workers
+        self.queue_size = queue_size
+        self._inflight: Dict[str, ScheduledJob] = {}
+
+    @staticmethod
+    def request_key(lead: Dict[str, Any], product: Dict[str, Any]) -> str:
+        """Identify requests that would produce the same email.
+
+        Args:
+            lead: Dictionary containing lead information
+            product: Dictionary containing product information
+
+        Returns:
+            Hex digest of the lead and product
+        """
+        payload = json.dumps([lead, product], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def start(self) -> None:
+        """Start the scheduler's workers."""
+        await self.scheduler.start()
+
+    async def stop(self) -> None:
+        """Stop the scheduler's workers."""
+        await self.scheduler.stop()
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of generations waiting for a worker."""
+        return self.scheduler.queue_depth()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of distinct generations queued or running."""
+        return len(self._inflight)
+
+    def health(self) -> Dict[str, Any]:
+        """Return queue and worker usage for the health endpoint."""
+        return {
+            "status": "ok",
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "classes": {
+                priority: {
+                    "queue_depth": self.scheduler.queue_depth(priority),
+                    "running": self.scheduler.running(priority)
+                }
+                for priority in PRIORITY_CLASSES
+            }
+        }
+
+    def _submit(self, lead: Dict[str, Any], product: Dict[str, Any], priority: str, tenant: str,
+                deadline: Optional[float]) -> ScheduledJob:
+        """Join an identical in-flight generation or queue a new one."""
+        key = self.request_key(lead, product)
+        job = self._inflight.get(key)
+        if job is not None:
+            get_metrics().increment("service_coalesced")
+            job = self.scheduler.promote(job, priority, deadline)
+            self._inflight[key] = job
+            return job
+
+        job = self.scheduler.submit(lead, product, priority=priority, tenant=tenant, deadline=deadline)
+        self._inflight[key] = job
+        job.future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return job
+
+    def _reject(self, priority: str) -> ServiceBusyError:
+        """Record and build the error for a request that does not fit in the queue."""
+        get_metrics().increment("service_rejected")
+        return ServiceBusyError(f"Request queue is full ({self.queue_size} pending {priority} generations)")
+
+    async def _generate(self, lead: Dict[str, Any], product: Dict[str, Any], priority: str, tenant: str,
+                        deadline: Optional[float]) -> Dict[str, Any]:
+        """Wait for a lead's generation, resubmitting it if another request's deadline expired it."""
+        expires = time.perf_counter() + deadline if deadline is not None else None
+        while True:
+            remaining = expires - time.perf_counter() if expires is not None else None
+            try:
+                job = self._submit(lead, product, priority, tenant, remaining)
+            except asyncio.QueueFull:
+                raise self._reject(priority)
+            try:
+                # Shield the shared generation so one disconnected client does not cancel it for the others
+                subject_line, email_body = await asyncio.shield(job.future)
+            except DeadlineExceededError:
+                if expires is not None and time.perf_counter() >= expires:
+                    raise
+                # The shared generation expired under a tighter deadline than this request's
+                continue
+            return _result_for(lead, subject_line, email_body)
+
+    async def generate(self, lead: Dict[str, Any], product: Optional[Dict[str, Any]] = None,
+                       priority: str = "interactive", tenant: str = DEFAULT_TENANT,
+                       deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Generate an email for one lead.
+
+        Args:
+            lead: Dictionary containing lead information
+            product: Product to pitch (defaults to the service's product)
+            priority: Priority class of the request
+            tenant: Campaign or customer the request is accounted to
+            deadline: Seconds after which the generation is no longer worth starting
+
+        Returns:
+            Result record with lead info, subject line and email body
+
+        Raises:
+            ServiceBusyError: If the priority class's queue is full
+            DeadlineExceededError: If no worker was free before the deadline
+        """
+        return await self._generate(lead, product or self.product, priority, tenant, deadline)
+
+    async def generate_batch(self, leads: List[Dict[str, Any]], product: Optional[Dict[str, Any]] = None,
+                             priority: str = "batch", tenant: str = DEFAULT_TENANT,
+                             deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Generate emails for several leads.
+
+        The batch is admitted only if all of its new generations fit in the
+        queue, so a batch never runs partially. Leads whose deadline passes
+        before a worker is free get an error record instead of an email.
+
+        Args:
+            leads: List of lead dictionaries
+            product: Product to pitch (defaults to the service's product)
+            priority: Priority class of the batch
+            tenant: Campaign or customer the batch is accounted to
+            deadline: Seconds after which remaining generations are no longer worth starting
+
+        Returns:
+            Result records in lead order
+        """
+        product = product or self.product
+        new_keys = {self.request_key(lead, product) for lead in leads} - set(self._inflight)
+        if len(new_keys) > self.scheduler.capacity(priority):
+            raise self._reject(priority)
+        results = await asyncio.gather(
+            *(self._generate(lead, product, priority, tenant, deadline) for lead in leads),
+            return_exceptions=True
+        )
+        records = []
+        for lead, result in zip(leads, results):
+            if isinstance(result, DeadlineExceededError):
+                result = _result_for(lead, "Error", f"Error generating email: {result}")
+            elif isinstance(result, BaseException):
+                raise result
+            records.append(result)
+        return records
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    """Read one HTTP/1.1 request.
+
+    Args:
+        reader: Stream of the client connection
+
+    Returns:
+        Tuple of (method, path, headers, body), or None when the client closed the connection
+    """
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    try:
+        method, target, _ = request_line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if "transfer-encoding" in headers:
+        raise HTTPError(400, "Chunked request bodies are not supported, send Content-Length")
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"Request body exceeds {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target.split("?", 1)[0], headers, body
+
+
+def _parse_json_body(body: bytes) -> Dict[str, Any]:
+    """Decode a JSON object request body."""
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        raise HTTPError(400, "Request body is not valid JSON")
+    if not isinstance(payload, dict):
+        raise HTTPError(400, "Request body must be a JSON object")
+    return payload
+
+
+def _scheduling_options(payload: Dict[str, Any], default_priority: str) -> Dict[str, Any]:
+    """Read the optional priority, tenant and deadline_ms fields of a request."""
+    priority = payload.get("priority", default_priority)
+    if priority not in PRIORITY_CLASSES:
+        raise HTTPError(400, f"'priority' must be one of {', '.join(PRIORITY_CLASSES)}")
+    tenant = payload.get("tenant", DEFAULT_TENANT)
+    if not isinstance(tenant, str) or not tenant:
+        raise HTTPError(400, "'tenant' must be a non-empty string")
+    deadline_ms = payload.get("deadline_ms")
+    if deadline_ms is not None and (isinstance(deadline_ms, bool) or not isinstance(deadline_ms, (int, float))
+                                    or deadline_ms <= 0):
+        raise HTTPError(400, "'deadline_ms' must be a positive number")
+    return {
+        "priority": priority,
+        "tenant": tenant,
+        "deadline": deadline_ms / 1000 if deadline_ms is not None else None
+    }
+
+
+async def _dispatch(service: EmailService, method: str, path: str, body: bytes) -> Tuple[int, Any]:
+    """Route a request to the service.
+
+    Args:
+        service: The email service
+        method: HTTP method
+        path: Request path without query string
+        body: Raw request body
+
+    Returns:
+        Tuple of (status, payload); a str payload is sent as plain text, anything else as JSON
+    """
+    routes = {
+        "/health": "GET",
+        "/metrics": "GET",
+        "/emails": "POST",
+        "/emails/batch": "POST"
+    }
+    if path not in routes:
+        raise HTTPError(404, f"Unknown path {path}")
+    if method != routes[path]:
+        raise HTTPError(405, f"{path} only supports {routes[path]}")
+
+    if path == "/health":
+        return 200, service.health()
+    if path == "/metrics":
+        return 200, get_metrics().to_prometheus()
+
+    payload = _parse_json_body(body)
+    product = payload.get("product")
+    if product is not None and not isinstance(product, dict):
+        raise HTTPError(400, "'product' must be an object")
+    if not (product or service.product):
+        raise HTTPError(400, "No product in the request and no default product configured")
+    options = _scheduling_options(payload, "interactive" if path == "/emails" else "batch")
+
+    if path == "/emails":
+        lead = payload.get("lead")
+        if not isinstance(lead, dict) or not lead:
+            raise HTTPError(400, "'lead' must be a non-empty object")
+        try:
+            result = await service.generate(lead, product, **options)
+        except DeadlineExceededError as e:
+            raise HTTPError(504, str(e))
+        return (502 if result["subject_line"] == "Error" else 200), result
+
+    leads = payload.get("leads")
+    if not isinstance(leads, list) or not all(isinstance(lead, dict) and lead for lead in leads):
+        raise HTTPError(400, "'leads' must be a list of non-empty objects")
+    return 200, {"generated_emails": await service.generate_batch(leads, product, **options)}
+
+
+def _encode_response(status: int, payload: Any, keep_alive: bool) -> bytes:
+    """Serialize an HTTP response."""
+    if isinstance(payload, str):
+        body = payload.encode("utf-8")
+        content_type = "text/plain; version=0.0.4"
+    else:
+        body = json.dumps(payload).encode("utf-8")
+        content_type = "application/json"
+    headers = [
+        f"HTTP/1.1 {status} {_REASONS.get(status, 'Unknown')}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}"
+    ]
+    if status == 503:
+        headers.append("Retry-After: 1")
+    return ("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body
+
+
+async def _handle_connection(service: EmailService, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter) -> None:
+    """Serve requests on one client connection until it closes."""
+    try:
+        while True:
+            keep_alive = False
+            try:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                status, payload = await _dispatch(service, method, path, body)
+            except HTTPError as e:
+                status, payload = e.status, {"error": e.message}
+            except ServiceBusyError as e:
+                status, payload = 503, {"error": str(e)}
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            except Exception as e:
+                print(f"Error handling request: {e}")
+                status, payload = 500, {"error": str(e)}
+            get_metrics().increment(f"service_responses_{status}")
+            writer.write(_encode_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service: EmailService, host: str = "127.0.0.1", port: int = 8080) -> None:
+    """Run the HTTP service until cancelled.
+
+    Endpoints:
+        GET /health: queue depth and in-flight generations, overall and per priority class
+        GET /metrics: metrics in the Prometheus text format
+        POST /emails: ``{"lead": {...}, "product": {...}}`` with an optional product
+        POST /emails/batch: ``{"leads": [...], "product": {...}}`` with an optional product
+
+    Both POST endpoints also accept optional ``priority`` ("interactive" or
+    "batch", defaulting to interactive for /emails and batch for
+    /emails/batch), ``tenant`` and ``deadline_ms`` fields. A single email
+    whose deadline passes before a worker is free returns 504.
+
+    Args:
+        service: The email service handling generation
+        host: Interface to bind
+        port: TCP port to listen on
+    """
+    await service.start()
+    server = await asyncio.start_server(
+        lambda reader, writer: _handle_connection(service, reader, writer), host, port
+    )
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
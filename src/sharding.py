@@ -0,0 +1,148 @@
+"""Deterministic partitioning of lead files into shards and merging of shard outputs."""
+import hashlib
+import json
+import os
+from typing import Any, BinaryIO, Callable, Dict, Tuple
+
+from app.data_handler import DataHandler
+from app.output_writers import create_output_writer
+from app.results_sink import LeadKey, ResultsSink, keyed_leads
+
+
+def shard_for(lead_id: Any, shard_count: int) -> int:
+    """Assign a lead to a shard by hashing its id.
+
+    The assignment depends only on the id and the shard count, so every
+    process and every node agrees on it without coordination.
+
+    Args:
+        lead_id: The ID of the lead
+        shard_count: Total number of shards
+
+    Returns:
+        Shard index in the range [0, shard_count)
+    """
+    digest = hashlib.sha256(json.dumps(lead_id, sort_keys=True).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count
+
+
+def shard_filter(shard_index: int, shard_count: int) -> Callable[[Dict[str, Any]], bool]:
+    """Build a predicate selecting the leads that belong to one shard.
+
+    Args:
+        shard_index: Index of the shard to select
+        shard_count: Total number of shards
+
+    Returns:
+        Callable returning True for leads in the shard
+    """
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"Shard index {shard_index} is out of range for {shard_count} shards")
+    return lambda lead: shard_for(lead.get("id"), shard_count) == shard_index
+
+
+def shard_output_path(output_path: str, shard_index: int, shard_count: int) -> str:
+    """Return the output directory used by one shard.
+
+    Args:
+        output_path: Final output directory
+        shard_index: Index of the shard
+        shard_count: Total number of shards
+
+    Returns:
+        Path of the shard's working directory
+    """
+    return os.path.join(output_path, "shards", f"shard-{shard_index:03d}-of-{shard_count:03d}")
+
+
+def parse_shard_spec(spec: str) -> Tuple[int, int]:
+    """Parse a shard specification of the form ``i/K``.
+
+    Args:
+        spec: Shard specification, e.g. ``"2/8"``
+
+    Returns:
+        Tuple of (shard_index, shard_count)
+    """
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard specification '{spec}', expected i/K")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard specification '{spec}', expected 0 <= i < K")
+    return index, count
+
+
+def merge_shards(data_path: str, output_path: str, shard_count: int, output_format: str = "json",
+                 output_batch_size: int = 1000, output_fsync_every: int = 0) -> int:
+    """Merge per-shard outputs into the usual output layout.
+
+    Results are ordered by the position of their lead in the data file, so
+    the merged aggregate output is identical regardless of the shard count.
+    Per-lead files, if the shards wrote any, are moved from the shard
+    directories into the output directory, and the merged results become the
+    checkpoint of the output directory so a later unsharded ``--resume`` run
+    can continue.
+
+    Args:
+        data_path: Path to the JSON or JSONL data file
+        output_path: Final output directory
+        shard_count: Total number of shards
+        output_format: Aggregate output format: "json", "jsonl" or "jsonl.gz"
+        output_batch_size: Results buffered in memory before each aggregate write
+        output_fsync_every: Force the aggregate to disk every this many batches (0 never forces it)
+
+    Returns:
+        Number of merged results
+    """
+    # Index the latest result of every lead across all shard sinks
+    locations: Dict[LeadKey, Tuple[int, int]] = {}
+    shard_files: Dict[int, BinaryIO] = {}
+    sink = ResultsSink(os.path.join(output_path, ".checkpoint"))
+    try:
+        for shard_index in range(shard_count):
+            shard_dir = shard_output_path(output_path, shard_index, shard_count)
+            results_path = os.path.join(shard_dir, ".checkpoint", ResultsSink.RESULTS_FILENAME)
+            if not os.path.exists(results_path):
+                print(f"Warning: No results found for shard {shard_index}/{shard_count}")
+                continue
+            # Each shard file stays open for the whole merge instead of being reopened per result
+            file = shard_files[shard_index] = open(results_path, "rb")
+            offset = 0
+            for line in file:
+                try:
+                    locations[ResultsSink.read_key(line)] = (shard_index, offset)
+                except ValueError:
+                    pass
+                offset += len(line)
+
+        def read_result(location: Tuple[int, int]) -> Dict[str, Any]:
+            shard_index, offset = location
+            file = shard_files[shard_index]
+            file.seek(offset)
+            return json.loads(file.readline())["result"]
+
+        emitted = set()
+        for key, _ in keyed_leads(DataHandler(data_path, streaming=True).iter_leads()):
+            if key in locations:
+                sink.append(key, read_result(locations[key]))
+                emitted.add(key)
+
+        # Results whose lead is no longer in the data file keep their shard order
+        for key, location in locations.items():
+            if key not in emitted:
+                sink.append(key, read_result(location))
+
+        for shard_index in range(shard_count):
+            shard_dir = shard_output_path(output_path, shard_index, shard_count)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if name.startswith("email_") and name.endswith(".json"):
+                    os.replace(os.path.join(shard_dir, name), os.path.join(output_path, name))
+
+        return sink.export(create_output_writer(output_path, output_format, output_batch_size, output_fsync_every))
+    finally:
+        sink.close()
+        for file in shard_files.values():
+            file.close()
@@ -0,0 +1,14 @@
+"""Make ``src`` importable as the ``app`` package, as it is laid out in the container."""
+import importlib.util
+import os
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+if "app" not in sys.modules:
+    spec = importlib.util.spec_from_file_location(
+        "app", os.path.join(SRC_DIR, "__init__.py"), submodule_search_locations=[SRC_DIR]
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["app"] = module
+    spec.loader.exec_module(module)
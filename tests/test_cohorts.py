@@ -0,0 +1,126 @@
+import asyncio
+
+from app.cohorts import CohortGenerator, CohortPlan, _profile_tokens, _similarity, missing_placeholders
+from app.routing import ModelTier, TieredRouter
+
+BASE = {
+    "job_title": "Head of Sales",
+    "industry": "SaaS",
+    "pain_points": ["manual outreach", "low reply rates"],
+    "interests": ["automation", "pipeline growth"],
+}
+
+TEMPLATE = ("Ideas for {{COMPANY}}", "Hi {{FIRST_NAME}},\n{{OPENING}}\nHere is how {{COMPANY}} could grow.")
+
+
+def _lead(name, company, **fields):
+    return dict(BASE, name=name, company=company, **fields)
+
+
+class StubGenerator:
+    """Returns canned cohort templates and counts the requests."""
+
+    def __init__(self, *templates):
+        self.templates = list(templates)
+        self.calls = 0
+
+    async def agenerate_cohort_template(self, lead, product):
+        self.calls += 1
+        await asyncio.sleep(0)
+        return self.templates[min(self.calls, len(self.templates)) - 1]
+
+    async def agenerate_opening(self, lead):
+        return "Congrats on the launch."
+
+
+def test_leads_matching_after_normalization_share_a_cohort():
+    plan = CohortPlan.build([
+        _lead("Ada Lovelace", "Acme"),
+        _lead("Ben Hur", "Beta", job_title="head of sales!", pain_points=["Low reply rates", "Manual outreach"]),
+        _lead("Cy Young", "Cobalt", industry="Fintech"),
+    ], similarity=1.0)
+
+    assert plan.cohort_count == 2
+    assert plan.reusable_leads == 1
+    assert plan.cohort_for(_lead("Ada Lovelace", "Acme")) == plan.cohort_for(_lead("Other", "Other"))
+    assert plan.cohort_for(_lead("Cy Young", "Cobalt", industry="Fintech")) is None
+
+
+def test_jaccard_similarity_of_profile_words():
+    first = _profile_tokens(BASE)
+    second = _profile_tokens(dict(BASE, interests=["automation"]))
+
+    assert _similarity(first, first) == 1.0
+    assert _similarity(first, second) == len(second) / len(first)
+    assert _similarity(frozenset(), frozenset()) == 1.0
+
+
+def test_near_duplicates_join_only_above_the_threshold_and_with_the_same_title():
+    near = _lead("Ben", "Beta", pain_points=["manual outreach", "low reply rates", "churn"])
+    other_title = _lead("Cy", "Cobalt", job_title="CFO", pain_points=near["pain_points"])
+    similarity = _similarity(_profile_tokens(BASE), _profile_tokens(near))
+
+    loose = CohortPlan.build([_lead("Ada", "Acme"), near, other_title], similarity=similarity)
+    strict = CohortPlan.build([_lead("Ada", "Acme"), near, other_title], similarity=min(1.0, similarity + 0.01))
+
+    assert loose.cohort_count == 2 and loose.size(loose.cohort_for(near)) == 2
+    assert strict.cohort_count == 3
+
+
+def test_one_template_is_personalized_for_every_lead_of_a_cohort():
+    leads = [_lead("Ada Lovelace", "Acme", linkedin_activity="Shared a post"), _lead("Ben Hur", "Beta")]
+    generator = StubGenerator(TEMPLATE)
+    cohorts = CohortGenerator(CohortPlan.build(leads), generator, {"name": "P"})
+
+    async def run():
+        return await asyncio.gather(*(cohorts.agenerate(lead) for lead in leads))
+
+    emails = asyncio.run(run())
+
+    assert generator.calls == 1
+    assert emails[0] == (
+        "Ideas for Acme", "Hi Ada,\nI noticed you shared a post on LinkedIn.\nHere is how Acme could grow."
+    )
+    assert emails[1] == ("Ideas for Beta", "Hi Ben,\nHere is how Beta could grow.")
+
+
+def test_template_without_placeholders_falls_back_to_individual_generation():
+    leads = [_lead("Ada", "Acme"), _lead("Ben", "Beta"), _lead("Cy", "Cobalt")]
+    generator = StubGenerator(("Ideas for Acme", "Hi Ada,\nHere is how Acme could grow."), TEMPLATE)
+    cohorts = CohortGenerator(CohortPlan.build(leads), generator, {"name": "P"})
+
+    async def run():
+        first = await cohorts.agenerate(leads[0])
+        rest = [await cohorts.agenerate(lead) for lead in leads[1:]]
+        return [first] + rest
+
+    assert missing_placeholders(*TEMPLATE) == []
+    assert missing_placeholders("Ideas for Acme", "Hi {{FIRST_NAME}}") == ["{{COMPANY}}"]
+    assert asyncio.run(run()) == [None, None, None]
+    assert generator.calls == 1
+
+
+def test_failed_template_lets_the_next_lead_retry():
+    leads = [_lead("Ada", "Acme"), _lead("Ben", "Beta")]
+    generator = StubGenerator(("Error", "timeout"), TEMPLATE)
+    cohorts = CohortGenerator(CohortPlan.build(leads), generator, {"name": "P"})
+
+    async def run():
+        return [await cohorts.agenerate(lead) for lead in leads]
+
+    first, second = asyncio.run(run())
+
+    assert first is None
+    assert second == ("Ideas for Beta", "Hi Ben,\nHere is how Beta could grow.")
+
+
+def test_router_escalates_templates_missing_placeholders():
+    body = "Hi {{FIRST_NAME}},\n{{OPENING}}\n" + "word " * 160 + "for {{COMPANY}}."
+    fast = StubGenerator(("Ideas for Acme", "Hi Ada, " + "word " * 160))
+    slow = StubGenerator(("Ideas for {{COMPANY}}", body))
+    router = TieredRouter([ModelTier("fast", fast), ModelTier("slow", slow)])
+
+    template = asyncio.run(router.agenerate_cohort_template(_lead("Ada", "Acme"), {"name": "P"}))
+
+    assert template == ("Ideas for {{COMPANY}}", body)
+    assert router.stats()["escalations"] == 1
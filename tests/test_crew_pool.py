@@ -0,0 +1,118 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.agents import EMAIL_WRITING_INPUT, LEAD_ANALYSIS_INPUT, CrewPool, EmailCrewAgent
+from app.llm_backends import FakeLLMBackend
+from app.llm_interface import LLMInterface
+
+
+class FakeCrew:
+    """Records kickoff inputs and fills in task outputs like a CrewAI crew."""
+
+    def __init__(self):
+        self.tasks = [SimpleNamespace(output=None), SimpleNamespace(output=None)]
+        self.inputs = []
+
+    def kickoff(self, inputs=None):
+        self.inputs.append(inputs)
+        self.tasks[0].output = SimpleNamespace(raw="analysis")
+        self.tasks[1].output = SimpleNamespace(raw="Subject Line: Hello\n\nBody text")
+        return "Subject Line: Hello\n\nBody text"
+
+
+def _pool(size, built):
+    def factory():
+        crew = FakeCrew()
+        built.append(crew)
+        return crew, crew.tasks
+
+    return CrewPool(factory, size=size)
+
+
+def test_crews_are_built_lazily_and_reused():
+    built = []
+    pool = _pool(2, built)
+
+    for _ in range(5):
+        with pool.acquire() as (crew, _):
+            pass
+
+    assert len(built) == 1
+
+
+def test_most_recently_returned_crew_is_reused_first():
+    built = []
+    pool = _pool(3, built)
+
+    with pool.acquire() as (first, _):
+        with pool.acquire() as (second, _):
+            pass
+    with pool.acquire() as (reused, _):
+        pass
+
+    assert len(built) == 2
+    assert reused is first
+
+
+def test_concurrent_users_never_exceed_the_pool_size():
+    built = []
+    pool = _pool(2, built)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def use():
+        with pool.acquire():
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.01)
+            with lock:
+                active.pop()
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(built) == 2
+    assert max(peak) == 2
+
+
+def test_failed_build_does_not_use_up_a_slot():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("no crewai")
+        crew = FakeCrew()
+        return crew, crew.tasks
+
+    pool = CrewPool(factory, size=1)
+    with pytest.raises(RuntimeError):
+        with pool.acquire():
+            pass
+    with pool.acquire() as (crew, _):
+        assert isinstance(crew, FakeCrew)
+
+
+def test_lead_inputs_are_passed_to_kickoff():
+    agent = EmailCrewAgent(LLMInterface(backend=FakeLLMBackend()))
+    built = []
+    agent.crew_pool = _pool(1, built)
+    lead = {"name": "Ada Lovelace", "company": "Acme", "job_title": "CTO"}
+    product = {"name": "OutreachPro", "description": "Email automation"}
+
+    assert agent._generate_with_crew(lead, product) == ("Hello", "Body text")
+    assert agent._generate_with_crew(dict(lead, name="Ben Hur"), product) == ("Hello", "Body text")
+
+    crew = built[0]
+    assert len(built) == 1
+    assert [set(inputs) for inputs in crew.inputs] == [{LEAD_ANALYSIS_INPUT, EMAIL_WRITING_INPUT}] * 2
+    assert "Ada Lovelace" in crew.inputs[0][LEAD_ANALYSIS_INPUT]
+    assert "Ben Hur" in crew.inputs[1][LEAD_ANALYSIS_INPUT]
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from app.email_generator import EmailChunk, EmailGenerator, EmailStreamParser
+
+SAMPLES = [
+    "Subject Line: Faster outreach for Acme\n\nHi Jane,\n\nWe help teams like yours.\n\nBest,\nSam\n",
+    "Here is your email:\nSubject: Quick idea\nHi Jane,\n  indented line\n\n\nThanks",
+    "  SUBJECT LINE:   Spaced subject   \r\nBody line one\r\nBody line two  \n\n",
+    "Subject Line:\nThe whole content becomes the body",
+    "No subject anywhere\njust text",
+    "Error generating content: timeout",
+    "Subject: Only a subject",
+    "",
+]
+
+
+def _stream(text, pieces):
+    parser = EmailStreamParser()
+    chunks = []
+    for piece in pieces:
+        chunks.extend(parser.feed(piece))
+    chunks.extend(parser.close())
+    return chunks
+
+
+def _split(text, rng):
+    cuts = sorted(rng.sample(range(len(text) + 1), min(len(text), rng.randint(0, 8))))
+    return [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+
+def _collect(chunks):
+    subjects = [chunk.text for chunk in chunks if chunk.kind == "subject"]
+    body = "".join(chunk.text for chunk in chunks if chunk.kind == "body")
+    return subjects, body
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_stream_matches_batch_parser_for_any_chunking(text):
+    generator = EmailGenerator(llm_interface=None)
+    expected = generator._handle_generated_content(text)
+    rng = random.Random(text)
+
+    for pieces in [[text], list(text)] + [_split(text, rng) for _ in range(20)]:
+        subjects, body = _collect(_stream(text, pieces))
+        assert len(subjects) == 1
+        assert (subjects[0], body) == expected
+
+
+def test_subject_is_emitted_as_soon_as_its_line_is_complete():
+    parser = EmailStreamParser()
+
+    assert parser.feed("Subject Line: Hello") == []
+    assert parser.feed(" there\nHi") == [EmailChunk("subject", "Hello there"), EmailChunk("body", "Hi")]
+    assert parser.feed(" Jane,  ") == [EmailChunk("body", " Jane,")]
+    assert parser.feed("\n") == []
+    assert parser.close() == []
+
+
+def test_text_before_the_subject_is_held_back():
+    parser = EmailStreamParser()
+
+    assert parser.feed("Sure! Here you go:\n") == []
+    assert parser.feed("Subject: Hi\nBody") == [EmailChunk("subject", "Hi"), EmailChunk("body", "Body")]
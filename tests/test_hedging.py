@@ -0,0 +1,79 @@
+import asyncio
+
+from app.llm_backends import LLMBackend, LLMResult
+from app.llm_interface import HEDGE_MIN_SAMPLES, LLMInterface
+from app.metrics import get_metrics
+from app.rate_limiter import RateLimiter
+
+
+class SlowFirstCallBackend(LLMBackend):
+    """Answers quickly, except for the first call after arm()."""
+
+    model_name = "slow-first"
+
+    def __init__(self):
+        self.calls = 0
+        self.slow_next = False
+
+    def arm(self):
+        self.slow_next = True
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        slow, self.slow_next = self.slow_next, False
+        await asyncio.sleep(0.2 if slow else 0.001)
+        return LLMResult("Subject: Hi\nBody", 1, 1)
+
+
+def _warm_interface(backend, rate_limiter=None):
+    interface = LLMInterface(backend=backend, rate_limiter=rate_limiter, hedge_percentile=50)
+    for _ in range(HEDGE_MIN_SAMPLES):
+        interface.latency_tracker.record(0.001)
+    return interface
+
+
+def _hedged_call(interface, backend):
+    async def scenario():
+        backend.arm()
+        return await interface._ainvoke("prompt")
+
+    return asyncio.run(scenario())
+
+
+def test_slow_call_is_hedged_when_budget_allows():
+    backend = SlowFirstCallBackend()
+    hedges = get_metrics().counter("llm_hedges")
+
+    _hedged_call(_warm_interface(backend, RateLimiter(requests_per_minute=100)), backend)
+
+    assert backend.calls == 2
+    assert get_metrics().counter("llm_hedges") == hedges + 1
+
+
+def test_hedge_is_suppressed_without_rate_limit_budget():
+    backend = SlowFirstCallBackend()
+    suppressed = get_metrics().counter("llm_hedges_suppressed")
+    # One request per minute: the primary takes the only slot
+    limiter = RateLimiter(requests_per_minute=1)
+
+    _hedged_call(_warm_interface(backend, limiter), backend)
+
+    assert backend.calls == 1
+    assert get_metrics().counter("llm_hedges_suppressed") == suppressed + 1
+
+
+def test_hedge_is_suppressed_while_the_circuit_is_open():
+    backend = SlowFirstCallBackend()
+    interface = _warm_interface(backend)
+
+    async def scenario():
+        backend.arm()
+        primary = asyncio.ensure_future(interface._ainvoke_hedged("prompt"))
+        await asyncio.sleep(0)
+        for _ in range(interface.circuit_breaker.failure_threshold):
+            interface.circuit_breaker.record_failure()
+        return await primary
+
+    asyncio.run(scenario())
+
+    assert backend.calls == 1
@@ -0,0 +1,84 @@
+import io
+import json
+
+import pytest
+
+from app.json_stream import JSONStreamReader, iter_json_array, iter_jsonl, read_json_member
+
+
+def _write(path, text):
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        file.write(text)
+    return str(path)
+
+
+def test_iter_json_array_yields_byte_offsets_of_non_ascii_items(tmp_path):
+    leads = [{"id": "ü-0", "notes": "日本語 ✓ 😀"}, {"id": "léad-1", "name": "Renée"}, {"id": 3}]
+    path = _write(tmp_path / "leads.json", json.dumps({"product": {"name": "Prodúct"}, "leads": leads},
+                                                       ensure_ascii=False))
+    with open(path, "rb") as file:
+        raw = file.read()
+
+    items = list(iter_json_array(path, "leads"))
+
+    assert [item for _, item, _ in items] == leads
+    for start, item, end in items:
+        assert json.loads(raw[start:end].decode("utf-8")) == item
+
+
+def test_byte_offsets_survive_chunk_boundaries_and_crlf():
+    leads = [{"id": f"lead-{i}", "name": "Zoë😀" * (i % 5)} for i in range(50)]
+    text = json.dumps({"leads": leads}, ensure_ascii=False, indent=2).replace("\n", "\r\n")
+    raw = text.encode("utf-8")
+    reader = JSONStreamReader(io.TextIOWrapper(io.BytesIO(raw), encoding="utf-8", newline=""), chunk_size=7)
+
+    assert next(reader.iter_object_keys()) == "leads"
+    items = list(reader.iter_array())
+
+    assert [item for _, item, _ in items] == leads
+    for start, item, end in items:
+        assert json.loads(raw[start:end].decode("utf-8")) == item
+
+
+def test_reader_with_small_chunks_matches_full_parse():
+    document = {"product": {"name": "P"}, "leads": [{"id": i, "score": 12345.678 * i} for i in range(30)]}
+    raw = json.dumps(document, ensure_ascii=False).encode("utf-8")
+    reader = JSONStreamReader(io.TextIOWrapper(io.BytesIO(raw), encoding="utf-8", newline=""), chunk_size=3)
+
+    parsed = {}
+    for key in reader.iter_object_keys():
+        if key == "leads":
+            parsed[key] = []
+            for start, item, end in reader.iter_array():
+                assert json.loads(raw[start:end]) == item
+                parsed[key].append(item)
+        else:
+            parsed[key] = reader.decode_value()
+
+    assert parsed == document
+
+
+def test_read_json_member_skips_other_members(tmp_path):
+    path = _write(tmp_path / "data.json", '{"leads": [{"id": 1}, [2, {"x": "]"}]], "product": {"name": "P"}}')
+
+    assert read_json_member(path, "product") == {"name": "P"}
+    assert read_json_member(path, "missing", default={}) == {}
+
+
+def test_malformed_array_raises(tmp_path):
+    path = _write(tmp_path / "bad.json", '{"leads": [{"id": 1} {"id": 2}]}')
+
+    with pytest.raises(ValueError):
+        list(iter_json_array(path, "leads"))
+
+
+def test_iter_jsonl_skips_blank_lines(tmp_path):
+    path = _write(tmp_path / "leads.jsonl", '{"id": "é"}\n\n{"id": 2}\n')
+    with open(path, "rb") as file:
+        raw = file.read()
+
+    records = list(iter_jsonl(path))
+
+    assert [record for _, record, _ in records] == [{"id": "é"}, {"id": 2}]
+    for start, record, end in records:
+        assert json.loads(raw[start:end]) == record
@@ -0,0 +1,72 @@
+import json
+import os
+
+from app.data_handler import DataHandler
+from app.lead_store import LeadStore
+
+LEADS = [
+    {"id": "ü-0", "name": "Zoë Ñandú", "notes": "日本語 ✓ 😀"},
+    {"id": "léad-1", "name": "Renée", "company": "Café Crème"},
+    {"id": 2, "name": "Plain"},
+]
+
+
+def _write_json(path, leads, **dump_options):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"product": {"name": "Prodúct"}, "leads": leads}, file, ensure_ascii=False, **dump_options)
+    return str(path)
+
+
+def test_non_ascii_id_after_non_ascii_fields(tmp_path):
+    store = LeadStore(_write_json(tmp_path / "leads.json", LEADS))
+
+    assert store.get("léad-1") == LEADS[1]
+    assert store.get("ü-0") == LEADS[0]
+    assert store.get(2) == LEADS[2]
+    assert store.get("missing") == {}
+    assert len(store) == 3
+    store.close()
+
+
+def test_data_handler_lookup_matches_linear_scan(tmp_path):
+    path = _write_json(tmp_path / "leads.json", LEADS, indent=2)
+
+    handler = DataHandler(path)
+
+    for lead in LEADS:
+        assert handler.get_lead_by_id(lead["id"]) == lead
+
+
+def test_jsonl_lookup(tmp_path):
+    path = tmp_path / "leads.jsonl"
+    path.write_text("".join(json.dumps(lead, ensure_ascii=False) + "\n" for lead in LEADS), encoding="utf-8")
+
+    store = LeadStore(str(path))
+
+    assert store.get("léad-1") == LEADS[1]
+    store.close()
+
+
+def test_first_duplicate_wins(tmp_path):
+    store = LeadStore(_write_json(tmp_path / "leads.json", [{"id": 1, "v": "first"}, {"id": 1, "v": "second"}]))
+
+    assert store.get(1) == {"id": 1, "v": "first"}
+    store.close()
+
+
+def test_persisted_index_is_reused_and_rebuilt_on_change(tmp_path):
+    path = _write_json(tmp_path / "leads.json", LEADS)
+
+    store = LeadStore(path, persist_index=True)
+    assert store.get("léad-1") == LEADS[1]
+    store.close()
+    assert os.path.exists(f"{path}.idx")
+
+    reloaded = LeadStore(path, persist_index=True)
+    assert reloaded.get("léad-1") == LEADS[1]
+
+    _write_json(path, LEADS + [{"id": "nouveau-é", "name": "New"}])
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert reloaded.get("nouveau-é") == {"id": "nouveau-é", "name": "New"}
+    reloaded.close()
@@ -0,0 +1,35 @@
+import pytest
+
+from app.llm_backends import FakeLLMBackend, FakeLLMError, NullBackend
+
+
+def test_fake_backend_retries_see_fresh_outcomes():
+    backend = FakeLLMBackend(error_rate=0.5, seed=3)
+    outcomes = []
+    for _ in range(20):
+        try:
+            backend.invoke("Name: Ada\nCompany: Acme")
+            outcomes.append(True)
+        except FakeLLMError:
+            outcomes.append(False)
+
+    assert True in outcomes and False in outcomes
+
+
+def test_fake_backend_tracks_a_bounded_number_of_prompts(monkeypatch):
+    monkeypatch.setattr(FakeLLMBackend, "MAX_TRACKED_PROMPTS", 5)
+    backend = FakeLLMBackend()
+
+    for i in range(50):
+        backend.invoke(f"Name: Lead {i}")
+
+    assert len(backend._attempts) == 5
+    assert list(backend._attempts) == [f"Name: Lead {i}" for i in range(45, 50)]
+
+
+def test_null_backend_refuses_model_calls():
+    backend = NullBackend().for_model("gpt-4o")
+
+    assert backend.model_name == "gpt-4o"
+    with pytest.raises(RuntimeError):
+        backend.invoke("prompt")
@@ -0,0 +1,48 @@
+import json
+import os
+
+from app.llm_backends import FakeLLMBackend
+from app.main import generate_emails_for_all_leads
+
+
+def _write_leads(path, leads):
+    product = {"name": "OutreachPro", "description": "Email automation", "key_features": ["Sequencing"]}
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"leads": leads, "product": product}, file)
+
+
+def test_generates_an_email_per_lead_with_the_fake_backend(tmp_path):
+    data_path = str(tmp_path / "leads.json")
+    output_path = str(tmp_path / "output")
+    leads = [{"id": i, "name": f"Lead {i}", "company": f"Company {i}", "job_title": "CTO"} for i in range(1, 4)]
+    _write_leads(data_path, leads)
+
+    results = generate_emails_for_all_leads(
+        data_path, output_path, concurrency=2, llm_backend=FakeLLMBackend(body_words=80)
+    )
+
+    assert [result["lead_id"] for result in results] == [1, 2, 3]
+    assert all(result["subject_line"] == f"An idea for Company {i}" for i, result in enumerate(results, start=1))
+    with open(os.path.join(output_path, "all_generated_emails.json"), encoding="utf-8") as file:
+        assert json.load(file) == {"generated_emails": results}
+
+
+def test_leads_with_missing_or_duplicate_ids_each_get_an_email(tmp_path):
+    data_path = str(tmp_path / "leads.json")
+    output_path = str(tmp_path / "output")
+    leads = [
+        {"id": 1, "name": "Ada", "company": "Acme"},
+        {"name": "Ben", "company": "Beta"},
+        {"id": 1, "name": "Cy", "company": "Cobalt"},
+        {"name": "Di", "company": "Delta"},
+    ]
+    _write_leads(data_path, leads)
+
+    first = generate_emails_for_all_leads(data_path, output_path, llm_backend=FakeLLMBackend(body_words=80))
+    resumed = generate_emails_for_all_leads(
+        data_path, output_path, resume=True, llm_backend=FakeLLMBackend(error_rate=1.0)
+    )
+
+    assert [result["lead_name"] for result in first] == ["Ada", "Ben", "Cy", "Di"]
+    assert [result["lead_id"] for result in first] == [1, "unknown", 1, "unknown"]
+    assert resumed == first
@@ -0,0 +1,88 @@
+from app.lead_record import LeadInterner
+from app.manifest import RunManifest, lead_input_fingerprint, run_fingerprint
+
+LEAD = {
+    "id": 7,
+    "name": "Jane Doe",
+    "job_title": "CTO",
+    "company": "Acme",
+    "industry": "SaaS",
+    "interests": ["AI", "Security"],
+    "pain_points": ["Churn"],
+    "linkedin_activity": "Posted about hiring",
+}
+
+
+def test_lead_fingerprint_ignores_fields_outside_the_prompt():
+    changed = dict(LEAD, id=8, email="jane@example.com")
+
+    assert lead_input_fingerprint(changed) == lead_input_fingerprint(LEAD)
+
+
+def test_lead_fingerprint_changes_with_any_prompt_field():
+    base = lead_input_fingerprint(LEAD)
+    for field, value in [("name", "Jane Roe"), ("interests", ["AI"]), ("linkedin_activity", None)]:
+        assert lead_input_fingerprint(dict(LEAD, **{field: value})) != base
+
+
+def test_missing_and_null_fields_fingerprint_alike():
+    without = {key: value for key, value in LEAD.items() if key != "industry"}
+
+    assert lead_input_fingerprint(without) == lead_input_fingerprint(dict(LEAD, industry=None))
+
+
+def test_compact_records_fingerprint_like_dicts():
+    assert lead_input_fingerprint(LeadInterner().compact(LEAD)) == lead_input_fingerprint(LEAD)
+
+
+def test_run_fingerprint_tracks_product_template_and_settings():
+    product = {"name": "P", "features": ["a", "b"]}
+    base = run_fingerprint(product, 2)
+
+    assert run_fingerprint({"features": ["a", "b"], "name": "P"}, 2) == base
+    assert run_fingerprint(product, 2, {}) == base
+    assert run_fingerprint(dict(product, name="Q"), 2) != base
+    assert run_fingerprint(product, 3) != base
+    assert run_fingerprint(product, 2, {"prompt_budget": {"linkedin_activity": 150}}) != base
+
+
+def test_manifest_round_trip_keeps_integer_and_string_ids_apart(tmp_path):
+    path = str(tmp_path / RunManifest.FILENAME)
+    manifest = RunManifest(path, "run")
+    manifest.record(1, "int")
+    manifest.record("1", "str")
+    manifest.save()
+
+    loaded = RunManifest.load(path)
+
+    assert loaded.run_key == "run"
+    assert loaded.get(1) == "int"
+    assert loaded.get("1") == "str"
+    assert loaded.get(2) is None
+
+
+def test_changed_leads_are_found_by_comparing_manifests(tmp_path):
+    path = str(tmp_path / RunManifest.FILENAME)
+    leads = [dict(LEAD, id=i, name=f"Lead {i}") for i in range(3)]
+    previous = RunManifest(path, "run")
+    for lead in leads:
+        previous.record(lead["id"], lead_input_fingerprint(lead))
+    previous.save()
+
+    leads[1]["pain_points"] = ["Budget"]
+    loaded = RunManifest.load(path)
+    changed = [lead["id"] for lead in leads + [dict(LEAD, id=3)]
+               if loaded.get(lead["id"]) != lead_input_fingerprint(lead)]
+
+    assert changed == [1, 3]
+
+
+def test_unreadable_or_outdated_manifest_is_ignored(tmp_path):
+    corrupt = tmp_path / "corrupt.json"
+    corrupt.write_text("{not json", encoding="utf-8")
+    outdated = tmp_path / "outdated.json"
+    outdated.write_text('{"version": 0, "run": "run", "leads": {}}', encoding="utf-8")
+
+    assert RunManifest.load(str(corrupt)) is None
+    assert RunManifest.load(str(outdated)) is None
+    assert RunManifest.load(str(tmp_path / "missing.json")) is None
@@ -0,0 +1,42 @@
+import gc
+
+from app.metrics import Metrics
+
+
+def test_run_registry_records_only_updates_after_it_started():
+    metrics = Metrics()
+    metrics.increment("leads_generated", 3)
+
+    run = metrics.start_run()
+    metrics.increment("leads_generated")
+    metrics.observe("llm_call", 0.5)
+    metrics.set_gauge("queue_depth", 4)
+
+    assert run.counter("leads_generated") == 1
+    assert run.summary()["stages"]["llm_call"]["count"] == 1
+    assert run.gauge("queue_depth") == 4
+    assert metrics.counter("leads_generated") == 4
+
+
+def test_consecutive_runs_report_separately():
+    metrics = Metrics()
+
+    first = metrics.start_run()
+    metrics.increment("leads_generated", 2)
+    second = metrics.start_run()
+    metrics.increment("leads_generated", 5)
+
+    assert first.counter("leads_generated") == 7
+    assert second.counter("leads_generated") == 5
+    assert metrics.counter("leads_generated") == 7
+
+
+def test_released_run_stops_receiving_updates():
+    metrics = Metrics()
+    run = metrics.start_run()
+    del run
+    gc.collect()
+
+    metrics.increment("leads_generated")
+
+    assert len(metrics._runs) == 0
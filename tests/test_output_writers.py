@@ -0,0 +1,85 @@
+import gzip
+import json
+import os
+
+import pytest
+
+from app.llm_backends import FakeLLMBackend
+from app.main import generate_emails_for_all_leads
+from app.output_writers import PerLeadFileWriter, create_output_writer
+
+RESULTS = [
+    {"lead_id": i, "lead_name": f"Lead {i}", "subject_line": f"Subject {i}", "email_body": "Body\nwith \"quotes\""}
+    for i in range(5)
+]
+
+
+def _write_all(directory, output_format, results=RESULTS, batch_size=2):
+    with create_output_writer(str(directory), output_format, batch_size=batch_size) as writer:
+        for result in results:
+            writer.write(result)
+    return writer.path
+
+
+@pytest.mark.parametrize("results", [RESULTS, RESULTS[:1], []])
+def test_json_document_matches_json_dump(tmp_path, results):
+    path = _write_all(tmp_path, "json", results)
+
+    assert os.path.basename(path) == "all_generated_emails.json"
+    with open(path, encoding="utf-8") as file:
+        assert file.read() == json.dumps({"generated_emails": results}, indent=2)
+
+
+def test_jsonl_writes_one_compact_object_per_line(tmp_path):
+    path = _write_all(tmp_path, "jsonl")
+
+    assert os.path.basename(path) == "generated_emails.jsonl"
+    with open(path, encoding="utf-8") as file:
+        lines = file.read().splitlines()
+    assert [json.loads(line) for line in lines] == RESULTS
+    assert all(": " not in line for line in lines)
+
+
+def test_compressed_jsonl(tmp_path):
+    path = _write_all(tmp_path, "jsonl.gz")
+
+    assert os.path.basename(path) == "generated_emails.jsonl.gz"
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        assert [json.loads(line) for line in file] == RESULTS
+
+
+def test_failed_write_leaves_no_partial_output(tmp_path):
+    with pytest.raises(RuntimeError):
+        with create_output_writer(str(tmp_path), "jsonl") as writer:
+            writer.write(RESULTS[0])
+            raise RuntimeError("interrupted")
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        create_output_writer(str(tmp_path), "csv")
+
+
+def test_per_lead_files_use_the_original_layout(tmp_path):
+    writer = PerLeadFileWriter(str(tmp_path))
+    writer.write(RESULTS[1])
+
+    with open(tmp_path / "email_1_Lead_1.json", encoding="utf-8") as file:
+        assert json.load(file) == RESULTS[1]
+
+
+def test_per_lead_files_are_off_by_default(tmp_path):
+    data_path = tmp_path / "leads.json"
+    leads = [{"id": i, "name": f"Lead {i}", "company": f"Company {i}"} for i in range(3)]
+    data_path.write_text(json.dumps({"leads": leads, "product": {"name": "OutreachPro"}}), encoding="utf-8")
+
+    default_dir, compat_dir = tmp_path / "default", tmp_path / "compat"
+    generate_emails_for_all_leads(str(data_path), str(default_dir), llm_backend=FakeLLMBackend())
+    generate_emails_for_all_leads(str(data_path), str(compat_dir), llm_backend=FakeLLMBackend(), per_lead_files=True)
+
+    assert not [name for name in os.listdir(default_dir) if name.startswith("email_")]
+    assert sorted(name for name in os.listdir(compat_dir) if name.startswith("email_")) == [
+        f"email_{i}_Lead_{i}.json" for i in range(3)
+    ]
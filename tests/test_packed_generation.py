@@ -0,0 +1,83 @@
+import asyncio
+
+from app.email_generator import EmailGenerator
+
+LEADS = [{"name": "Ada", "company": "Acme"}, {"name": "Ben", "company": "Beta"}, {"name": "Cy", "company": "Cobalt"}]
+PRODUCT = {"name": "OutreachPro"}
+
+
+def _section(number, subject, body):
+    return f"=== EMAIL {number} ===\nSubject Line: {subject}\n\n{body}\n"
+
+
+class StubInterface:
+    """Answers the packed prompt with a canned response and single prompts with one email per lead."""
+
+    def __init__(self, packed_response):
+        self.packed_response = packed_response
+        self.prompts = []
+
+    def create_packed_email_prompt(self, leads, product):
+        return "PACKED"
+
+    def create_email_prompt(self, lead, product):
+        return lead["name"]
+
+    def generate_content(self, prompt):
+        self.prompts.append(prompt)
+        if prompt == "PACKED":
+            return self.packed_response
+        return f"Subject Line: Single for {prompt}\n\nBody for {prompt}"
+
+    async def agenerate_content(self, prompt):
+        return self.generate_content(prompt)
+
+
+def test_packed_response_is_split_per_lead():
+    content = "Here you go:\n" + _section(1, "One", "First body") + _section(2, "Two", "Second\nbody") \
+        + "= Email 3 =\nSubject: Three\nThird body"
+
+    emails = EmailGenerator(StubInterface(content))._parse_packed_content(content, 3)
+
+    assert emails == [("One", "First body"), ("Two", "Second\nbody"), ("Three", "Third body")]
+
+
+def test_sections_are_matched_by_marker_number_not_position():
+    content = _section(2, "Two", "Second body") + _section(1, "One", "First body")
+
+    emails = EmailGenerator(StubInterface(content))._parse_packed_content(content, 2)
+
+    assert emails == [("One", "First body"), ("Two", "Second body")]
+
+
+def test_missing_and_malformed_sections_are_none():
+    content = (
+        _section(1, "One", "First body")
+        + _section(1, "Duplicate", "Ignored body")
+        + _section(7, "Out of range", "Ignored body")
+        + "=== EMAIL 3 ===\nNo subject line here\n"
+        + "=== EMAIL 4 ===\nSubject Line: Four\n"
+    )
+
+    emails = EmailGenerator(StubInterface(content))._parse_packed_content(content, 4)
+
+    assert emails == [("One", "First body"), None, None, None]
+
+
+def test_leads_missing_from_the_packed_response_are_retried_individually():
+    content = _section(1, "One", "First body") + "=== EMAIL two ===\n" + _section(3, "Three", "Third body")
+    interface = StubInterface(content)
+
+    emails = asyncio.run(EmailGenerator(interface).agenerate_emails(LEADS, PRODUCT))
+
+    assert emails == [("One", "First body"), ("Single for Ben", "Body for Ben"), ("Three", "Third body")]
+    assert interface.prompts == ["PACKED", "Ben"]
+
+
+def test_unparseable_packed_response_falls_back_for_every_lead():
+    interface = StubInterface("Error generating content: timeout")
+
+    emails = EmailGenerator(interface).generate_emails(LEADS, PRODUCT)
+
+    assert emails == [(f"Single for {lead['name']}", f"Body for {lead['name']}") for lead in LEADS]
+    assert interface.prompts == ["PACKED", "Ada", "Ben", "Cy"]
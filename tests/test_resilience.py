@@ -0,0 +1,81 @@
+import asyncio
+
+from app.agents import EmailCrewAgent
+from app.llm_backends import FakeLLMBackend
+from app.llm_interface import LLMFailure, LLMInterface
+from app.rate_limiter import RateLimiter
+from app.resilience import CircuitBreaker, RetryPolicy
+
+LEAD = {"id": 1, "name": "Ada Lovelace", "company": "Acme"}
+PRODUCT = {"name": "OutreachPro", "description": "Email automation"}
+
+
+def _half_open_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    return breaker
+
+
+def test_only_the_trial_owner_can_release_it():
+    breaker = _half_open_breaker()
+    trial, other = object(), object()
+
+    assert breaker.allow_request(trial)
+    assert not breaker.allow_request(other)
+    breaker.release_trial(other)
+    assert not breaker.allow_request(other)
+    breaker.release_trial(trial)
+    assert breaker.allow_request(other)
+
+
+def test_trial_cancelled_while_waiting_for_the_rate_limiter_is_released():
+    breaker = _half_open_breaker()
+    limiter = RateLimiter(requests_per_minute=1)
+    interface = LLMInterface(backend=FakeLLMBackend(), rate_limiter=limiter, circuit_breaker=breaker)
+
+    async def scenario():
+        # The only request slot is taken, so the trial waits for the limiter until it is cancelled
+        await limiter.acquire()
+        trial = asyncio.ensure_future(interface._ainvoke("Name: Ada"))
+        await asyncio.sleep(0.01)
+        trial.cancel()
+        await asyncio.gather(trial, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request(object())
+
+
+def test_failed_request_is_a_typed_failure():
+    interface = LLMInterface(backend=FakeLLMBackend(error_rate=1.0), retry_policy=RetryPolicy(max_attempts=1))
+
+    content = interface.generate_content("Name: Ada")
+
+    assert isinstance(content, LLMFailure)
+    assert content.startswith("Error generating content")
+
+
+def test_llm_failure_falls_back_to_crewai_while_the_circuit_is_closed(monkeypatch):
+    interface = LLMInterface(backend=FakeLLMBackend(error_rate=1.0), retry_policy=RetryPolicy(max_attempts=1),
+                             circuit_breaker=CircuitBreaker(failure_threshold=100))
+    agent = EmailCrewAgent(interface)
+    fallbacks = []
+    monkeypatch.setattr(agent, "_generate_with_crew", lambda lead, product: fallbacks.append(lead) or ("Crew", "Body"))
+
+    assert agent.generate_email_for_lead(LEAD, PRODUCT) == ("Crew", "Body")
+    assert asyncio.run(agent.agenerate_email_for_lead(LEAD, PRODUCT)) == ("Crew", "Body")
+    assert fallbacks == [LEAD, LEAD]
+
+
+def test_llm_failure_fails_fast_once_the_circuit_is_open(monkeypatch):
+    interface = LLMInterface(backend=FakeLLMBackend(error_rate=1.0), retry_policy=RetryPolicy(max_attempts=1),
+                             circuit_breaker=CircuitBreaker(failure_threshold=1))
+    agent = EmailCrewAgent(interface)
+    monkeypatch.setattr(agent, "_generate_with_crew", lambda lead, product: ("Crew", "Body"))
+
+    subject_line, email_body = asyncio.run(agent.agenerate_email_for_lead(LEAD, PRODUCT))
+
+    assert subject_line == "Error"
+    assert email_body.startswith("LLM endpoint unavailable")
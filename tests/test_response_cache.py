@@ -0,0 +1,126 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app import rate_limiter as rate_limiter_module
+from app import response_cache as response_cache_module
+from app.rate_limiter import RateLimiter
+from app.response_cache import ResponseCache
+
+
+class FakeClock:
+    """Virtual time for the cache and the limiter; sleeping advances it instantly."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(response_cache_module, "time", SimpleNamespace(time=clock))
+    monkeypatch.setattr(rate_limiter_module, "time", SimpleNamespace(monotonic=clock))
+    monkeypatch.setattr(rate_limiter_module, "asyncio", SimpleNamespace(Lock=asyncio.Lock, sleep=clock.sleep))
+    return clock
+
+
+def test_keys_depend_on_prompt_model_and_temperature():
+    key = ResponseCache.make_key("prompt", "gpt-4o", 0.7)
+    variants = [("prompt!", "gpt-4o", 0.7), ("prompt", "gpt-4o-mini", 0.7), ("prompt", "gpt-4o", 0)]
+
+    assert key == ResponseCache.make_key("prompt", "gpt-4o", 0.7)
+    assert len({key} | {ResponseCache.make_key(*variant) for variant in variants}) == 4
+
+
+def test_hits_and_misses_are_counted():
+    cache = ResponseCache()
+
+    assert cache.get("a") is None
+    cache.set("a", "response")
+    assert cache.get("a") == "response"
+    assert cache.stats() == {"hits": 1, "misses": 1, "memory_entries": 1}
+
+
+def test_least_recently_used_entry_is_evicted_from_memory():
+    cache = ResponseCache(max_memory_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("1", None, "3")
+
+
+def test_sqlite_store_survives_a_new_instance(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    cache = ResponseCache(db_path)
+    cache.set("a", "response")
+    cache.close()
+
+    reopened = ResponseCache(db_path, max_memory_entries=0)
+    assert reopened.get("a") == "response"
+    assert reopened.get("b") is None
+    assert reopened.stats()["memory_entries"] == 0
+    reopened.close()
+
+
+def test_disk_store_keeps_the_most_recently_used_entries(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    cache = ResponseCache(db_path, max_memory_entries=0, max_disk_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key.upper())
+    cache.close()
+
+    reopened = ResponseCache(db_path)
+    assert [reopened.get(key) for key in ("a", "b", "c")] == [None, "B", "C"]
+    reopened.close()
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.db"), ttl_seconds=60)
+    cache.set("a", "response")
+
+    clock.now += 59
+    assert cache.get("a") == "response"
+    clock.now += 2
+    assert cache.get("a") is None
+    cache.close()
+
+
+def test_request_budget_allows_a_burst_then_paces_requests(clock):
+    limiter = RateLimiter(requests_per_minute=60)
+    admitted = []
+
+    async def run():
+        for _ in range(63):
+            await limiter.acquire()
+            admitted.append(clock.now - 1000.0)
+
+    asyncio.run(run())
+
+    assert admitted[:60] == [0.0] * 60
+    assert admitted[60:] == pytest.approx([1.0, 2.0, 3.0])
+
+
+def test_token_budget_paces_large_requests(clock):
+    limiter = RateLimiter(tokens_per_minute=600)
+
+    async def run():
+        admitted = []
+        for _ in range(3):
+            await limiter.acquire(tokens=300)
+            admitted.append(clock.now - 1000.0)
+        return admitted
+
+    assert asyncio.run(run()) == pytest.approx([0.0, 0.0, 30.0])
+    assert not limiter.try_acquire(tokens=300)
+    clock.now += 30
+    assert limiter.try_acquire(tokens=300)
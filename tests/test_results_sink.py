@@ -0,0 +1,100 @@
+import json
+
+from app.output_writers import JSONLWriter
+from app.results_sink import ResultsSink, keyed_leads
+
+
+def _result(lead_id, subject="Subject", body="Body"):
+    return {"lead_id": lead_id, "lead_name": f"Lead {lead_id}", "company": "Acme",
+            "subject_line": subject, "email_body": body}
+
+
+def test_keys_tell_apart_missing_and_duplicate_ids():
+    leads = [{"id": 1}, {"name": "No id"}, {"id": 1}, {"name": "Also no id"}, {"id": "1"}]
+
+    assert [key for key, _ in keyed_leads(leads)] == [(1, 0), (None, 0), (1, 1), (None, 1), ("1", 0)]
+
+
+def test_leads_with_missing_or_shared_ids_keep_separate_results(tmp_path):
+    leads = [{"id": 1, "name": "A"}, {"name": "B"}, {"id": 1, "name": "C"}, {"name": "D"}]
+    sink = ResultsSink(str(tmp_path))
+    for key, lead in keyed_leads(leads):
+        subject = "Error" if lead["name"] == "D" else f"For {lead['name']}"
+        sink.append(key, dict(_result(lead.get("id", "unknown")), subject_line=subject))
+    sink.close()
+
+    resumed = ResultsSink(str(tmp_path), resume=True)
+
+    assert [r["subject_line"] for r in resumed.iter_results()] == ["For A", "For B", "For C", "Error"]
+    assert [key for key, _ in keyed_leads(leads) if not resumed.is_completed(key)] == [(None, 1)]
+    resumed.append((None, 1), dict(_result("unknown"), subject_line="For D"))
+    assert [r["subject_line"] for r in resumed.iter_results()] == ["For A", "For B", "For C", "For D"]
+    resumed.close()
+
+
+def test_resume_skips_only_successful_leads(tmp_path):
+    sink = ResultsSink(str(tmp_path))
+    sink.append((1, 0), _result(1))
+    sink.append((2, 0), _result(2, subject="Error", body="Error generating content: timeout"))
+    sink.close()
+
+    resumed = ResultsSink(str(tmp_path), resume=True)
+
+    assert resumed.is_completed((1, 0))
+    assert not resumed.is_completed((2, 0))
+    resumed.close()
+
+
+def test_retried_result_replaces_failed_record_in_place(tmp_path):
+    sink = ResultsSink(str(tmp_path))
+    sink.append((1, 0), _result(1, subject="Error", body="Error"))
+    sink.append((2, 0), _result(2))
+    sink.close()
+
+    resumed = ResultsSink(str(tmp_path), resume=True)
+    resumed.append((1, 0), _result(1, subject="Retried"))
+
+    assert [(r["lead_id"], r["subject_line"]) for r in resumed.iter_results()] == [(1, "Retried"), (2, "Subject")]
+    assert [r["lead_id"] for r in resumed.iter_latest([(2, 0), (1, 0), (3, 0)])] == [2, 1]
+    resumed.close()
+    assert ResultsSink(str(tmp_path), resume=True).completed == {(1, 0), (2, 0)}
+
+
+def test_torn_final_lines_are_ignored(tmp_path):
+    sink = ResultsSink(str(tmp_path))
+    sink.append(("a", 0), _result("a"))
+    sink.close()
+    with open(sink.results_path, "a", encoding="utf-8") as file:
+        file.write('{"key": ["b", 0], "result": {"subj')
+    with open(sink.checkpoint_path, "a", encoding="utf-8") as file:
+        file.write('{"key": ["b", 0')
+
+    resumed = ResultsSink(str(tmp_path), resume=True)
+
+    assert resumed.completed == {("a", 0)}
+    assert [r["lead_id"] for r in resumed.iter_results()] == ["a"]
+    resumed.close()
+
+
+def test_without_resume_previous_results_are_discarded(tmp_path):
+    sink = ResultsSink(str(tmp_path))
+    sink.append((1, 0), _result(1))
+    sink.close()
+
+    fresh = ResultsSink(str(tmp_path))
+
+    assert fresh.completed == set()
+    assert list(fresh.iter_results()) == []
+    fresh.close()
+
+
+def test_export_writes_latest_results(tmp_path):
+    sink = ResultsSink(str(tmp_path / "checkpoint"))
+    sink.append((1, 0), _result(1, subject="Old"))
+    sink.append((1, 0), _result(1, subject="New"))
+    path = str(tmp_path / "out.jsonl")
+
+    assert sink.export(JSONLWriter(path)) == 1
+    sink.close()
+    with open(path, encoding="utf-8") as file:
+        assert [json.loads(line)["subject_line"] for line in file] == ["New"]
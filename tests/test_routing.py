@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from app.routing import ModelTier, QualityGate, TieredRouter
+
+LEAD = {"name": "Ada Lovelace", "company": "Acme"}
+PRODUCT = {"name": "OutreachPro"}
+GOOD = ("Ideas for Acme", "Hi Ada, " + "word " * 160)
+SHORT = ("Ideas for Acme", "Hi Ada, thanks.")
+
+
+class StubGenerator:
+    """Returns a fixed email (raising it if it is an exception) and counts the requests.
+
+    Packed requests personalize every email except Beta's, which is too short.
+    """
+
+    def __init__(self, email):
+        self.email = email
+        self.calls = 0
+        self.packed = []
+
+    def _next(self):
+        self.calls += 1
+        if isinstance(self.email, Exception):
+            raise self.email
+        return self.email
+
+    def generate_email(self, lead, product):
+        return self._next()
+
+    async def agenerate_email(self, lead, product):
+        return self._next()
+
+    async def agenerate_emails(self, leads, product):
+        self.packed.append(len(leads))
+        return [_email_for(lead) if lead.get("company") != "Beta" else SHORT for lead in leads]
+
+
+def _email_for(lead):
+    return f"Ideas for {lead['company']}", "Hi there, " + "word " * 160
+
+
+LEADS = [LEAD, {"name": "Ben Hur", "company": "Beta"}, {"name": "Cy Young", "company": "Cobalt"}]
+
+
+@pytest.mark.parametrize("email, lead, reason", [
+    (("Error", "Error generating content: timeout"), LEAD, "error"),
+    (("Generated Subject", GOOD[1]), LEAD, "missing_subject"),
+    (("  ", GOOD[1]), LEAD, "missing_subject"),
+    (SHORT, LEAD, "too_short"),
+    (("Ideas for Acme", "Hi Ada, " + "word " * 200), LEAD, "too_long"),
+    (("Ideas for you", "Hello there, " + "word " * 160), LEAD, "not_personalized"),
+    (("Ideas for Acme", "Hello there, " + "word " * 160), LEAD, None),
+    (("Quick idea", "Hi Ada, " + "word " * 160), LEAD, None),
+    (("Quick idea", "Hello there, " + "word " * 160), {}, None),
+])
+def test_quality_gate_reasons(email, lead, reason):
+    assert QualityGate().check(*email, lead) == reason
+
+
+def test_quality_gate_matches_whole_words_only():
+    gate = QualityGate(min_words=1, max_words=50)
+
+    assert gate.check("Ideas", "Hello Adam", {"name": "Ada"}) == "not_personalized"
+    assert gate.check("Ideas", "Hello ada", {"name": "Ada"}) is None
+
+
+def test_quality_gate_rejects_inverted_limits():
+    with pytest.raises(ValueError):
+        QualityGate(min_words=10, max_words=5)
+
+
+def test_passing_email_stays_on_the_first_tier():
+    fast, slow = StubGenerator(GOOD), StubGenerator(GOOD)
+    router = TieredRouter([ModelTier("fast", fast), ModelTier("slow", slow)])
+
+    assert router.generate_email(LEAD, PRODUCT) == GOOD
+    assert (fast.calls, slow.calls) == (1, 0)
+    assert router.stats()["escalations"] == 0
+
+
+def test_failing_email_escalates_to_the_next_tier():
+    fast, slow = StubGenerator(SHORT), StubGenerator(GOOD)
+    router = TieredRouter([ModelTier("fast", fast), ModelTier("slow", slow)])
+
+    assert asyncio.run(router.agenerate_email(LEAD, PRODUCT)) == GOOD
+    stats = router.stats()
+    assert (stats["escalations"], stats["unresolved"]) == (1, 0)
+    assert [tier["requests"] for tier in stats["tiers"]] == [1, 1]
+    assert [tier["accepted"] for tier in stats["tiers"]] == [0, 1]
+
+
+def test_last_tier_email_is_kept_even_if_it_fails():
+    router = TieredRouter([ModelTier("fast", StubGenerator(SHORT)), ModelTier("slow", StubGenerator(SHORT))])
+
+    assert router.generate_email(LEAD, PRODUCT) == SHORT
+    assert router.stats()["unresolved"] == 1
+
+
+def test_errors_escalate_except_on_the_last_tier():
+    down = RuntimeError("down")
+    router = TieredRouter([ModelTier("fast", StubGenerator(down)), ModelTier("slow", StubGenerator(GOOD))])
+    assert router.generate_email(LEAD, PRODUCT) == GOOD
+
+    router = TieredRouter([ModelTier("fast", StubGenerator(SHORT)), ModelTier("slow", StubGenerator(down))])
+    with pytest.raises(RuntimeError):
+        router.generate_email(LEAD, PRODUCT)
+
+
+def test_packed_request_escalates_only_failing_leads():
+    fast, slow = StubGenerator(None), StubGenerator(_email_for(LEADS[1]))
+    router = TieredRouter([ModelTier("fast", fast), ModelTier("slow", slow)])
+
+    emails = asyncio.run(router.agenerate_emails(LEADS, PRODUCT))
+
+    assert fast.packed == [3]
+    assert slow.calls == 1
+    assert emails == [_email_for(lead) for lead in LEADS]
+    stats = router.stats()
+    assert stats["leads"] == 3
+    assert [tier["share"] for tier in stats["tiers"]] == [round(2 / 3, 4), round(1 / 3, 4)]
+
+
+def test_router_needs_a_tier():
+    with pytest.raises(ValueError):
+        TieredRouter([])
@@ -0,0 +1,222 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.scheduler import DeadlineExceededError, LeadScheduler
+from app.service import EmailService, HTTPError, ServiceBusyError, _dispatch
+
+
+class GatedAgent:
+    """Records the order leads start in and holds each generation until released."""
+
+    def __init__(self, hold: bool = False):
+        self.started = []
+        self.release = asyncio.Event()
+        if not hold:
+            self.release.set()
+
+    async def agenerate_email_for_lead(self, lead, product):
+        self.started.append(lead["id"])
+        await self.release.wait()
+        return f"Subject {lead['id']}", "Body"
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_weighted_tenant_rotation():
+    async def scenario():
+        agent = GatedAgent()
+        scheduler = LeadScheduler(agent, workers=1, tenant_weights={"acme": 2})
+        jobs = [scheduler.submit({"id": f"a{i}"}, {}, tenant="acme") for i in range(5)]
+        jobs += [scheduler.submit({"id": f"b{i}"}, {}, tenant="beta") for i in range(3)]
+        await scheduler.start()
+        await asyncio.gather(*(job.future for job in jobs))
+        await scheduler.stop()
+        return agent.started
+
+    assert run(scenario()) == ["a0", "a1", "b0", "a2", "a3", "b1", "a4", "b2"]
+
+
+def test_interactive_starts_before_queued_batch():
+    async def scenario():
+        agent = GatedAgent()
+        scheduler = LeadScheduler(agent, workers=1)
+        jobs = [scheduler.submit({"id": f"b{i}"}, {}) for i in range(3)]
+        jobs.append(scheduler.submit({"id": "i0"}, {}, priority="interactive"))
+        await scheduler.start()
+        await asyncio.gather(*(job.future for job in jobs))
+        await scheduler.stop()
+        return agent.started
+
+    assert run(scenario()) == ["i0", "b0", "b1", "b2"]
+
+
+def test_reserved_worker_is_kept_for_interactive_jobs():
+    async def scenario():
+        agent = GatedAgent(hold=True)
+        scheduler = LeadScheduler(agent, workers=3, reserved_workers=1)
+        await scheduler.start()
+        batch = [scheduler.submit({"id": f"b{i}"}, {}) for i in range(4)]
+        await _settle()
+        running_batch = scheduler.running("batch")
+        interactive = scheduler.submit({"id": "i0"}, {}, priority="interactive")
+        await _settle()
+        started_interactive = "i0" in agent.started
+        agent.release.set()
+        await asyncio.gather(*(job.future for job in batch + [interactive]))
+        await scheduler.stop()
+        return running_batch, started_interactive
+
+    assert run(scenario()) == (2, True)
+
+
+def test_earliest_deadline_first_within_tenant():
+    async def scenario():
+        agent = GatedAgent()
+        scheduler = LeadScheduler(agent, workers=1)
+        jobs = [
+            scheduler.submit({"id": "none"}, {}),
+            scheduler.submit({"id": "late"}, {}, deadline=60),
+            scheduler.submit({"id": "soon"}, {}, deadline=30),
+        ]
+        await scheduler.start()
+        await asyncio.gather(*(job.future for job in jobs))
+        await scheduler.stop()
+        return agent.started
+
+    assert run(scenario()) == ["soon", "late", "none"]
+
+
+def test_queued_job_expires_at_its_deadline_while_workers_are_busy():
+    async def scenario():
+        agent = GatedAgent(hold=True)
+        scheduler = LeadScheduler(agent, workers=1)
+        await scheduler.start()
+        busy = scheduler.submit({"id": "busy"}, {})
+        await _settle()
+        started = time.perf_counter()
+        job = scheduler.submit({"id": "late"}, {}, priority="interactive", deadline=0.05)
+        with pytest.raises(DeadlineExceededError):
+            await asyncio.wait_for(job.future, timeout=1)
+        waited = time.perf_counter() - started
+        depth = scheduler.queue_depth()
+        agent.release.set()
+        await busy.future
+        await _settle()
+        await scheduler.stop()
+        return waited, depth, agent.started
+
+    waited, depth, started = run(scenario())
+    assert waited < 0.5
+    assert depth == 0
+    assert started == ["busy"]
+
+
+def test_promotion_moves_job_ahead_and_shares_its_future():
+    async def scenario():
+        agent = GatedAgent()
+        scheduler = LeadScheduler(agent, workers=1)
+        jobs = [scheduler.submit({"id": f"b{i}"}, {}) for i in range(3)]
+        promoted = scheduler.promote(jobs[2], "interactive")
+        depth = scheduler.queue_depth("interactive"), scheduler.queue_depth("batch")
+        await scheduler.start()
+        await asyncio.gather(*(job.future for job in jobs))
+        await scheduler.stop()
+        return promoted, jobs[2], depth, agent.started
+
+    promoted, original, depth, started = run(scenario())
+    assert promoted is not original
+    assert promoted.future is original.future
+    assert depth == (1, 2)
+    assert started == ["b2", "b0", "b1"]
+
+
+def test_promotion_respects_the_target_queue_bound():
+    async def scenario():
+        scheduler = LeadScheduler(GatedAgent(), workers=1, queue_size=1)
+        batch = scheduler.submit({"id": "b0"}, {})
+        scheduler.submit({"id": "i0"}, {}, priority="interactive")
+        with pytest.raises(asyncio.QueueFull):
+            scheduler.promote(batch, "interactive")
+        # Tightening the deadline keeps the job in its class and is always allowed
+        return scheduler.promote(batch, "batch", deadline=30).deadline is not None
+
+    assert run(scenario())
+
+
+def test_queue_bound_is_per_class():
+    async def scenario():
+        scheduler = LeadScheduler(GatedAgent(), workers=1, queue_size=1)
+        scheduler.submit({"id": "b0"}, {})
+        with pytest.raises(asyncio.QueueFull):
+            scheduler.submit({"id": "b1"}, {})
+        scheduler.submit({"id": "i0"}, {}, priority="interactive")
+        return scheduler.capacity("batch"), scheduler.capacity("interactive")
+
+    assert run(scenario()) == (0, 0)
+
+
+def test_service_answers_504_when_deadline_passes_in_queue():
+    async def scenario():
+        agent = GatedAgent(hold=True)
+        service = EmailService(agent, product={"name": "P"}, workers=1)
+        await service.start()
+        busy = asyncio.create_task(service.generate({"id": "busy"}))
+        await _settle()
+        body = json.dumps({"lead": {"id": "late"}, "deadline_ms": 50}).encode()
+        with pytest.raises(HTTPError) as error:
+            await asyncio.wait_for(_dispatch(service, "POST", "/emails", body), timeout=1)
+        agent.release.set()
+        await busy
+        await service.stop()
+        return error.value.status
+
+    assert run(scenario()) == 504
+
+
+def test_service_coalesced_request_retries_after_a_tighter_deadline_expired():
+    async def scenario():
+        agent = GatedAgent(hold=True)
+        service = EmailService(agent, product={"name": "P"}, workers=1)
+        await service.start()
+        busy = asyncio.create_task(service.generate({"id": "busy"}))
+        await _settle()
+        tight = asyncio.create_task(service.generate({"id": "x"}, deadline=0.02))
+        loose = asyncio.create_task(service.generate({"id": "x"}))
+        with pytest.raises(DeadlineExceededError):
+            await asyncio.wait_for(tight, timeout=1)
+        agent.release.set()
+        result = await loose
+        await busy
+        await service.stop()
+        return result["subject_line"]
+
+    assert run(scenario()) == "Subject x"
+
+
+def test_service_rejects_promotion_into_a_full_class():
+    async def scenario():
+        agent = GatedAgent(hold=True)
+        service = EmailService(agent, product={"name": "P"}, workers=1, queue_size=1)
+        await service.start()
+        running = asyncio.create_task(service.generate({"id": "running"}))
+        await _settle()
+        queued = asyncio.create_task(service.generate({"id": "queued"}))
+        batch = asyncio.create_task(service.generate_batch([{"id": "b0"}]))
+        await _settle()
+        with pytest.raises(ServiceBusyError):
+            await asyncio.wait_for(service.generate({"id": "b0"}), timeout=1)
+        agent.release.set()
+        await asyncio.gather(running, queued, batch)
+        await service.stop()
+
+    run(scenario())
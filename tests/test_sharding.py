@@ -0,0 +1,70 @@
+import json
+import os
+
+import pytest
+
+from app.llm_backends import FakeLLMBackend
+from app.main import _parse_args, _split_limit, generate_emails_for_all_leads
+from app.sharding import merge_shards, parse_shard_spec, shard_filter, shard_for, shard_output_path
+
+LEADS = [
+    {"id": 1, "name": "Ada", "company": "Acme"},
+    {"name": "Ben", "company": "Beta"},
+    {"id": 1, "name": "Cy", "company": "Cobalt"},
+    {"id": "x", "name": "Di", "company": "Delta"},
+    {"name": "Eve", "company": "Echo"},
+] + [{"id": i, "name": f"Lead {i}", "company": f"Company {i}"} for i in range(2, 12)]
+
+
+def _write_leads(path):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"leads": LEADS, "product": {"name": "OutreachPro"}}, file)
+
+
+def test_every_lead_belongs_to_exactly_one_shard():
+    filters = [shard_filter(index, 3) for index in range(3)]
+
+    for lead in LEADS:
+        assert sum(selected(lead) for selected in filters) == 1
+        assert shard_for(lead.get("id"), 3) == shard_for(lead.get("id"), 3)
+
+
+def test_shard_specs_are_validated():
+    assert parse_shard_spec("2/8") == (2, 8)
+    for spec in ("8/8", "-1/4", "1/0", "two/4"):
+        with pytest.raises(ValueError):
+            parse_shard_spec(spec)
+
+
+def test_shard_counts_below_one_are_rejected():
+    assert _parse_args(["--shards", "4"]).shards == 4
+    for argv in (["--shards", "0"], ["--shards", "-2"], ["--merge", "0"]):
+        with pytest.raises(SystemExit):
+            _parse_args(argv)
+
+
+def test_local_shards_split_the_rate_limits():
+    assert _split_limit(100, 4) == 25
+    assert _split_limit(3, 4) == 1
+    assert _split_limit(None, 4) is None
+
+
+def test_merge_matches_an_unsharded_run(tmp_path):
+    data_path = str(tmp_path / "leads.json")
+    _write_leads(data_path)
+    unsharded = generate_emails_for_all_leads(
+        data_path, str(tmp_path / "unsharded"), llm_backend=FakeLLMBackend(body_words=40)
+    )
+
+    output_path = str(tmp_path / "sharded")
+    for index in range(3):
+        generate_emails_for_all_leads(
+            data_path, shard_output_path(output_path, index, 3), lead_filter=shard_filter(index, 3),
+            llm_backend=FakeLLMBackend(body_words=40)
+        )
+    total = merge_shards(data_path, output_path, 3)
+
+    assert total == len(LEADS)
+    with open(os.path.join(output_path, "all_generated_emails.json"), encoding="utf-8") as file:
+        assert json.load(file)["generated_emails"] == unsharded
+    assert [result["lead_name"] for result in unsharded[:5]] == ["Ada", "Ben", "Cy", "Di", "Eve"]
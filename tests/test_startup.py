@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+from app.benchmark import HEAVY_MODULES
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_importing_main_does_not_load_heavy_modules():
+    # A fresh interpreter records every attempt to import a heavy module, installed or not
+    script = textwrap.dedent(f"""
+        import importlib.abc
+        import sys
+
+        HEAVY_MODULES = {HEAVY_MODULES!r}
+        attempted = []
+
+        class Recorder(importlib.abc.MetaPathFinder):
+            def find_spec(self, name, path=None, target=None):
+                if name.split(".")[0] in HEAVY_MODULES:
+                    attempted.append(name)
+                return None
+
+        sys.meta_path.insert(0, Recorder())
+        sys.path.insert(0, {TESTS_DIR!r})
+        import conftest
+        import app.main
+        print(",".join(attempted))
+    """)
+    completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+
+    assert completed.stdout.strip() == ""
@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+from app.dry_run import ESTIMATED_COMPLETION_TOKENS, estimate_run
+from app.llm_backends import FakeLLMBackend
+from app.llm_interface import LLMInterface
+from app.token_budget import TRUNCATION_MARKER, PromptBudget, count_tokens, trim_to_tokens
+
+ACTIVITY = " ".join(f"Posted about topic number {i} and its consequences." for i in range(40))
+
+
+def _write_leads(path, count, **fields):
+    leads = [dict({"id": i, "name": f"Lead {i}", "company": f"Company {i}"}, **fields) for i in range(count)]
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"leads": leads, "product": {"name": "OutreachPro", "description": "Email automation"}}, file)
+
+
+def test_token_counts():
+    assert count_tokens("") == 1
+    assert count_tokens("hello") == 1
+    assert count_tokens("Hello world") == 2
+    assert count_tokens("internationalization") == 4
+    assert count_tokens("12345") == 2
+    assert count_tokens("こんにちは") == 5
+    assert count_tokens(ACTIVITY) > count_tokens(ACTIVITY[:100])
+
+
+def test_trimming_cuts_at_a_word_boundary_within_the_budget():
+    trimmed = trim_to_tokens(ACTIVITY, 20)
+
+    assert trimmed.endswith(TRUNCATION_MARKER)
+    assert count_tokens(trimmed) <= 20
+    assert ACTIVITY.startswith(trimmed[:-len(TRUNCATION_MARKER)])
+    assert trim_to_tokens("short text", 20) == "short text"
+
+
+def test_budget_trims_oversized_fields_only():
+    lead = {"name": "Ada", "linkedin_activity": ACTIVITY, "interests": ["ai", "sales", "growth"],
+            "pain_points": ["churn " * 10, "cost"]}
+
+    trimmed = PromptBudget(linkedin_activity=30, interests=60, pain_points=5).apply(lead)
+
+    assert trimmed is not lead
+    assert count_tokens(trimmed["linkedin_activity"]) <= 30
+    assert trimmed["interests"] is lead["interests"]
+    assert trimmed["pain_points"] == [trim_to_tokens("churn " * 10, 5)]
+    assert lead["linkedin_activity"] == ACTIVITY
+    assert PromptBudget().apply({"name": "Ada", "interests": ["ai"]}) == {"name": "Ada", "interests": ["ai"]}
+
+
+def test_list_fields_keep_their_leading_items():
+    lead = {"interests": [f"interest {i}" for i in range(20)]}
+
+    trimmed = PromptBudget(interests=10).apply(lead)
+
+    assert trimmed["interests"] == lead["interests"][:len(trimmed["interests"])]
+    assert 0 < len(trimmed["interests"]) < 20
+
+
+def test_budget_specs():
+    budget = PromptBudget.from_spec("linkedin_activity=40, pain_points=10")
+
+    assert budget.limits == {"linkedin_activity": 40, "interests": 60, "pain_points": 10}
+    for spec in ("company=10", "interests=1", "interests=many"):
+        with pytest.raises(ValueError):
+            PromptBudget.from_spec(spec)
+
+
+def test_dry_run_counts_requests_and_tokens_without_calling_the_model(tmp_path, monkeypatch):
+    data_path = str(tmp_path / "leads.json")
+    _write_leads(data_path, 5, linkedin_activity=ACTIVITY)
+    backend = FakeLLMBackend()
+    interface = LLMInterface(backend=backend)
+    monkeypatch.setattr(FakeLLMBackend, "invoke", lambda *args: pytest.fail("dry run called the model"))
+
+    single = estimate_run(data_path, interface, model_name="gpt-4o-mini")
+    packed = estimate_run(data_path, interface, model_name="gpt-4o-mini", pack_size=2)
+    budgeted = estimate_run(data_path, LLMInterface(backend=backend, prompt_budget=PromptBudget(linkedin_activity=20)))
+
+    assert (single["leads"], single["requests"], packed["requests"]) == (5, 5, 3)
+    assert single["estimated_output_tokens"] == 5 * ESTIMATED_COMPLETION_TOKENS
+    assert packed["input_tokens"] < single["input_tokens"]
+    assert budgeted["fields_trimmed"] == 5 and budgeted["input_tokens"] < single["input_tokens"]
+    expected_cost = (single["input_tokens"] * 0.15 + single["estimated_output_tokens"] * 0.60) / 1_000_000
+    assert single["estimated_cost_usd"] == round(expected_cost, 4)
+
+
+def test_dry_run_duration_follows_the_tightest_limit(tmp_path):
+    data_path = str(tmp_path / "leads.json")
+    _write_leads(data_path, 10)
+    interface = LLMInterface(backend=FakeLLMBackend())
+
+    concurrent = estimate_run(data_path, interface, concurrency=10)
+    rate_limited = estimate_run(data_path, interface, concurrency=10, requests_per_minute=6)
+    unknown = estimate_run(data_path, interface, model_name="local-model")
+
+    assert rate_limited["estimated_duration_s"] == 100.0
+    assert concurrent["estimated_duration_s"] < rate_limited["estimated_duration_s"]
+    assert unknown["estimated_cost_usd"] is None